@@ -0,0 +1,185 @@
+"""Reproducible benchmarks for tokenize, parse, simplify, derivative and evaluation.
+
+Expressions are generated from a fixed seed with a controlled number of leaves and nesting depth.
+Results are written as JSON so runs from different commits can be compared:
+
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --output after.json --compare before.json
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from src.expressions import clear_caches
+from src.parser import clear_parse_cache, parse
+from src.parser.tokenizer import scan
+
+try:
+    import numpy as np
+except ImportError:  # evaluate_array is skipped without NumPy
+    np = None
+
+# Functions bounded on the reals, so every generated expression can be evaluated on the grid
+UNARY = ["sin", "cos", "tanh"]
+BINARY = ["+", "-", "*", "/", "^"]
+
+SIZES = [10, 100, 1000]
+DEPTH = 12
+DERIVATIVE_ORDERS = [1, 2, 3]
+GRID = [0.1 + i * 0.9 / 999 for i in range(1000)]
+
+
+def random_expression(rng: random.Random, size: int, depth: int) -> str:
+    """Expression string with about `size` leaves and at most `depth` levels of nesting"""
+    if size <= 1 or depth == 0:
+        return rng.choice(["x", "x", str(rng.randint(1, 9)), f"{rng.randint(1, 9)}.5"])
+    if rng.random() < 0.2:
+        return f"{rng.choice(UNARY)}({random_expression(rng, size - 1, depth - 1)})"
+    operator = rng.choice(BINARY)
+    left_size = rng.randint(1, size - 1)
+    left = random_expression(rng, left_size, depth - 1)
+    if operator == "^":
+        # Base bounded to (-1, 1), so stacked powers cannot overflow
+        return f"tanh({left})^{rng.randint(2, 3)}"
+    right = random_expression(rng, size - left_size, depth - 1)
+    if operator == "/":
+        # Denominator bounded away from zero
+        return f"({left}) / (2 + sin({right}))"
+    return f"({left}) {operator} ({right})"
+
+
+def count_nodes(expr) -> int:
+    """Distinct nodes of the DAG (interned subtrees are counted once)"""
+    seen = {expr}
+    stack = [expr]
+    while stack:
+        for child in stack.pop().children:
+            if child not in seen:
+                seen.add(child)
+                stack.append(child)
+    return len(seen)
+
+
+def measure(run: callable, setup: callable = lambda: None, repeat: int = 5) -> float:
+    """Best wall time of `repeat` runs. setup() builds fresh inputs outside the timed section"""
+    best = float("inf")
+    for _ in range(repeat):
+        # Drop cached results and parsed trees and let unused interned nodes be collected, so each run starts cold
+        clear_caches()
+        clear_parse_cache()
+        gc.collect()
+        argument = setup()
+        start = time.perf_counter()
+        run(argument)
+        best = min(best, time.perf_counter() - start)
+        del argument
+    return best
+
+
+def benchmark_expression(expr_str: str, size: int, repeat: int) -> list[dict]:
+    results = []
+
+    def record(name: str, seconds: float, **extra):
+        results.append({"name": name, "size": size, "seconds": seconds, **extra})
+
+    record("tokenize", measure(lambda _: scan(expr_str), repeat=repeat))
+    record("parse", measure(lambda _: parse(expr_str), repeat=repeat), nodes=count_nodes(parse(expr_str)))
+    record("simplify", measure(lambda expr: expr.simplify_fully(), setup=lambda: parse(expr_str), repeat=repeat))
+
+    for order in DERIVATIVE_ORDERS:
+        def nth_derivative(expr, order=order):
+            for _ in range(order):
+                expr = expr.derivative()
+            return expr
+
+        record(
+            "derivative",
+            measure(nth_derivative, setup=lambda: parse(expr_str), repeat=repeat),
+            order=order,
+            nodes=count_nodes(nth_derivative(parse(expr_str))),
+        )
+
+    derivative = parse(expr_str).derivative().simplify_fully()
+    record("call", measure(lambda expr: [expr(x) for x in GRID], setup=lambda: derivative, repeat=repeat), points=len(GRID))
+    if np is not None:
+        grid = np.array(GRID)
+        record("evaluate_array", measure(lambda expr: expr.evaluate_array(grid), setup=lambda: derivative, repeat=repeat), points=len(GRID))
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes: list[int], depth: int, seed: int, repeat: int) -> dict:
+    results = []
+    for size in sizes:
+        expr_str = random_expression(random.Random(seed + size), size, depth)
+        results.extend(benchmark_expression(expr_str, size, repeat))
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "depth": depth,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def _key(result: dict) -> tuple:
+    return tuple(sorted((name, value) for name, value in result.items() if name not in ("seconds", "nodes")))
+
+
+def compare(current: dict, baseline: dict) -> str:
+    """Table of current / baseline time ratios (and node counts when they differ)"""
+    baseline_results = {_key(result): result for result in baseline["results"]}
+    lines = [f"{'benchmark':<40} {'baseline':>12} {'current':>12} {'ratio':>8}"]
+    for result in current["results"]:
+        label = " ".join(f"{name}={value}" for name, value in _key(result) if name != "name")
+        label = f"{result['name']} {label}"
+        old = baseline_results.get(_key(result))
+        if old is None:
+            lines.append(f"{label:<40} {'-':>12} {result['seconds']:>12.6f} {'-':>8}")
+            continue
+        line = f"{label:<40} {old['seconds']:>12.6f} {result['seconds']:>12.6f} {result['seconds'] / old['seconds']:>7.2f}x"
+        if old.get("nodes") != result.get("nodes"):
+            line += f"  nodes {old.get('nodes')} -> {result.get('nodes')}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: list[str] = None):
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="leaves of the generated expressions")
+    arg_parser.add_argument("--depth", type=int, default=DEPTH, help="maximum nesting depth")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark (the best one is kept)")
+    arg_parser.add_argument("--output", help="write the results as JSON to this file")
+    arg_parser.add_argument("--compare", metavar="BASELINE", help="JSON results of a previous run to compare against")
+    args = arg_parser.parse_args(argv)
+
+    results = run(args.sizes, args.depth, args.seed, args.repeat)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            print(compare(results, json.load(file)))
+    else:
+        json.dump(results["results"], sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
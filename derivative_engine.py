@@ -1,22 +1,88 @@
-from src.parser import parse
+import argparse
+import json
+import os
+import sys
+from contextlib import nullcontext
+from typing import Iterable, TextIO
 
+from src.batch import derivative_of, differentiate_batch
+from src.expressions import Limits, instrument
+from src.parser import persist
+from src.store import build_store
 
-def main(n_tries: int = 10):
+
+def main(n_tries: int = 10, limits: Limits = None):
     while True:
         expr_str = input("function to derivate: ")
         if 'exit()' in expr_str:
             break
 
         try:
-            expr = parse(expr_str)
-            for _ in range(n_tries):
-                expr = expr.simplify()
-            derivative = expr.derivative()
-            for _ in range(n_tries):
-                derivative = derivative.simplify()
-            print(derivative)
+            print(derivative_of(expr_str, max_passes=n_tries, limits=limits))
         except Exception as e:
             print(e)
 
+
+def stream(lines: Iterable[str], output: TextIO, workers: int | None = None, n_tries: int = 10, as_json: bool = False, limits: Limits = None):
+    """Writes one line per input line: the derivative (or "error: ..."), or a JSON object with timing.
+    Lines are read lazily, so memory stays bounded whatever the input size."""
+    expressions = (line.strip() for line in lines)
+    for result in differentiate_batch(expressions, workers=workers, max_passes=n_tries, limits=limits):
+        if as_json:
+            output.write(json.dumps(result._asdict()) + "\n")
+        elif result.ok:
+            output.write(result.derivative + "\n")
+        else:
+            output.write(f"error: {result.error}\n")
+
+
+def batch(input_path: str, workers: int | None = None, n_tries: int = 10, as_json: bool = False, limits: Limits = None):
+    """Differentiates every line of input_path ('-' for stdin), printing one result per line"""
+    with (sys.stdin if input_path == "-" else open(input_path)) as lines:
+        try:
+            stream(lines, sys.stdout, workers=workers, n_tries=n_tries, as_json=as_json, limits=limits)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # The reader went away (e.g. `| head`): stop quietly
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
+
+
 if __name__ == "__main__":
-    main(10)
+    arg_parser = argparse.ArgumentParser(description="Symbolic derivatives of functions of x")
+    arg_parser.add_argument("--batch", metavar="INPUT", help="file with one expression per line ('-' for stdin, the default when stdin is piped)")
+    arg_parser.add_argument("--workers", type=int, default=None, help="worker processes for --batch (default: all cores)")
+    arg_parser.add_argument("--json", action="store_true", help="write each result as a JSON object, with its timing")
+    arg_parser.add_argument("--profile", action="store_true", help="print allocation, rule and phase counters to stderr on exit (runs in-process)")
+    arg_parser.add_argument("--max-nodes", type=int, default=None, help="reject expressions (and derivatives) with more nodes than this")
+    arg_parser.add_argument("--max-depth", type=int, default=None, help="reject expressions (and derivatives) nested deeper than this")
+    arg_parser.add_argument("--max-seconds", type=float, default=None, help="time limit per expression")
+    arg_parser.add_argument("--build-store", metavar="PATH", default=None, help="write the derivatives of the --batch input to a memory-mapped store file instead of printing them")
+    arg_parser.add_argument("--parse-cache", metavar="PATH", default=None, help="keep parsed expressions in an SQLite file that persists across runs")
+    args = arg_parser.parse_args()
+    limits = Limits(args.max_nodes, args.max_depth, args.max_seconds)
+    if limits == Limits():
+        limits = None
+    if args.batch is None and not sys.stdin.isatty():
+        args.batch = "-"
+    if args.parse_cache:
+        persist(args.parse_cache)
+    if args.profile:
+        # Counters are collected in this process only
+        args.workers = 1
+    with instrument() if args.profile else nullcontext() as collector:
+        try:
+            if args.build_store:
+                if not args.batch:
+                    arg_parser.error("--build-store needs an input (--batch INPUT)")
+                with sys.stdin if args.batch == "-" else open(args.batch) as lines:
+                    counts = build_store(args.build_store, (line.strip() for line in lines), workers=args.workers, limits=limits)
+                print(json.dumps(counts))
+            elif args.batch:
+                batch(args.batch, workers=args.workers, n_tries=10, as_json=args.json, limits=limits)
+            else:
+                main(10, limits=limits)
+        finally:
+            if collector is not None:
+                json.dump(collector.summary(), sys.stderr, indent=2)
+                sys.stderr.write("\n")
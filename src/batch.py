@@ -0,0 +1,109 @@
+import os
+import time
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from typing import Iterable, Iterator, NamedTuple
+
+from src.expressions import Expression, to_bytes
+from src.expressions.guards import Limits, limits as bounded
+from src.expressions.instrumentation import phase
+from src.parser import active_store, parse_tokens, persist, scan
+
+
+class DerivativeResult(NamedTuple):
+    expression: str
+    derivative: str | None  # Simplified derivative, None when the expression failed
+    error: str | None  # "<ExceptionType>: <message>", None on success
+    seconds: float = 0.0  # Wall time spent on this expression
+    tree: bytes | None = None  # Derivative serialized with to_bytes, when requested
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def derivative_of(expr_str: str, max_passes: int = 10, limits: Limits = None) -> str:
+    """Parses, simplifies and differentiates expr_str, returning the simplified derivative as a string.
+    With limits, every step is bounded (LimitExceeded is raised past a bound)."""
+    derivative = derivative_tree(expr_str, max_passes, limits)
+    with phase("format"):
+        return str(derivative)
+
+
+def derivative_tree(expr_str: str, max_passes: int = 10, limits: Limits = None) -> Expression:
+    """Same as derivative_of, returning the simplified derivative itself"""
+    with bounded(*limits) if limits is not None else nullcontext():
+        return _derivative_tree(expr_str, max_passes)
+
+
+def _derivative_tree(expr_str: str, max_passes: int) -> Expression:
+    with phase("tokenize"):
+        tokens = scan(expr_str)
+    with phase("parse"):
+        expr = parse_tokens(tokens)
+    with phase("simplify"):
+        expr = expr.simplify_fully(max_passes=max_passes)
+    with phase("derivative"):
+        derivative = expr.derivative()
+    with phase("simplify_derivative"):
+        return derivative.simplify_fully(max_passes=max_passes)
+
+
+def _process(expr_str: str, max_passes: int, limits: Limits = None, trees: bool = False) -> DerivativeResult:
+    start = time.perf_counter()
+    try:
+        derivative = derivative_tree(expr_str, max_passes, limits)
+        with phase("format"):
+            text = str(derivative)
+        tree = to_bytes(derivative) if trees else None
+    except Exception as error:
+        return DerivativeResult(expr_str, None, f"{type(error).__name__}: {error}", time.perf_counter() - start)
+    return DerivativeResult(expr_str, text, None, time.perf_counter() - start, tree)
+
+
+def _process_chunk(chunk: list[str], max_passes: int, limits: Limits = None, trees: bool = False) -> list[DerivativeResult]:
+    return [_process(expr_str, max_passes, limits, trees) for expr_str in chunk]
+
+
+def _chunked(items: Iterable[str], size: int) -> Iterator[list[str]]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def differentiate_batch(
+    expressions: Iterable[str],
+    workers: int | None = None,
+    chunksize: int = 256,
+    max_passes: int = 10,
+    limits: Limits = None,
+    trees: bool = False,
+) -> Iterator[DerivativeResult]:
+    """Differentiates every expression string, yielding one DerivativeResult per input, in order.
+    Work is spread over a pool of `workers` processes (all cores by default). With a single worker
+    everything runs in-process, one expression at a time, so each result is yielded as soon as it is ready.
+    Input is consumed lazily: at most two chunks per worker are in flight at any time.
+    limits bounds each expression separately: one past a bound gets a LimitExceeded error result.
+    Workers share the on-disk parse cache of this process, if there is one.
+    With trees, each result also carries its derivative serialized (DerivativeResult.tree)."""
+    if workers is not None and workers < 1:
+        raise ValueError(f"workers must be positive, got: {workers}")
+    if workers == 1:
+        for expr_str in expressions:
+            yield _process(expr_str, max_passes, limits, trees)
+        return
+
+    chunks = _chunked(expressions, chunksize)
+    workers = workers or os.cpu_count() or 1
+    store = active_store()
+    initializer = {} if store is None else {"initializer": persist, "initargs": (store.path,)}
+    with ProcessPoolExecutor(max_workers=workers, **initializer) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_process_chunk, chunk, max_passes, limits, trees))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
@@ -8,9 +8,19 @@ from .basic import (
     Subtraction,
     Product,
     Division,
+    interned_count,
 )
 from .hyperbolic import Cosh, Sinh, Tanh
 from .trigonometric import Cos, Sin, Tan
 from .exponential import Logarithm, Exponential
-from .polynomial import Polynomial
+from .polynomial import Polynomial, SparsePolynomial
 from .power import Power
+from .cache import LRUCache, DERIVATIVE_CACHE, SIMPLIFY_CACHE, cache_stats, clear_caches
+from .instrumentation import Instrumentation, instrument
+from .autodiff import Adjoint, Taylor
+from .matrix import ExpressionMatrix, jacobian, hessian
+from .flat import FlatExpression
+from .rewrite import Rule, RuleSet, Wildcard, RULES, rewrite
+from .egraph import EGraph, egraph_simplify
+from .guards import Limits, LimitExceeded, limits
+from .serialize import to_bytes, from_bytes, flat_from_bytes, to_json, from_json
@@ -0,0 +1,322 @@
+import math
+from math import factorial
+
+from .basic import Expression
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only required to differentiate at many points at once
+    np = None
+
+
+class Taylor:
+    """Truncated Taylor series sum(coefficients[k] * h^k) of a function around a point.
+    Coefficients are floats, or NumPy arrays to expand around many points at once.
+    coefficients[k] is the k-th derivative divided by k!."""
+
+    __array_ufunc__ = None  # NumPy scalars and arrays defer to the reflected operators below
+
+    def __init__(self, coefficients: list, lib=math):
+        self.coefficients = coefficients
+        self.lib = lib  # math or numpy, applied to the leading coefficient
+
+    def _lift(self, other) -> list:
+        if isinstance(other, Taylor):
+            return other.coefficients
+        return [other] + [0] * (len(self.coefficients) - 1)
+
+    def __add__(self, other):
+        return Taylor([a + b for a, b in zip(self.coefficients, self._lift(other))], self.lib)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return Taylor([a - b for a, b in zip(self.coefficients, self._lift(other))], self.lib)
+
+    def __rsub__(self, other):
+        return Taylor([b - a for a, b in zip(self.coefficients, self._lift(other))], self.lib)
+
+    def __neg__(self):
+        return Taylor([-a for a in self.coefficients], self.lib)
+
+    def __mul__(self, other):
+        if not isinstance(other, Taylor):
+            return Taylor([a * other for a in self.coefficients], self.lib)
+        a, b = self.coefficients, other.coefficients
+        return Taylor([sum(a[j] * b[k - j] for j in range(k + 1)) for k in range(len(a))], self.lib)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        # a = q * b, solved for q one coefficient at a time
+        a, b = self.coefficients, self._lift(other)
+        q = []
+        for k in range(len(a)):
+            q.append((a[k] - sum(q[j] * b[k - j] for j in range(k))) / b[0])
+        return Taylor(q, self.lib)
+
+    def __rtruediv__(self, other):
+        return Taylor(self._lift(other), self.lib) / self
+
+    def __pow__(self, exponent):
+        if isinstance(exponent, Taylor):
+            return (exponent * self.log()).exp()
+        if float(exponent).is_integer() and not math.isinf(exponent):
+            return self._integer_power(int(exponent))
+        # p = a ^ r satisfies a * p' = r * a' * p
+        a = self.coefficients
+        p = [a[0] ** exponent]
+        for k in range(1, len(a)):
+            p.append(sum(((exponent + 1) * j - k) * a[j] * p[k - j] for j in range(1, k + 1)) / (k * a[0]))
+        return Taylor(p, self.lib)
+
+    def __rpow__(self, base):
+        return (self * self.lib.log(base)).exp()
+
+    def _integer_power(self, exponent: int) -> "Taylor":
+        # Repeated squaring, exact where the leading coefficient is 0 (e.g. x ^ 2 at x = 0)
+        if exponent < 0:
+            return 1 / self._integer_power(-exponent)
+        result = Taylor(self._lift(1), self.lib)
+        power = self
+        while exponent:
+            if exponent & 1:
+                result = result * power
+            exponent >>= 1
+            if exponent:
+                power = power * power
+        return result
+
+    def exp(self) -> "Taylor":
+        a = self.coefficients
+        e = [self.lib.exp(a[0])]
+        for k in range(1, len(a)):
+            e.append(sum(j * a[j] * e[k - j] for j in range(1, k + 1)) / k)
+        return Taylor(e, self.lib)
+
+    def log(self) -> "Taylor":
+        a = self.coefficients
+        l = [self.lib.log(a[0])]
+        for k in range(1, len(a)):
+            l.append((a[k] - sum(j * l[j] * a[k - j] for j in range(1, k)) / k) / a[0])
+        return Taylor(l, self.lib)
+
+    def _sin_cos(self, sin: callable, cos: callable, sign: int) -> tuple["Taylor", "Taylor"]:
+        # s' = c * a' and c' = sign * s * a'
+        a = self.coefficients
+        s, c = [sin(a[0])], [cos(a[0])]
+        for k in range(1, len(a)):
+            s.append(sum(j * a[j] * c[k - j] for j in range(1, k + 1)) / k)
+            c.append(sign * sum(j * a[j] * s[k - j] for j in range(1, k + 1)) / k)
+        return Taylor(s, self.lib), Taylor(c, self.lib)
+
+    def sin(self) -> "Taylor":
+        return self._sin_cos(self.lib.sin, self.lib.cos, -1)[0]
+
+    def cos(self) -> "Taylor":
+        return self._sin_cos(self.lib.sin, self.lib.cos, -1)[1]
+
+    def tan(self) -> "Taylor":
+        sin, cos = self._sin_cos(self.lib.sin, self.lib.cos, -1)
+        return sin / cos
+
+    def sinh(self) -> "Taylor":
+        return self._sin_cos(self.lib.sinh, self.lib.cosh, 1)[0]
+
+    def cosh(self) -> "Taylor":
+        return self._sin_cos(self.lib.sinh, self.lib.cosh, 1)[1]
+
+    def tanh(self) -> "Taylor":
+        sinh, cosh = self._sin_cos(self.lib.sinh, self.lib.cosh, 1)
+        return sinh / cosh
+
+
+class Adjoint:
+    """Value recorded on a reverse-mode tape, with the partial derivatives of the operation that
+    produced it with respect to its operands. Values are floats or NumPy arrays."""
+
+    __array_ufunc__ = None  # NumPy scalars and arrays defer to the reflected operators below
+
+    def __init__(self, value, tape: list, operands: tuple = (), lib=math):
+        self.value = value
+        self.operands = operands  # (operand, d self / d operand) pairs
+        self.tape = tape
+        self.lib = lib
+        self.index = len(tape)
+        tape.append(self)
+
+    def _record(self, value, *operands) -> "Adjoint":
+        return Adjoint(value, self.tape, operands, self.lib)
+
+    def __add__(self, other):
+        if isinstance(other, Adjoint):
+            return self._record(self.value + other.value, (self, 1), (other, 1))
+        return self._record(self.value + other, (self, 1))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, Adjoint):
+            return self._record(self.value - other.value, (self, 1), (other, -1))
+        return self._record(self.value - other, (self, 1))
+
+    def __rsub__(self, other):
+        return self._record(other - self.value, (self, -1))
+
+    def __neg__(self):
+        return self._record(-self.value, (self, -1))
+
+    def __mul__(self, other):
+        if isinstance(other, Adjoint):
+            return self._record(self.value * other.value, (self, other.value), (other, self.value))
+        return self._record(self.value * other, (self, other))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, Adjoint):
+            quotient = self.value / other.value
+            return self._record(quotient, (self, 1 / other.value), (other, -quotient / other.value))
+        return self._record(self.value / other, (self, 1 / other))
+
+    def __rtruediv__(self, other):
+        quotient = other / self.value
+        return self._record(quotient, (self, -quotient / self.value))
+
+    def __pow__(self, exponent):
+        if isinstance(exponent, Adjoint):
+            power = self.value**exponent.value
+            return self._record(
+                power,
+                (self, exponent.value * self.value ** (exponent.value - 1)),
+                (exponent, power * self.lib.log(self.value)),
+            )
+        if exponent == 0:
+            # Also at 0, where the power rule would compute 0 * 0 ^ -1
+            return self._record(self.value**0, (self, 0))
+        return self._record(self.value**exponent, (self, exponent * self.value ** (exponent - 1)))
+
+    def __rpow__(self, base):
+        power = base**self.value
+        return self._record(power, (self, power * self.lib.log(base)))
+
+    def sin(self) -> "Adjoint":
+        return self._record(self.lib.sin(self.value), (self, self.lib.cos(self.value)))
+
+    def cos(self) -> "Adjoint":
+        return self._record(self.lib.cos(self.value), (self, -self.lib.sin(self.value)))
+
+    def tan(self) -> "Adjoint":
+        tan = self.lib.tan(self.value)
+        return self._record(tan, (self, 1 + tan * tan))
+
+    def sinh(self) -> "Adjoint":
+        return self._record(self.lib.sinh(self.value), (self, self.lib.cosh(self.value)))
+
+    def cosh(self) -> "Adjoint":
+        return self._record(self.lib.cosh(self.value), (self, self.lib.sinh(self.value)))
+
+    def tanh(self) -> "Adjoint":
+        tanh = self.lib.tanh(self.value)
+        return self._record(tanh, (self, 1 - tanh * tanh))
+
+    def exp(self) -> "Adjoint":
+        exp = self.lib.exp(self.value)
+        return self._record(exp, (self, exp))
+
+    def log(self) -> "Adjoint":
+        return self._record(self.lib.log(self.value), (self, 1 / self.value))
+
+
+class AutodiffLibrary:
+    """Stands for math / numpy in Expression._evaluate: applies node functions to automatic
+    differentiation numbers (Taylor or Adjoint), and to plain values (constant subtrees) with the underlying library"""
+
+    def __init__(self, lib, number: type):
+        self.lib = lib
+        self.number = number
+
+    def __getattr__(self, name: str) -> callable:
+        function = getattr(self.lib, name)
+        number = self.number
+
+        def apply(value):
+            if isinstance(value, number):
+                return getattr(value, name)()
+            return function(value)
+
+        return apply
+
+
+def derivatives_at(expr: Expression, x, order: int = 1, values: dict = None) -> list:
+    """[f(x), f'(x), ..., f^(order)(x)], propagating truncated Taylor series through the tree once.
+    x is a float, or an array of points (requires NumPy) giving one array per derivative.
+    values holds the other variables, which are constant here."""
+    if order < 0:
+        raise ValueError(f"order must be non-negative, got: {order}")
+    lib, point = _library({**(values or {}), "x": x})
+    if lib is math:
+        point["x"] = _variable(x, order, math)
+        return _derivatives(expr._value(AutodiffLibrary(math, Taylor), point), order)
+
+    shape = _shape(point)
+    with np.errstate(all="ignore"):
+        point["x"] = _variable(point["x"], order, np)
+        derivatives = _derivatives(expr._value(AutodiffLibrary(np, Taylor), point), order)
+    return [np.broadcast_to(derivative, shape).copy() for derivative in derivatives]
+
+
+def gradient(expr: Expression, point: dict) -> tuple:
+    """Value of expr at point and its partial derivative with respect to every variable of point.
+    The values are recorded on a tape in one evaluation, then a single backward sweep over the tape
+    accumulates the derivative of the result with respect to every recorded value."""
+    lib, point = _library(point)
+    tape = []
+    inputs = {name: Adjoint(value, tape, lib=lib) for name, value in point.items()}
+    if lib is math:
+        value, partials = _backward(expr._value(AutodiffLibrary(math, Adjoint), inputs), tape, inputs)
+        return value, {name: float(partial) for name, partial in partials.items()}
+
+    shape = _shape(point)
+    with np.errstate(all="ignore"):
+        value, partials = _backward(expr._value(AutodiffLibrary(np, Adjoint), inputs), tape, inputs)
+    return np.broadcast_to(value, shape).copy(), {name: np.broadcast_to(partial, shape).copy() for name, partial in partials.items()}
+
+
+def _backward(result, tape: list, inputs: dict) -> tuple:
+    if not isinstance(result, Adjoint):
+        # Constant expression
+        return result, {name: 0.0 for name in inputs}
+    adjoints = [0] * len(tape)
+    adjoints[result.index] = 1
+    # Operations are recorded after their operands, so the tape in reverse is a topological order
+    for recorded in reversed(tape[: result.index + 1]):
+        adjoint = adjoints[recorded.index]
+        for operand, partial in recorded.operands:
+            adjoints[operand.index] += adjoint * partial
+    return result.value, {name: adjoints[recorded.index] for name, recorded in inputs.items()}
+
+
+def _library(point: dict) -> tuple:
+    """math for a point of floats, else numpy with every value as an array"""
+    if all(isinstance(value, (int, float)) for value in point.values()):
+        return math, dict(point)
+    if np is None:
+        raise ImportError("Automatic differentiation over arrays requires NumPy")
+    return np, {name: np.asarray(value, dtype=float) for name, value in point.items()}
+
+
+def _shape(point: dict) -> tuple:
+    return np.broadcast_shapes(*(np.shape(value) for value in point.values()))
+
+
+def _variable(x, order: int, lib) -> Taylor:
+    # The series of x itself around x: x + h
+    return Taylor([x, 1] + [0] * (order - 1), lib)
+
+
+def _derivatives(series, order: int) -> list:
+    if not isinstance(series, Taylor):
+        # Constant expression
+        return [series] + [0.0] * order
+    return [coefficient * factorial(k) for k, coefficient in enumerate(series.coefficients[: order + 1])]
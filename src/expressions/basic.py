@@ -1,24 +1,278 @@
-from abc import ABC, abstractmethod
+import keyword
+import math
+import weakref
+from abc import ABCMeta, abstractmethod
+from functools import partial, reduce
+from itertools import count, islice
+from typing import Iterator
 
+from . import guards, instrumentation
+from .cache import DERIVATIVE_CACHE, SIMPLIFY_CACHE, LRUCache
 
-class Expression(ABC):
-    def __init__(self, argument: "Expression" = None, derivative_fn: callable = None, precedence_order: int = 1, fn_str: str = None):
-        self.argument = argument
-        self.derivative_fn = derivative_fn
-        self.precedence_order = precedence_order
-        self.fn_str = fn_str
+try:
+    import numpy as np
+except ImportError:  # NumPy is only required by Expression.evaluate_array
+    np = None
 
-    def derivative(self) -> "Expression":
-        """Chain rule"""
-        return Product(self.argument.derivative(), self.derivative_fn(self.argument))
+
+# Every live node, keyed by its structure. Values are weak so unused trees are still collected.
+_INTERN_TABLE: "weakref.WeakValueDictionary[tuple, Expression]" = weakref.WeakValueDictionary()
+
+
+class ExpressionMeta(ABCMeta):
+    """Hash-consing metaclass: structurally identical expressions are the same (immutable) object"""
+
+    def __call__(cls, *args, **kwargs):
+        node = super().__call__(*args, **kwargs)
+        key = node._key()
+        interned = _INTERN_TABLE.get(key)
+        collector = instrumentation._active
+        if collector is not None:
+            collector.allocations[cls.__name__] += 1
+            if interned is None:
+                collector.new_nodes[cls.__name__] += 1
+        if interned is None:
+            # Sizes are kept up to date on construction, from the (already built) children
+            children = node.children
+            object.__setattr__(node, "_size", 1 + sum(child._size for child in children))
+            object.__setattr__(node, "_depth", 1 + max((child._depth for child in children), default=0))
+            object.__setattr__(node, "_hash", hash(key))
+            object.__setattr__(node, "_frozen", True)
+            _INTERN_TABLE[key] = node
+        else:
+            node = interned
+        guard = guards._active
+        if guard is not None:
+            guard.check(node)
+        return node
+
+
+_MISSING = object()
+
+
+def _bottom_up(root: "Expression", rule: callable, cache: LRUCache = None, stop: callable = None, children: callable = None) -> object:
+    """Computes rule(node, *results_of_children) for every distinct node of the DAG under root,
+    children first, with an explicit stack (deep trees do not hit the recursion limit).
+    Results are looked up in / stored into cache when given. Nodes for which stop(node) is true
+    are their own result and their subtree is not visited. children(node), when given, replaces node.children."""
+    results = {}
+    stack = [(root, None)]
+    collector = instrumentation._active
+    guard = guards._active
+    while stack:
+        if collector is not None and len(stack) > collector.max_stack_depth:
+            collector.max_stack_depth = len(stack)
+        if guard is not None:
+            guard.check_time()
+        node, node_children = stack.pop()
+        if node in results:
+            continue
+        if node_children is not None:
+            # Second visit: the children are done
+            result = rule(node, *[results[child] for child in node_children])
+            results[node] = result
+            if cache is not None:
+                cache.put(node, result)
+            continue
+        if stop is not None and stop(node):
+            results[node] = node
+            continue
+        if cache is not None:
+            result = cache.get(node, _MISSING)
+            if result is not _MISSING:
+                if guard is not None and isinstance(result, Expression):
+                    # Built earlier, possibly outside the limits: checked like a new node
+                    guard.check(result)
+                results[node] = result
+                continue
+        node_children = node.children if children is None else children(node)
+        stack.append((node, node_children))
+        stack.extend((child, None) for child in reversed(node_children) if child not in results)
+    return results[root]
+
+
+def _schedule(root: "Expression") -> tuple[tuple, tuple[int, ...]]:
+    """(node._evaluate, positions of its children) for every distinct node under root, children first,
+    and the positions of the children of root. root itself is left out, so it holds no reference to itself."""
+    positions = {}
+    steps = []
+
+    def add(node, *children):
+        if node is not root:
+            positions[node] = len(steps)
+            steps.append((node._evaluate, tuple(positions[child] for child in node.children)))
+
+    _bottom_up(root, add)
+    return tuple(steps), tuple(positions[child] for child in root.children)
+
+
+# f'(u) for the nodes f(u) differentiated by the chain rule, keyed by node class: rule(node) -> f'(node.argument).
+# Rules are declared once per class (next to it, in its module) instead of stored on every node.
+DERIVATIVE_RULES: dict[type, callable] = {}
+
+
+def _derivative_node(variable: "Variable", node: "Expression", *child_derivatives: "Expression") -> "Expression":
+    if child_derivatives:
+        return node._derivative(*child_derivatives)
+    return node._derivative(variable)
+
+
+class _KeyedCache:
+    """View of an LRUCache storing its entries under (prefix, key), e.g. derivatives with respect to y"""
+
+    def __init__(self, cache: LRUCache, prefix):
+        self.cache = cache
+        self.prefix = prefix
+
+    def get(self, key, default=None):
+        return self.cache.get((self.prefix, key), default)
+
+    def put(self, key, value) -> None:
+        self.cache.put((self.prefix, key), value)
+
+
+def _simplify_node(node: "Expression", *children: "Expression") -> "Expression":
+    result = node._simplify(*children)
+    if result is node:
+        # A node whose simplification is itself is in normal form: later passes skip its subtree
+        object.__setattr__(node, "_normal", True)
+    return result
+
+
+def _is_normal(node: "Expression") -> bool:
+    return node._normal
+
+
+def _simplify_operands(node: "Expression") -> list["Expression"]:
+    return node._operands()
+
+
+def _variables_node(node: "Expression", *child_variables: frozenset) -> frozenset:
+    return node._variables().union(*child_variables)
+
+
+def _point(x, values: dict) -> dict:
+    """Variable name -> value mapping from the x argument and the other variables given by name"""
+    if x is None:
+        return values
+    return {"x": x, **values}
+
+
+def interned_count() -> int:
+    """Number of distinct expression nodes currently alive"""
+    return len(_INTERN_TABLE)
+
+
+class Expression(metaclass=ExpressionMeta):
+    # Slots instead of a __dict__ per node. What is the same for every node of a class
+    # (precedence_order, fn_str, op_symbol, _fn_name) is a class attribute.
+    __slots__ = (
+        "argument",
+        "_hash",
+        "_size",
+        "_depth",
+        "_frozen",
+        "_normal",
+        "_compiled",
+        "_schedule",  # Evaluation order of the distinct nodes, see _value
+        "_order",  # Structural sort key, see _order_key
+        "_flat_terms",  # Operands as a flattened sum, see _additive_terms
+        "_flat_factors",  # Operands as a flattened product, see _factors
+        "__weakref__",  # For the intern table
+    )
+    precedence_order = 1
+    fn_str = None
+    _fn_name = None  # Name of the math (and NumPy) function applied to the argument
+
+    def __init__(self, argument: "Expression" = None):
+        # Slots have no class-level defaults, every cache starts empty here
+        initialize = object.__setattr__
+        initialize(self, "_frozen", False)
+        initialize(self, "_hash", None)
+        initialize(self, "_normal", False)
+        initialize(self, "_compiled", None)
+        initialize(self, "_schedule", None)
+        initialize(self, "_order", None)
+        initialize(self, "_flat_terms", None)
+        initialize(self, "_flat_factors", None)
+        initialize(self, "argument", argument)
+
+    def derivative(self, variable: "Variable | str" = "x") -> "Expression":
+        """Symbolic (partial) derivative with respect to variable, built bottom-up from the _derivative
+        rule of every node. Leaves receive the variable, other nodes the derivatives of their children."""
+        variable = Variable(variable) if isinstance(variable, str) else variable
+        if variable.name == "x":
+            return _bottom_up(self, partial(_derivative_node, variable), cache=DERIVATIVE_CACHE)
+        return _bottom_up(self, partial(_derivative_node, variable), cache=_KeyedCache(DERIVATIVE_CACHE, variable))
+
+    def _derivative(self, argument_derivative: "Expression") -> "Expression":
+        """Chain rule, given the derivative of the argument"""
+        return Product(argument_derivative, DERIVATIVE_RULES[type(self)](self))
+
+    def derivatives(self, variable: "Variable | str" = "x") -> Iterator["Expression"]:
+        """Lazy sequence of the simplified derivatives of every order, starting with the expression itself.
+        Each order is differentiated from the previous one, already simplified."""
+        expr = self.simplify_fully()
+        for order in count(1):
+            yield expr
+            try:
+                expr = expr.derivative(variable).simplify_fully()
+            except (OverflowError, ZeroDivisionError) as error:
+                raise ValueError(f"Cannot compute the derivative of order {order} of {self}: {error}") from error
+
+    def nth_derivative(self, n: int, variable: "Variable | str" = "x") -> "Expression":
+        """Simplified n-th derivative, term by term. Terms with a closed form (sin, cos, exp, sinh, cosh, ln, powers
+        and c / u ^ k of a linear argument, polynomials) get it directly, the others are differentiated order by order.
+        Lower orders are memoized by the derivative and simplification caches, so asking for n + 1 after n is one step."""
+        if n < 0:
+            raise ValueError(f"n must be non-negative, got: {n}")
+        variable = Variable(variable) if isinstance(variable, str) else variable
+        expr = self.simplify_fully()
+        if n == 0:
+            return expr
+        terms = []
+        try:
+            for coefficient, term in _additive_terms(expr):
+                derivative = term._nth_derivative(n, variable)
+                if derivative is None:
+                    derivative = next(islice(term.derivatives(variable), n, None))
+                # Not _scaled: a whole derivative (e.g. 8 / x ^ 3) is not the monomial of a coefficient
+                if coefficient == -1:
+                    derivative = Negation(derivative)
+                elif coefficient != 1:
+                    derivative = Product(Constant(coefficient), derivative)
+                terms.append(derivative)
+            return reduce(Sum, terms).simplify_fully()
+        except (OverflowError, ZeroDivisionError) as error:
+            # Coefficients past the float range, or a fold that divides by them
+            raise ValueError(f"Cannot compute the derivative of order {n} of {self}: {error}") from error
+
+    def _nth_derivative(self, n: int, variable: "Variable") -> "Expression | None":
+        """Closed form of the n-th derivative (n >= 1), None when this node has none"""
+        return None
 
     def simplify(self) -> "Expression":
-        """Method for simplifying expresion, should be overwritten in some expressions"""
-        # If argument is None there is no possible simplification
-        if self.argument is None:
-            return self
-        # Else we are instanciating the same class but with argument simplified
-        return self.__class__(self.argument.simplify())
+        """One simplification pass, applying the _simplify rule of every node bottom-up"""
+        return _bottom_up(self, _simplify_node, cache=SIMPLIFY_CACHE, stop=_is_normal, children=_simplify_operands)
+
+    def _operands(self) -> list["Expression"]:
+        """Sub-expressions simplified before this node and passed to _simplify (its children by default)"""
+        return list(self.children)
+
+    def _simplify(self, *children: "Expression") -> "Expression":
+        """Simplification of this node given its simplified children, should be overwritten in some expressions"""
+        # By default we are instanciating the same class but with the children simplified
+        return self._with_children(*children)
+
+    def simplify_fully(self, max_passes: int = 100) -> "Expression":
+        """Simplifies until a fixed point is reached (at most max_passes passes).
+        Subtrees already in normal form are skipped, so each pass only revisits what changed."""
+        expr = self
+        for _ in range(max_passes):
+            if expr._normal:
+                break
+            expr = expr.simplify()
+        return expr
 
     def equals(self, value: float):
         """Check if expression is a constant with given value"""
@@ -26,233 +280,807 @@ class Expression(ABC):
             return False
         return self.value == value
 
-    def __eq__(self, other: "Expression") -> bool: 
-        if type(self) != type(other): # This is a simplification, may not work in some cases
-            return False
+    @property
+    def children(self) -> tuple["Expression", ...]:
+        """Direct sub-expressions"""
+        return () if self.argument is None else (self.argument,)
+
+    @property
+    def size(self) -> int:
+        """Number of nodes as printed (a subtree used twice counts twice), kept up to date on construction"""
+        return self._size
 
-        if isinstance(self, Conjunction):
-            return (self.left == other.left) and (self.right == other.right)
+    @property
+    def depth(self) -> int:
+        """Number of nodes on the longest path from this node to a leaf"""
+        return self._depth
 
-        if isinstance(self, Constant):
-            return self.value == other.value
+    def _with_children(self, *children: "Expression") -> "Expression":
+        """Same node over new children (self when they are unchanged)"""
+        if children == self.children:
+            return self
+        return self.__class__(*children)
 
-        if isinstance(self, Variable):
-            return True
+    def _args(self) -> tuple:
+        """Constructor arguments, used for interning and pickling"""
+        return (self.argument,)
 
-        if self.argument is not None:
-            return self.argument == other.argument
+    def _power(self) -> tuple["Expression", float]:
+        """This node as base ^ exponent, used to collect equal bases in products"""
+        return self, 1
 
-        return False
+    def _polynomial_terms(self) -> tuple | None:
+        """(degree, coefficient) terms when this node is a polynomial in x, None otherwise"""
+        return None
 
-    @abstractmethod
-    def __call__(self, x: float) -> float: ...
+    def _key(self) -> tuple:
+        """Structural identity. Children are already interned, so they hash and compare in O(1)"""
+        return (self.__class__, *self._args())
+
+    def __eq__(self, other: "Expression") -> bool:
+        # Nodes are interned, so structural equality is identity
+        return self is other
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __setattr__(self, name, value):
+        if self._frozen:
+            raise AttributeError(f"{self.__class__.__name__} expressions are immutable")
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name):
+        if self._frozen:
+            raise AttributeError(f"{self.__class__.__name__} expressions are immutable")
+        super().__delattr__(name)
+
+    def __reduce__(self):
+        # Rebuild through the constructor so unpickled trees are interned in the new process
+        return (self.__class__, self._args())
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __call__(self, x: float = None, **values: float) -> float:
+        """Value at x, other variables are given by name: f(1.0, y=2.0)"""
+        return self._value(math, _point(x, values))
+
+    def _value(self, lib, point: dict):
+        """Value of the whole expression at point (variable name -> value), one _evaluate call per distinct node.
+        Nodes are evaluated in a post-order computed once per expression, without walking the tree again."""
+        schedule = self._schedule
+        if schedule is None:
+            schedule = _schedule(self)
+            object.__setattr__(self, "_schedule", schedule)
+        steps, root_children = schedule
+        values = []
+        append = values.append
+        for evaluate, children in steps:
+            if not children:
+                append(evaluate(lib, point))
+            elif len(children) == 1:
+                append(evaluate(lib, point, values[children[0]]))
+            elif len(children) == 2:
+                append(evaluate(lib, point, values[children[0]], values[children[1]]))
+            else:
+                append(evaluate(lib, point, *[values[child] for child in children]))
+        return self._evaluate(lib, point, *[values[child] for child in root_children])
+
+    def evaluate_array(self, xs=None, **values) -> "np.ndarray":
+        """Evaluates the expression at every point of xs (and of the other variables' arrays, broadcast
+        together), one NumPy operation per distinct node. Points outside the domain give nan or inf instead of raising."""
+        if np is None:
+            raise ImportError("evaluate_array requires NumPy")
+        point = {name: np.asarray(value, dtype=float) for name, value in _point(xs, values).items()}
+        with np.errstate(all="ignore"):
+            result = self._value(np, point)
+        return np.broadcast_to(result, np.broadcast_shapes(*(value.shape for value in point.values()))).copy()
+
+    def variables(self) -> tuple[str, ...]:
+        """Sorted names of the variables the expression depends on"""
+        return tuple(sorted(_bottom_up(self, _variables_node)))
+
+    def _variables(self) -> frozenset:
+        """Variables of this node itself (not of its children)"""
+        return frozenset()
+
+    def gradient(self, x: float = None, **values: float) -> tuple[float, dict[str, float]]:
+        """Value and partial derivatives at the given point (variable name -> partial), all computed in
+        a single backward sweep over the tree by reverse-mode automatic differentiation. Values can be NumPy arrays."""
+        from .autodiff import gradient  # autodiff builds on this module
+
+        return gradient(self, _point(x, values))
+
+    def compile(self) -> callable:
+        """Generates a single Python function f(x, ...) equivalent to __call__ (cached on the node).
+        Subexpressions used more than once are hoisted into locals and evaluated once."""
+        if self._compiled is None:
+            from .cse import common_subexpressions  # cse builds on this module
+
+            object.__setattr__(self, "_compiled", common_subexpressions(self).compile())
+        return self._compiled
+
+    def derivatives_at(self, x, order: int = 1, **values) -> list:
+        """[f(x), f'(x), ..., f^(order)(x)] by forward-mode automatic differentiation, without building
+        derivative trees. x is a float, or an array of points (requires NumPy). Other variables are given by name."""
+        from .autodiff import derivatives_at  # autodiff builds on this module
 
-    def _add_parentheses(self, child: "Expression") -> str:
+        return derivatives_at(self, x, order, values)
+
+    def _source(self, *children: str) -> str:
+        """Python source evaluating this node, given the source of its children"""
+        return f"{self._fn_name}({children[0]})"
+
+    def _evaluate(self, lib, point, *values):
+        """Value of this node given the values of its children.
+        lib is math for scalars (__call__), numpy for arrays (evaluate_array)
+        or an AutodiffLibrary (derivatives_at and gradient). point maps variable names to values"""
+        return getattr(lib, self._fn_name)(*values)
+
+    def _add_parentheses(self, child: "Expression") -> list:
         if child.precedence_order > self.precedence_order:
-            return f"({child})"
-        return str(child)
-    
+            return ["(", child, ")"]
+        return [child]
+
     def __str__(self):
-        return f"{self.fn_str}({self.argument})"
+        # Pieces are written left to right from an explicit stack, so output size bounds the memory used
+        pieces = []
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                pieces.append(item)
+            else:
+                stack.extend(reversed(item._format()))
+        return "".join(pieces)
+
+    def _format(self) -> list:
+        """String of this node as a list of literal strings and child expressions"""
+        return [f"{self.fn_str}(", self.argument, ")"]
 
 class Constant(Expression):
+    __slots__ = ("value",)
+    precedence_order = 0
+
     def __init__(self, value: float):
-        super().__init__(precedence_order=0)
+        super().__init__()
         self.value = value
 
-    def derivative(self) -> "Constant":
+    def _args(self) -> tuple:
+        return (self.value,)
+
+    def _key(self) -> tuple:
+        # Type and repr keep 2, 2.0 and -0.0 apart, and let nan be interned like any other value
+        return (Constant, type(self.value), repr(self.value))
+
+    def _derivative(self, variable: "Variable") -> "Constant":
         return Constant(0)
 
-    def __call__(self, x: float) -> float:
+    def _source(self) -> str:
+        if self.value != self.value or self.value in (math.inf, -math.inf):
+            return f"_float('{self.value}')"
+        return repr(self.value)
+
+    def _evaluate(self, lib, point):
+        if lib is np:
+            # NumPy scalar, so division by zero and negative powers follow array semantics
+            return np.float64(self.value)
         return self.value
 
-    def __str__(self):
-        return str(self.value)
+    def _format(self) -> list:
+        return [str(self.value)]
+
+
+def _variable_value(point: dict, name: str) -> float:
+    try:
+        return point[name]
+    except KeyError:
+        raise ValueError(f"No value given for variable {name}") from None
 
 
 class Variable(Expression):
-    def __init__(self):
-        super().__init__(precedence_order=0)
+    __slots__ = ("name",)
+    precedence_order = 0
 
-    def derivative(self) -> Constant:
-        return Constant(1)
+    def __init__(self, name: str = "x"):
+        # Names become parameters of compiled functions: keywords would not compile, and names
+        # starting with an underscore are kept for what the compiled code uses (_float, _s0, ...)
+        if not name.isidentifier() or keyword.iskeyword(name) or name.startswith("_"):
+            raise ValueError(f"Invalid variable name: {name!r}")
+        super().__init__()
+        self.name = name
 
-    def __call__(self, x: float) -> float:
-        return x
+    def _args(self) -> tuple:
+        return (self.name,)
 
-    def __str__(self):
-        return "x"
+    def _derivative(self, variable: "Variable") -> Constant:
+        return Constant(1 if variable is self else 0)
+
+    def _variables(self) -> frozenset:
+        return frozenset((self.name,))
+
+    def _polynomial_terms(self) -> tuple | None:
+        # Polynomials (and SparsePolynomial) are in x only
+        return ((1, 1),) if self.name == "x" else None
+
+    def _source(self) -> str:
+        return self.name
+
+    def _evaluate(self, lib, point):
+        return _variable_value(point, self.name)
+
+    def _format(self) -> list:
+        return [self.name]
 
 
 class Negation(Expression):
+    __slots__ = ()
+    precedence_order = 1
+
     def __init__(self, argument: Expression):
-        super().__init__(argument, precedence_order=1)
-
-    def derivative(self) -> "Negation":
-        return Negation(self.argument.derivative()).simplify()
-
-    def simplify(self):
-        arg = self.argument.simplify()
-        if isinstance(arg, Negation):
-            return arg.argument
-        if isinstance(arg, Constant):
-            return Constant(-arg.value)
-        if isinstance(arg, Sum):
-            return Sum(Negation(arg.left), Negation(arg.right))
-        if isinstance(arg, Subtraction):
-            return Subtraction(arg.right, arg.left)
-        return Negation(arg)
-
-    def __call__(self, x: float) -> float:
-        return -(self.argument(x))
+        super().__init__(argument)
 
-    def __str__(self):
-        argument_str = self._add_parentheses(self.argument)
-        return f"-{argument_str}"
+    def _derivative(self, argument_derivative: Expression) -> Expression:
+        return Negation(argument_derivative).simplify()
+
+    def _operands(self) -> list[Expression]:
+        return [term for _, term in _additive_terms(self)]
+
+    def _simplify(self, *terms: Expression) -> Expression:
+        return _collect_terms(self, terms)
+
+    def _source(self, argument: str) -> str:
+        return f"-{argument}"
+
+    def _evaluate(self, lib, point, value):
+        return -value
+
+    def _format(self) -> list:
+        return ["-", *self._add_parentheses(self.argument)]
 
 
 class Conjunction(Expression):
-    def __init__(self, left: Expression, right: Expression, precedence_order: int, op_symbol: str = None):
+    __slots__ = ("left", "right")
+    op_symbol = None
+    _associative = True  # Whether a op (b op' c) == a op b op' c for operators of the same precedence
+
+    def __init__(self, left: Expression, right: Expression):
+        super().__init__()
         self.left = left
         self.right = right
-        self.precedence_order = precedence_order
-        self.op_symbol = op_symbol
-    
+
+    @property
+    def children(self) -> tuple[Expression, Expression]:
+        return (self.left, self.right)
+
+    def _args(self) -> tuple:
+        return (self.left, self.right)
+
     @abstractmethod
-    def derivative(self) -> Expression: ...
+    def _derivative(self, left_derivative: Expression, right_derivative: Expression) -> Expression: ...
 
     @abstractmethod
-    def simplify(self) -> Expression: ...
+    def _simplify(self, *operands: Expression) -> Expression: ...
 
-    def __str__(self):
-        left_str = self._add_parentheses(self.left)
-        right_str = self._add_parentheses(self.right)
-        return f"{left_str} {self.op_symbol} {right_str}"
+    def _source(self, left: str, right: str) -> str:
+        return f"{left} {self.op_symbol} {right}"
+
+    def _format(self) -> list:
+        if not self._associative and self.right.precedence_order >= self.precedence_order:
+            # a - (b + c), a / (b * c)
+            right = ["(", self.right, ")"]
+        else:
+            right = self._add_parentheses(self.right)
+        return [*self._add_parentheses(self.left), f" {self.op_symbol} ", *right]
 
 
 class Sum(Conjunction):
-    def __init__(self, left, right):
-        super().__init__(left, right, precedence_order=4, op_symbol='+')
+    __slots__ = ()
+    precedence_order = 4
+    op_symbol = "+"
 
-    def derivative(self) -> "Sum":
-        return Sum(left=self.left.derivative(), right=self.right.derivative())
+    def _derivative(self, left_derivative: Expression, right_derivative: Expression) -> "Sum":
+        return Sum(left=left_derivative, right=right_derivative)
 
-    def simplify(self):
-        left = self.left.simplify()
-        right = self.right.simplify()
+    def _operands(self) -> list[Expression]:
+        return [term for _, term in _additive_terms(self)]
 
-        if left == Negation(right):
-            return Constant(0)
-        if isinstance(left, Constant) and isinstance(right, Constant):
-            return Constant(left.value + right.value)
-        if isinstance(left, Constant) and left.value == 0:
-            return right
-        if isinstance(right, Constant) and right.value == 0:
-            return left
-        if isinstance(right, Negation):
-            return Subtraction(left, right.argument)
-        if left == right:
-            return Product(Constant(2), left)
-        return Sum(left, right)
+    def _simplify(self, *terms: Expression) -> Expression:
+        return _collect_terms(self, terms)
 
-    def __call__(self, x: float) -> float:
-        return self.left(x) + self.right(x)
+    def _evaluate(self, lib, point, left, right):
+        return left + right
 
 
 class Subtraction(Conjunction):
-    def __init__(self, left, right):
-        super().__init__(left, right, precedence_order=4, op_symbol='-')
+    __slots__ = ()
+    precedence_order = 4
+    op_symbol = "-"
+    _associative = False
 
-    def derivative(self) -> "Subtraction":
-        return Subtraction(left=self.left.derivative(), right=self.right.derivative())
+    def _derivative(self, left_derivative: Expression, right_derivative: Expression) -> "Subtraction":
+        return Subtraction(left=left_derivative, right=right_derivative)
 
-    def simplify(self):
-        left = self.left.simplify()
-        right = self.right.simplify()
+    def _operands(self) -> list[Expression]:
+        return [term for _, term in _additive_terms(self)]
 
-        if left == right:
-            return Constant(0)
-        if isinstance(left, Constant) and isinstance(right, Constant):
-            return Constant(left.value - right.value)
-        if isinstance(left, Constant) and left.value == 0:
-            return Negation(right)
-        if isinstance(right, Constant) and right.value == 0:
-            return left
-        return Subtraction(left, right)
+    def _simplify(self, *terms: Expression) -> Expression:
+        return _collect_terms(self, terms)
 
-    def __call__(self, x: float) -> float:
-        return self.left(x) - self.right(x)
+    def _evaluate(self, lib, point, left, right):
+        return left - right
 
 
 class Product(Conjunction):
-    def __init__(self, left, right):
-        super().__init__(left, right, precedence_order=3, op_symbol='*')
+    __slots__ = ()
+    precedence_order = 3
+    op_symbol = "*"
 
-    def derivative(self) -> Sum:
+    def _derivative(self, left_derivative: Expression, right_derivative: Expression) -> Sum:
         return Sum(
-            Product(left=self.left.derivative(), right=self.right),
-            Product(left=self.left, right=self.right.derivative()),
+            Product(left=left_derivative, right=self.right),
+            Product(left=self.left, right=right_derivative),
         )
 
-    def simplify(self): # Refactor this method (and others simplify). Probably adding properties as distributive, associative, neutral element...
-        left = self.left.simplify()
-        right = self.right.simplify()
+    def _operands(self) -> list[Expression]:
+        return [_factor_operand(exponent, factor) for exponent, factor in _factors(self)]
 
-        if isinstance(left, Constant) and isinstance(right, Constant):
-            return Constant(left.value * right.value)
-        if isinstance(left, Constant) and left.value == 0:
-            return Constant(0)
-        if isinstance(right, Constant) and right.value == 0:
-            return Constant(0)
-        if isinstance(left, Constant) and left.value == 1:
-            return right
-        if isinstance(right, Constant) and right.value == 1:
-            return left
-        if isinstance(left, Constant) and left.value == -1:
-            return Negation(right)
-        if isinstance(right, Constant) and right.value == -1:
-            return Negation(left)
-        if isinstance(left, Negation) and isinstance(right, Negation):
-            return Product(left.argument, right.argument)
-        if isinstance(left, Negation):
-            return Negation(Product(left.argument, right))
-        if isinstance(right, Negation):
-            return Negation(Product(left, right.argument))
-        return Product(left, right)
-
-    def __call__(self, x: float) -> float:
-        return self.left(x) * self.right(x)
+    def _simplify(self, *factors: Expression) -> Expression:
+        return _collect_factors(self, factors)
+
+    def _evaluate(self, lib, point, left, right):
+        return left * right
 
 
 class Division(Conjunction):
+    __slots__ = ()
+    precedence_order = 3
+    op_symbol = "/"
+    _associative = False
+
     def __init__(self, left, right):
         if isinstance(right, Constant) and right.value == 0:
             raise ZeroDivisionError(f"Zero division error: {left} / {right}")
 
-        super().__init__(left, right, precedence_order=3, op_symbol='/')
+        super().__init__(left, right)
+
+    def _derivative(self, left_derivative: Expression, right_derivative: Expression) -> Expression:
+        # u' / v - u * v' / v ^ 2 rather than (u' * v - u * v') / v ^ 2: the second term can cancel against
+        # a power in v (v = w ^ k gives k * u * w' / w ^ (k + 1)), instead of squaring v at every order
+        return Subtraction(
+            Division(left_derivative, self.right),
+            Division(Product(self.left, right_derivative), Product(self.right, self.right)),
+        )
+
+    def _operands(self) -> list[Expression]:
+        return [_factor_operand(exponent, factor) for exponent, factor in _factors(self)]
+
+    def _nth_derivative(self, n: int, variable: "Variable") -> Expression | None:
+        # c / u ^ k is c * u ^ -k, with the closed form of powers of a linear u
+        from .polynomial import Polynomial  # polynomial builds on this module
+
+        if type(self.left) is not Constant:
+            return None
+        base, degree = self.right._power()
+        derivative = Polynomial(base, -degree)._nth_derivative(n, variable)
+        return None if derivative is None else Product(self.left, derivative)
+
+    def _simplify(self, *factors: Expression) -> Expression:
+        return _collect_factors(self, factors)
+
+    def _evaluate(self, lib, point, left, right):
+        return left / right
+
+
+# Sums and products are simplified as n-ary operations: the operands of a whole chain of
+# Sum / Subtraction / Negation (or Product / Division / Negation) nodes are simplified, then
+# constants are folded, like terms (equal bases) collected and the chain rebuilt in canonical order.
+# Node kinds are tested with exact type checks: isinstance goes through ABCMeta and is much slower.
+
+_MINUS_ONE = Constant(-1)
+
+
+def _flatten(expr: Expression, links: callable) -> list[tuple[float, Expression]]:
+    """(multiplicity, operand) for the operands of the chain rooted at expr.
+    links(node) gives the (multiplicity, child) pairs of an inner node of the chain, None for an operand.
+    Multiplicities are propagated through the chain's DAG in topological order, so shared inner nodes
+    are expanded once (Sum(s, s) gives s with multiplicity 2) instead of once per path."""
+    root_links = links(expr)
+    if all(links(child) is None for _, child in root_links) and (len(root_links) == 1 or root_links[0][1] is not root_links[1][1]):
+        # A single node over distinct operands, the common case
+        return [(multiplicity, child) for multiplicity, child in root_links]
+
+    postorder = []
+    node_links = {}
+    stack = [(expr, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            postorder.append(node)
+            continue
+        if node in node_links:
+            continue
+        node_links[node] = links(node)
+        stack.append((node, True))
+        if node_links[node] is not None:
+            stack.extend((child, False) for _, child in reversed(node_links[node]) if child not in node_links)
+
+    operands = []
+    multiplicities = {expr: 1}
+    for node in reversed(postorder):
+        multiplicity = multiplicities[node]
+        if node_links[node] is None:
+            operands.append((multiplicity, node))
+            continue
+        for child_multiplicity, child in node_links[node]:
+            multiplicities[child] = multiplicities.get(child, 0) + multiplicity * child_multiplicity
+    return operands
+
+
+def _additive_links(node: Expression) -> tuple | None:
+    kind = type(node)
+    if kind is Sum:
+        return ((1, node.left), (1, node.right))
+    if kind is Subtraction:
+        return ((1, node.left), (-1, node.right))
+    if kind is Negation:
+        return ((-1, node.argument),)
+    return None
+
+
+def _multiplicative_links(node: Expression) -> tuple | None:
+    kind = type(node)
+    if kind is Product:
+        return ((1, node.left), (1, node.right))
+    if kind is Division:
+        return ((1, node.left), (-1, node.right))
+    if kind is Negation:
+        return ((1, _MINUS_ONE), (1, node.argument))
+    return None
+
+
+def _additive_terms(expr: Expression) -> list[tuple[float, Expression]]:
+    """(coefficient, term) for the distinct operands of the chain of sums, subtractions and negations rooted at expr"""
+    if _additive_links(expr) is None:
+        return [(1, expr)]
+    if expr._flat_terms is None:
+        object.__setattr__(expr, "_flat_terms", _flatten(expr, _additive_links))
+    return expr._flat_terms
+
+
+def _factors(expr: Expression) -> list[tuple[float, Expression]]:
+    """(exponent, factor) for the distinct operands of the chain of products, divisions and negations rooted at expr.
+    Each negation contributes the factor -1."""
+    if _multiplicative_links(expr) is None:
+        return [(1, expr)]
+    if expr._flat_factors is None:
+        object.__setattr__(expr, "_flat_factors", _flatten(expr, _multiplicative_links))
+    return expr._flat_factors
+
+
+def _order_key(node: Expression) -> tuple:
+    """Structural sort key (class name, then arguments), computed once per node"""
+    if node._order is None:
+        if all(child._order is not None for child in node.children):
+            _set_order_key(node)
+        else:
+            _bottom_up(node, _set_order_key, stop=_has_order_key)
+    return node._order
+
 
-    def derivative(self) -> "Division":
-        return Division(
-            Subtraction(
-                Product(self.left.derivative(), self.right),
-                Product(self.left, self.right.derivative()),
-            ),
-            Product(self.right, self.right),
+def _set_order_key(node: Expression, *children: Expression) -> Expression:
+    key = (node.__class__.__name__, *(_order_key(arg) if isinstance(arg, Expression) else arg for arg in node._args()))
+    object.__setattr__(node, "_order", key)
+    return node
+
+
+def _has_order_key(node: Expression) -> bool:
+    return node._order is not None
+
+
+class _StructuralOrder:
+    """Sort key comparing nodes by _order_key. The keys nest as deep as the nodes, so they are compared
+    with an explicit stack (comparing the tuples directly recurses, and fails on deep operands).
+    Keys sorted together share memo, the outcome of the pairs of sub-keys compared so far."""
+
+    __slots__ = ("node", "memo")
+
+    def __init__(self, node: Expression, memo: dict):
+        _order_key(node)
+        self.node = node
+        self.memo = memo
+
+    def __eq__(self, other: "_StructuralOrder") -> bool:
+        # Interned: equal keys are the same node
+        return self.node is other.node
+
+    def __lt__(self, other: "_StructuralOrder") -> bool:
+        return self.node is not other.node and _compare_keys(self.node._order, other.node._order, self.memo) < 0
+
+
+def _compare_keys(left: tuple, right: tuple, memo: dict) -> int:
+    """-1, 0 or 1 as left < right, left == right or left > right, in tuple order.
+    memo maps the ids of two sub-keys to the outcome of their comparison (and the sub-keys, so that
+    the ids are not reused): sorting similar deep operands compares the same pairs over and over."""
+    stack = [(left, right)]
+    path = []  # Pairs of tuples being compared, each one enclosing the next
+    result = 0
+    while stack:
+        left, right = stack.pop()
+        if left is _CLOSE:
+            path.pop()
+            continue
+        if left is right:
+            continue
+        if type(left) is tuple and type(right) is tuple:
+            known = memo.get((id(left), id(right)))
+            if known is not None:
+                result = known[0]
+                break
+            path.append((left, right))
+            # Item by item, then the shorter tuple first
+            stack.append((_CLOSE, None))
+            stack.append((len(left), len(right)))
+            stack.extend(reversed(list(zip(left, right))))
+        elif left != right:
+            result = -1 if left < right else 1
+            break
+    # The first difference decides every enclosing pair
+    for pair in path:
+        memo[id(pair[0]), id(pair[1])] = (result, *pair)
+    return result
+
+
+_CLOSE = object()
+
+
+def _term_order(memo: dict, monomial: Expression) -> tuple:
+    # Powers of variables first, by decreasing degree, then every other term
+    base, degree = monomial._power()
+    if type(base) is Variable:
+        return (0, -degree, base.name)
+    return (1, _StructuralOrder(monomial, memo))
+
+
+def _factor_order(memo: dict, base: Expression) -> tuple:
+    # Variables first, then every other base
+    if type(base) is Variable:
+        return (0, base.name)
+    return (1, _StructuralOrder(base, memo))
+
+
+def _linear_slope(expr: Expression, variable: "Variable") -> float | None:
+    """a when expr is a * variable + b, None otherwise"""
+    slope = expr.derivative(variable).simplify_fully()
+    return slope.value if type(slope) is Constant else None
+
+
+def _cyclic_derivative(node: Expression, n: int, variable: "Variable", cycle: tuple) -> Expression | None:
+    """n-th derivative of f(u) for a linear argument u = a * variable + b, a ^ n * f^(n)(u),
+    where cycle holds the (sign, function) pairs of f^(k) for k = 0, 1, ... repeating"""
+    slope = _linear_slope(node.argument, variable)
+    if slope is None:
+        return None
+    sign, function = cycle[n % len(cycle)]
+    return _scaled(_finite(sign * slope**n), function(node.argument))
+
+
+def _finite(coefficient: float) -> float:
+    """coefficient of a closed form, which must fit in a float (exact integers always do)"""
+    if type(coefficient) is float and not math.isfinite(coefficient):
+        raise OverflowError("coefficient out of the float range")
+    return coefficient
+
+
+def _split_coefficient(term: Expression) -> tuple[float, Expression | None]:
+    """term as coefficient * monomial (monomial None for constants), inverse of _scaled"""
+    kind = type(term)
+    if kind is Constant:
+        return term.value, None
+    if kind is Product and type(term.left) is Constant:
+        return term.left.value, term.right
+    if kind is Division and type(term.left) is Constant:
+        return term.left.value, Division(Constant(1), term.right)
+    return 1, term
+
+
+def _scaled(coefficient: float, monomial: Expression | None) -> Expression:
+    if monomial is None:
+        return Constant(coefficient)
+    if coefficient == 1:
+        return monomial
+    if type(monomial) is Division and type(monomial.left) is Constant:
+        return Division(Constant(coefficient), monomial.right)
+    if coefficient == -1:
+        return Negation(monomial)
+    return Product(Constant(coefficient), monomial)
+
+
+def _collect_terms(node: Expression, terms: tuple[Expression, ...]) -> Expression:
+    """Canonical sum of the simplified terms of node (in _additive_terms order)"""
+    constant = 0
+    coefficients = {}
+    constants = like_terms = distributed = 0  # Rule firings, for instrument()
+    for (multiplicity, _), term in zip(_additive_terms(node), terms):
+        if multiplicity not in (1, -1):
+            # Repeated operand (x + x, or x - x with multiplicity 0), merged by _flatten
+            like_terms += 1
+        # A simplified term can itself be a sum (e.g. 1 * (x + 1))
+        for inner_multiplicity, inner_term in _additive_terms(term):
+            coefficient, monomial = _split_coefficient(inner_term)
+            coefficient *= multiplicity * inner_multiplicity
+            parts = [(coefficient, monomial)]
+            if monomial is not None and _additive_links(monomial) is not None:
+                # c * (a + b) is distributed, so that a and b are collected with the other terms
+                parts = []
+                for part_multiplicity, part in _additive_terms(monomial):
+                    part_coefficient, part = _split_coefficient(part)
+                    parts.append((coefficient * part_multiplicity * part_coefficient, part))
+                distributed += 1
+            for coefficient, monomial in parts:
+                if monomial is None:
+                    constant += coefficient
+                    constants += 1
+                elif monomial in coefficients:
+                    coefficients[monomial] += coefficient
+                    like_terms += 1
+                else:
+                    coefficients[monomial] = coefficient
+
+    if instrumentation._active is not None:
+        polynomial_terms = sum(monomial._polynomial_terms() is not None for monomial in coefficients)
+        instrumentation.record_firings(
+            type(node),
+            {
+                "constant folding": constants > 1,
+                "like terms": like_terms,
+                "cancellation": sum(coefficient == 0 for coefficient in coefficients.values()),
+                "distribution": distributed,
+                "polynomial merge": polynomial_terms + (constant != 0) > 1,
+            },
         )
+    constant, result = _collect_polynomial(coefficients, constant)
+    for monomial in sorted(coefficients, key=partial(_term_order, {})) if len(coefficients) > 1 else coefficients:
+        coefficient = coefficients[monomial]
+        if coefficient == 0:
+            continue
+        if result is None:
+            result = _scaled(coefficient, monomial)
+        elif coefficient < 0:
+            result = Subtraction(result, _scaled(-coefficient, monomial))
+        else:
+            result = Sum(result, _scaled(coefficient, monomial))
+    if result is None:
+        return Constant(constant)
+    if constant < 0:
+        return Subtraction(result, Constant(-constant))
+    if constant != 0:
+        return Sum(result, Constant(constant))
+    return result
+
+
+def _collect_polynomial(coefficients: dict, constant: float) -> tuple[float, Expression | None]:
+    """Merges the polynomial terms of a sum and its constant, removing them from coefficients.
+    Gives (0, SparsePolynomial) when they add up to two terms or more. Otherwise the single
+    remaining term goes back into coefficients (or the constant) and no polynomial is returned."""
+    from .polynomial import SparsePolynomial, polynomial_from_terms, terms_from_coefficients  # polynomial builds on this module
+
+    polynomial = {0: constant}
+    for monomial, coefficient in list(coefficients.items()):
+        terms = monomial._polynomial_terms()
+        if terms is None:
+            continue
+        del coefficients[monomial]
+        for degree, term_coefficient in terms:
+            polynomial[degree] = polynomial.get(degree, 0) + coefficient * term_coefficient
+    terms = terms_from_coefficients(polynomial)
+    if len(terms) > 1:
+        return 0, SparsePolynomial(terms)
+    if not terms or terms[0][0] == 0:
+        return (terms[0][1] if terms else 0), None
+    coefficient, monomial = _split_coefficient(polynomial_from_terms(terms))
+    coefficients[monomial] = coefficient
+    return 0, None
+
+
+def _expand_polynomials(coefficient: float, exponents: dict) -> tuple[float, Expression | None]:
+    """Multiplies the polynomial bases of a product (with positive integer exponents) and its coefficient
+    into one SparsePolynomial, removing them from exponents. Only done when some base is a SparsePolynomial
+    and the degree stays within MAX_EXPANDED_DEGREE."""
+    from .polynomial import MAX_EXPANDED_DEGREE, SparsePolynomial, multiply_terms, power_terms
+
+    if not any(type(base) is SparsePolynomial and exponents[base] > 0 for base in exponents):
+        return coefficient, None
+    bases = [
+        (base, terms)
+        for base, exponent in exponents.items()
+        if type(exponent) is int and exponent > 0 and (terms := base._polynomial_terms()) is not None
+    ]
+    if sum(terms[-1][0] * exponents[base] for base, terms in bases) > MAX_EXPANDED_DEGREE:
+        return coefficient, None
+
+    product = ((0, coefficient),)
+    for base, terms in bases:
+        product = multiply_terms(product, power_terms(terms, exponents.pop(base)))
+    if len(product) > 1:
+        return 1, SparsePolynomial(product)
+    # A single term (e.g. (x + 1) * 0): back to coefficient * x ^ degree
+    if not product:
+        return 0, None
+    degree, coefficient = product[0]
+    if degree:
+        exponents[Variable()] = exponents.get(Variable(), 0) + degree
+    return coefficient, None
+
+
+def _factor_operand(exponent: float, factor: Expression) -> Expression:
+    """What is simplified for a factor of a product: the factor itself, or the base of an integer power.
+    Simplifying the power on its own would expand a polynomial base ((x + 1) ^ 2 gives x ^ 2 + 2 * x + 1)
+    before it can cancel against the same base elsewhere in the product, as in the derivatives of a quotient."""
+    base, degree = factor._power()
+    if base is not factor and type(degree) is int:
+        return base
+    return factor
+
+
+def _collect_factors(node: Expression, factors: tuple[Expression, ...]) -> Expression:
+    """Canonical product of the simplified factors of node (in _factors order)"""
+    from .polynomial import Polynomial  # polynomial builds on this module
+
+    coefficient = 1
+    exponents = {}
+    constants = like_factors = 0  # Rule firings, for instrument()
+    for (exponent, original), factor in zip(_factors(node), factors):
+        if exponent not in (1, -1):
+            # Repeated operand (x * x, or x / x with exponent 0), merged by _flatten
+            like_factors += 1
+        if _factor_operand(exponent, original) is not original:
+            # factor is the simplified base of the power
+            exponent *= original.degree
+        for inner_exponent, inner_factor in _factors(factor):
+            if type(inner_factor) is Constant:
+                power = exponent * inner_exponent
+                if power < 0 and inner_factor.value == 0:
+                    raise ZeroDivisionError(f"Zero division error: {node}")
+                coefficient *= inner_factor.value**power
+                constants += 1
+                continue
+            base, degree = inner_factor._power()
+            if base in exponents:
+                exponents[base] += exponent * inner_exponent * degree
+                like_factors += 1
+            else:
+                exponents[base] = exponent * inner_exponent * degree
+    bases = len(exponents)
+    coefficient, numerator = _expand_polynomials(coefficient, exponents)
+    if instrumentation._active is not None:
+        instrumentation.record_firings(
+            type(node),
+            {
+                "constant folding": constants > 1,
+                "like factors": like_factors,
+                "cancellation": sum(degree == 0 for degree in exponents.values()),
+                "polynomial merge": numerator is not None or len(exponents) != bases,
+                "zero factor": coefficient == 0,
+            },
+        )
+    if coefficient == 0:
+        return Constant(0)
 
-    def simplify(self) -> Expression:
-        left = self.left.simplify()
-        right = self.right.simplify()
-
-        if left == right:
-            return Constant(1)
-        if isinstance(left, Constant) and isinstance(right, Constant):
-            return Constant(left.value / right.value)
-        if isinstance(left, Constant) and left.value == 0:
-            return Constant(0)
-        if isinstance(right, Constant) and right.value == 1:
-            return left
-        return Division(left, right)
-
-    def __call__(self, x: float) -> float:
-        return self.left(x) / self.right(x)
+    denominator = None
+    for base in sorted(exponents, key=partial(_factor_order, {})) if len(exponents) > 1 else exponents:
+        degree = exponents[base]
+        if degree == 0:
+            continue
+        power = base if abs(degree) == 1 else Polynomial(base, abs(degree))
+        if degree > 0:
+            numerator = power if numerator is None else Product(numerator, power)
+        else:
+            denominator = power if denominator is None else Product(denominator, power)
+    monomial = numerator
+    if denominator is not None:
+        monomial = Division(Constant(1) if numerator is None else numerator, denominator)
+    return _scaled(coefficient, monomial)
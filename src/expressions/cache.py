@@ -0,0 +1,84 @@
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Size-bounded mapping that evicts the least recently used entry, with hit/miss/eviction counters"""
+
+    def __init__(self, maxsize: int = 4096):
+        if maxsize < 0:
+            raise ValueError(f"maxsize must be non-negative, got: {maxsize}")
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value) -> None:
+        if self.maxsize == 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, maxsize: int) -> None:
+        """Changes the bound, evicting the oldest entries if needed"""
+        if maxsize < 0:
+            raise ValueError(f"maxsize must be non-negative, got: {maxsize}")
+        self.maxsize = maxsize
+        while len(self._data) > maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drops every entry and resets the counters"""
+        self._data.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups that were hits (0.0 before any lookup)"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __contains__(self, key) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# Process-wide caches. Expressions are interned, so the node itself is the structural key.
+DERIVATIVE_CACHE = LRUCache(maxsize=4096)
+SIMPLIFY_CACHE = LRUCache(maxsize=4096)
+
+
+def cache_stats() -> dict:
+    return {"derivative": DERIVATIVE_CACHE.stats(), "simplify": SIMPLIFY_CACHE.stats()}
+
+
+def clear_caches() -> None:
+    DERIVATIVE_CACHE.clear()
+    SIMPLIFY_CACHE.clear()
@@ -0,0 +1,169 @@
+import math
+from itertools import count
+
+from .basic import Expression, Negation, Sum, Subtraction, Product, Division, _bottom_up, _point
+from .cache import LRUCache
+from .polynomial import Polynomial
+from .power import Power
+
+
+class Reference(Expression):
+    """Leaf standing for a bound subexpression of a LetSequence. Evaluates (and differentiates) as its target"""
+
+    __slots__ = ("name", "target")
+    precedence_order = 0
+
+    def __init__(self, name: str, target: Expression):
+        super().__init__()
+        self.name = name
+        self.target = target
+
+    def _args(self) -> tuple:
+        return (self.name, self.target)
+
+    def _derivative(self, variable: Expression) -> Expression:
+        return self.target.derivative(variable)
+
+    def _variables(self) -> frozenset:
+        return frozenset(self.target.variables())
+
+    def _source(self) -> str:
+        return self.name
+
+    def _evaluate(self, lib, point):
+        return self.target._value(lib, point)
+
+    def _format(self) -> list:
+        return [self.name]
+
+
+class LetSequence:
+    """An expression as a sequence of bindings (name = subexpression) followed by a result.
+    Every bound subexpression appears once, later bindings refer to earlier ones through a Reference."""
+
+    def __init__(self, bindings: list[tuple[Reference, Expression]], result: Expression):
+        self.bindings = bindings
+        self.result = result
+
+    def compile(self) -> callable:
+        """Python function f(x, ...) evaluating each binding once, in order. Its parameters are
+        x and the other variables of the result, sorted by name"""
+        lines = []
+        for reference, expr in self.bindings:
+            lines.append(f"    {reference.name} = {_render(expr, lines)}")
+        result = _render(self.result, lines)
+        parameters = ", ".join(sorted({"x", *self.result.variables()}))
+        source = "\n".join([f"def compiled({parameters}):", *lines, f"    return {result}"])
+        return _compile(source)
+
+    def __call__(self, x: float = None, **values: float) -> float:
+        return self.compile()(**_point(x, values))
+
+    def __len__(self) -> int:
+        return len(self.bindings)
+
+    def __str__(self):
+        lines = [f"{reference} = {expr}" for reference, expr in self.bindings]
+        return "\n".join([*lines, str(self.result)])
+
+
+_MATH_FUNCTIONS = ("sin", "cos", "tan", "sinh", "cosh", "tanh", "exp", "log")
+
+
+def _compile(source: str, **names) -> callable:
+    """The function `compiled` defined by source, seeing only the math functions, float (as _float) and names.
+    Every other name of the namespace starts with an underscore, which no variable name does."""
+    namespace = {"__builtins__": {}, "_float": float, **names}
+    namespace.update((name, getattr(math, name)) for name in _MATH_FUNCTIONS)
+    exec(source, namespace)
+    compiled = namespace["compiled"]
+    compiled.source = source
+    return compiled
+
+
+def common_subexpressions(expr: Expression, min_uses: int = 2) -> LetSequence:
+    """Binds every non-leaf subexpression referenced at least min_uses times in the DAG of expr.
+    Interning already shares identical subtrees, so a reference count per node is enough."""
+    bindings, (result,) = _bind_shared([expr], min_uses)
+    return LetSequence(bindings, result)
+
+
+def _bind_shared(roots: list[Expression], min_uses: int = 2) -> tuple[list[tuple[Reference, Expression]], list[Expression]]:
+    """Bindings of every non-leaf subexpression referenced at least min_uses times in the DAG of
+    all the roots together, and each root rewritten over the references"""
+    references = {}
+    stack = []
+    for root in roots:
+        references[root] = references.get(root, 0) + 1
+        if references[root] == 1:
+            stack.append(root)
+    while stack:
+        for child in stack.pop().children:
+            references[child] = references.get(child, 0) + 1
+            if references[child] == 1:
+                stack.append(child)
+
+    bindings = []
+    # Binding names are t0, t1, ... skipping the names of the variables, which share the source
+    variables = {name for root in roots for name in root.variables()}
+    names = (f"t{n}" for n in count() if f"t{n}" not in variables)
+
+    def replace(node: Expression, *children: Expression) -> Expression:
+        new = node._with_children(*children)
+        if node.children and references[node] >= min_uses:
+            reference = Reference(next(names), node)
+            bindings.append((reference, new))
+            return reference
+        return new
+
+    # Shared between the roots, so a node is replaced (and bound) once
+    replaced = LRUCache(maxsize=len(references))
+    results = [_bottom_up(root, replace, cache=replaced) for root in roots]
+    return bindings, results
+
+
+# Python operator precedence of the source of each class (higher binds tighter), anything else is an atom
+_PYTHON_PRECEDENCE = {Sum: 11, Subtraction: 11, Product: 12, Division: 12, Negation: 13, Power: 14, Polynomial: 14}
+_ATOM = 100
+# Nesting of a rendered subexpression past which it is hoisted into a local, so long chains compile
+# (Python rejects deeply nested sources) and each piece of source is only copied a bounded number of times
+MAX_SOURCE_DEPTH = 32
+
+
+def _operand_precedences(node: Expression) -> tuple[int, ...]:
+    """Lowest precedence each child source can have without parentheses"""
+    kind = type(node)
+    if kind is Power:
+        # The base binds tighter than ** (and -x ** 2 is -(x ** 2)), the exponent can be unary
+        return (_PYTHON_PRECEDENCE[Power] + 1, _PYTHON_PRECEDENCE[Negation])
+    if kind is Polynomial:
+        return (_PYTHON_PRECEDENCE[Power] + 1,)
+    if kind is Negation:
+        return (_PYTHON_PRECEDENCE[Negation],)
+    if kind in _PYTHON_PRECEDENCE:
+        # Left associative: a - (b - c) and a + (b + c) keep their parentheses (and their rounding)
+        return (_PYTHON_PRECEDENCE[kind], _PYTHON_PRECEDENCE[kind] + 1)
+    return (0,) * len(node.children)
+
+
+def _render(expr: Expression, lines: list[str]) -> str:
+    """Python source of expr. References are locals, parentheses are only added where precedence needs them.
+    Subexpressions nested deeper than MAX_SOURCE_DEPTH are assigned to locals, appended to lines first."""
+    def render(node: Expression, *children: tuple[str, int, int]) -> tuple[str, int, int]:
+        sources = []
+        depth = 0
+        for (source, precedence, child_depth), minimum in zip(children, _operand_precedences(node)):
+            if child_depth >= MAX_SOURCE_DEPTH:
+                name = f"_s{len(lines)}"
+                lines.append(f"    {name} = {source}")
+                source, precedence, child_depth = name, _ATOM, 0
+            sources.append(source if precedence >= minimum else f"({source})")
+            depth = max(depth, child_depth)
+        source = node._source(*sources)
+        precedence = _PYTHON_PRECEDENCE.get(type(node), _ATOM)
+        if precedence == _ATOM and source.startswith("-"):
+            # Negative constants
+            precedence = _PYTHON_PRECEDENCE[Negation]
+        return source, precedence, depth + 1
+
+    return _bottom_up(expr, render)[0]
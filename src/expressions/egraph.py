@@ -0,0 +1,350 @@
+import time
+from functools import partial
+from itertools import islice
+
+from .basic import Expression, Constant, Variable, Negation, Sum, Subtraction, Product, Division, _bottom_up
+from .cse import Reference
+from .exponential import Exponential, Logarithm
+from .hyperbolic import Cosh, Sinh, Tanh
+from .polynomial import Polynomial, SparsePolynomial
+from .power import Power
+from .rewrite import Rule, Wildcard
+from .trigonometric import Cos, Sin, Tan
+
+# Evaluation cost of one node of each class, roughly in units of one float addition
+# (measured with CPython's math module). Leaves cost nothing.
+COSTS = {
+    Constant: 0,
+    Variable: 0,
+    Negation: 1,
+    Sum: 1,
+    Subtraction: 1,
+    Product: 1,
+    Division: 1.5,
+    Polynomial: 4,
+    Power: 4,
+    Sin: 3,
+    Cos: 3,
+    Exponential: 3,
+    Logarithm: 3,
+    Tan: 4,
+    Sinh: 4,
+    Cosh: 4,
+    Tanh: 4,
+}
+
+# A rule matching more than MATCH_LIMIT times in a round is skipped for BAN_LENGTH rounds
+# (both doubled every time it happens again)
+MATCH_LIMIT = 1000
+BAN_LENGTH = 2
+
+_CHILD = object()  # Place of a child among the constructor arguments of an e-node
+
+
+class EGraph:
+    """Equivalence classes of expressions. An e-node is an operation over e-classes (not over
+    single expressions), so one e-graph holds every expression reachable by the rewrites applied to it
+    without choosing between them. Classes are merged with a union-find and the hash-consing of
+    e-nodes is restored (congruence closure) by rebuild()."""
+
+    def __init__(self, costs: dict = None):
+        self.costs = COSTS if costs is None else costs
+        self._parents: list[int] = []  # Union-find over class ids
+        self._classes: dict[int, dict] = {}  # Canonical class id -> its e-nodes (as keys, in insertion order)
+        self._memo: dict[tuple, int] = {}  # Canonical e-node -> class id
+        self._kinds: dict[int, set] = {}  # Class id -> classes of its e-nodes, as of the last rebuild()
+
+    def __len__(self) -> int:
+        """Number of e-nodes"""
+        return len(self._memo)
+
+    @property
+    def class_count(self) -> int:
+        return len(self._classes)
+
+    def find(self, class_id: int) -> int:
+        parents = self._parents
+        while parents[class_id] != class_id:
+            parents[class_id] = parents[parents[class_id]]
+            class_id = parents[class_id]
+        return class_id
+
+    def add(self, expr: Expression) -> int:
+        """Class of expr, adding its nodes"""
+        return _bottom_up(expr, self._add_expression_node)
+
+    def _add_expression_node(self, node: Expression, *children: int) -> int:
+        if type(node) is Reference:
+            return self.add(node.target)
+        if type(node) is Wildcard:
+            raise ValueError(f"Wildcard {node.name} cannot be added to an e-graph")
+        if not children:
+            return self.add_node((type(node), (node,), ()))
+        return self.add_node((type(node), _arguments(node), children))
+
+    def add_node(self, enode: tuple) -> int:
+        """Class of the e-node (class, constructor arguments, child class ids)"""
+        enode = self._canonical(enode)
+        class_id = self._memo.get(enode)
+        if class_id is None:
+            class_id = len(self._parents)
+            self._parents.append(class_id)
+            self._classes[class_id] = {enode: None}
+            self._memo[enode] = class_id
+        return self.find(class_id)
+
+    def _canonical(self, enode: tuple) -> tuple:
+        kind, args, children = enode
+        return (kind, args, tuple(self.find(child) for child in children))
+
+    def union(self, first: int, second: int) -> bool:
+        """Merges two classes, returning whether they were distinct. Call rebuild() after a round of unions."""
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return False
+        if len(self._classes[first]) < len(self._classes[second]):
+            first, second = second, first
+        self._parents[second] = first
+        self._classes[first] |= self._classes.pop(second)
+        return True
+
+    def rebuild(self) -> None:
+        """Restores the invariants after unions: every e-node canonical, and equal e-nodes in one class"""
+        changed = True
+        while changed:
+            changed = False
+            memo = {}
+            for class_id, enodes in list(self._classes.items()):
+                for enode in list(enodes):
+                    class_id = self.find(class_id)
+                    enode = self._canonical(enode)
+                    other = memo.setdefault(enode, class_id)
+                    if self.find(other) != self.find(class_id):
+                        # Two classes holding the same e-node are equal (congruence)
+                        self.union(other, class_id)
+                        changed = True
+            self._memo = {enode: self.find(class_id) for enode, class_id in memo.items()}
+        self._classes = {class_id: dict.fromkeys(map(self._canonical, enodes)) for class_id, enodes in self._classes.items()}
+        self._kinds = {class_id: {enode[0] for enode in enodes} for class_id, enodes in self._classes.items()}
+
+    def classes_by_kind(self) -> dict[type, list[int]]:
+        """Node class -> ids of the e-classes holding an e-node of that class (as of the last rebuild())"""
+        index = {}
+        for class_id, kinds in self._kinds.items():
+            for kind in kinds:
+                index.setdefault(kind, []).append(class_id)
+        return index
+
+    def match(self, pattern: Expression, class_id: int, bindings: dict = None):
+        """Every binding (wildcard name -> class id) under which pattern is in the class.
+        The e-graph must be rebuilt since the last unions."""
+        # Partial matches: bindings so far and the (sub-pattern, class id) pairs still to match
+        stack = [({} if bindings is None else bindings, ((pattern, class_id),))]
+        while stack:
+            bindings, pending = stack.pop()
+            if not pending:
+                yield bindings
+                continue
+            (pattern, class_id), rest = pending[0], pending[1:]
+            # Reversed, so the alternatives are tried in order
+            stack.extend((extended, children + rest) for extended, children in reversed(self._match_node(pattern, class_id, bindings)))
+
+    def _match_node(self, pattern: Expression, class_id: int, bindings: dict) -> list[tuple[dict, tuple]]:
+        """Ways the root of pattern is in the class: (bindings, (child pattern, child class id) pairs left to match)"""
+        class_id = self.find(class_id)
+        if type(pattern) is Wildcard:
+            bound = bindings.get(pattern.name)
+            if bound is None:
+                kinds = self._kinds[class_id]
+                if pattern.kind is None or pattern.kind in kinds or any(issubclass(kind, pattern.kind) for kind in kinds):
+                    return [({**bindings, pattern.name: class_id}, ())]
+            elif bound == class_id:
+                return [(bindings, ())]
+            return []
+        if not pattern.children:
+            if (type(pattern), (pattern,), ()) in self._classes[class_id]:
+                return [(bindings, ())]
+            return []
+        kind, args = type(pattern), _arguments(pattern)
+        # Classes each child must hold an e-node of (None for wildcards), to skip e-nodes early
+        required = [None if type(child) is Wildcard else type(child) for child in pattern.children]
+        kinds = self._kinds
+        return [
+            (bindings, tuple(zip(pattern.children, children)))
+            for enode_kind, enode_args, children in self._classes[class_id]
+            if enode_kind is kind
+            and enode_args == args
+            and all(child_kind is None or child_kind in kinds[self.find(child)] for child_kind, child in zip(required, children))
+        ]
+
+    def instantiate(self, template: Expression, bindings: dict) -> int:
+        """Class of template with its wildcards replaced by the bound classes"""
+        return _bottom_up(template, partial(self._instantiate_node, bindings))
+
+    def _instantiate_node(self, bindings: dict, node: Expression, *children: int) -> int:
+        if type(node) is Wildcard:
+            return bindings[node.name]
+        if not children:
+            return self.add(node)
+        return self.add_node((type(node), _arguments(node), children))
+
+    def costs_of_classes(self) -> dict:
+        """Class id -> ((cost, size), cheapest e-node), iterated to a fixed point"""
+        best = {}
+        changed = True
+        while changed:
+            changed = False
+            for class_id, enodes in self._classes.items():
+                for enode in enodes:
+                    kind, args, children = enode
+                    if not all(child in best for child in children):
+                        continue
+                    cost = self.costs.get(kind, 1) + sum(best[child][0][0] for child in children)
+                    size = 1 + sum(best[child][0][1] for child in children)
+                    if kind is SparsePolynomial:
+                        # Horner's scheme: one product and one sum per term
+                        cost += 2 * len(args[0].terms)
+                    if class_id not in best or (cost, size) < best[class_id][0]:
+                        best[class_id] = ((cost, size), enode)
+                        changed = True
+        return best
+
+    def extract(self, class_id: int, best: dict = None) -> Expression:
+        """Cheapest expression of the class under the cost model. best is a result of costs_of_classes(),
+        computed since the last unions (class_id is then one of its keys)."""
+        if best is None:
+            best = self.costs_of_classes()
+            class_id = self.find(class_id)
+        built = {}
+        # Post-order with an explicit stack. The cheapest e-nodes form a DAG: each is larger than its children.
+        stack = [class_id]
+        while stack:
+            current = stack[-1]
+            if current in built:
+                stack.pop()
+                continue
+            kind, args, children = best[current][1]
+            missing = [child for child in children if child not in built]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            if not children:
+                built[current] = args[0]
+            else:
+                nodes = iter([built[child] for child in children])
+                built[current] = kind(*(next(nodes) if arg is _CHILD else arg for arg in args))
+        return built[class_id]
+
+
+def _arguments(node: Expression) -> tuple:
+    """Constructor arguments of node with _CHILD in place of its children"""
+    return tuple(_CHILD if isinstance(arg, Expression) else arg for arg in node._args())
+
+
+def _matches(graph: EGraph, rule: Rule, index: dict):
+    for class_id in index.get(type(rule.pattern), ()):
+        for bindings in graph.match(rule.pattern, class_id):
+            yield rule, class_id, bindings
+
+
+def egraph_simplify(
+    expr: Expression,
+    rules: list[Rule] = None,
+    max_nodes: int = 10_000,
+    max_iterations: int = 20,
+    time_limit: float = 1.0,
+    costs: dict = None,
+) -> Expression:
+    """Cheapest expression equal to expr under the rules (EGRAPH_RULES by default), by equality saturation.
+    The e-graph starts from the greedy simplification of expr, so the result is never costlier than
+    simplify_fully(). Rewrites are applied until nothing changes or a budget runs out: max_nodes e-nodes,
+    max_iterations rounds or time_limit seconds."""
+    rules = EGRAPH_RULES if rules is None else rules
+    deadline = time.perf_counter() + time_limit
+    graph = EGraph(costs)
+    # Leftovers like 0 * u or u / u, which the greedy pass removes, would make the e-graph
+    # grow without bound (0 = 0 * u = 0 * u * u = ...)
+    root = graph.add(expr.simplify_fully())
+    graph.rebuild()
+
+    bans = {}  # Rule -> (first round it is tried again, times banned)
+    for iteration in range(max_iterations):
+        # Every match of the round is found before any rewrite, on the same e-graph
+        index = graph.classes_by_kind()
+        matches = []
+        for rule in rules:
+            until, times = bans.get(rule, (0, 0))
+            if iteration < until:
+                continue
+            limit = MATCH_LIMIT << times
+            rule_matches = list(islice(_matches(graph, rule, index), limit + 1))
+            if len(rule_matches) > limit:
+                # Backoff: a rule that matches everywhere (associativity, commutativity over a growing
+                # e-graph) is left out for a while, so the other rules still get their turn
+                bans[rule] = (iteration + (BAN_LENGTH << times), times + 1)
+                continue
+            matches.extend(rule_matches)
+        # Conditions and replacement functions receive the cheapest expression of every bound class
+        needs_values = any(rule.condition is not None or not isinstance(rule.replacement, Expression) for rule, _, _ in matches)
+        best = graph.costs_of_classes() if needs_values else None
+
+        changed = False
+        for rule, class_id, bindings in matches:
+            if len(graph) > max_nodes or time.perf_counter() > deadline:
+                break
+            if rule.condition is None and isinstance(rule.replacement, Expression):
+                changed |= graph.union(class_id, graph.instantiate(rule.replacement, bindings))
+                continue
+            values = {name: graph.extract(bound, best) for name, bound in bindings.items()}
+            if rule.condition is not None and not rule.condition(**values):
+                continue
+            if isinstance(rule.replacement, Expression):
+                replacement = graph.instantiate(rule.replacement, bindings)
+            else:
+                replacement = rule.replacement(**values)
+                if replacement is None:
+                    continue
+                replacement = graph.add(replacement)
+            changed |= graph.union(class_id, replacement)
+        graph.rebuild()
+        if not changed or len(graph) > max_nodes or time.perf_counter() > deadline:
+            break
+    return graph.extract(root)
+
+
+_u, _v, _w = Wildcard("u"), Wildcard("v"), Wildcard("w")
+_c, _d = Wildcard("c", Constant), Wildcard("d", Constant)
+
+# Identities explored by egraph_simplify: both directions of the algebraic laws, so the e-graph can
+# reach forms that a greedy pass would have to undo first (factoring, regrouping, merging exponentials)
+EGRAPH_RULES = [
+    Rule(Sum(_u, _v), Sum(_v, _u), name="commute +"),
+    Rule(Product(_u, _v), Product(_v, _u), name="commute *"),
+    Rule(Sum(Sum(_u, _v), _w), Sum(_u, Sum(_v, _w)), name="associate +"),
+    Rule(Sum(_u, Sum(_v, _w)), Sum(Sum(_u, _v), _w), name="associate + back"),
+    Rule(Product(Product(_u, _v), _w), Product(_u, Product(_v, _w)), name="associate *"),
+    Rule(Product(_u, Product(_v, _w)), Product(Product(_u, _v), _w), name="associate * back"),
+    Rule(Sum(Product(_u, _v), Product(_u, _w)), Product(_u, Sum(_v, _w)), name="factor +"),
+    Rule(Subtraction(Product(_u, _v), Product(_u, _w)), Product(_u, Subtraction(_v, _w)), name="factor -"),
+    Rule(Sum(_u, _u), Product(Constant(2), _u), name="double"),
+    Rule(Sum(_u, Negation(_v)), Subtraction(_u, _v), name="subtract"),
+    Rule(Subtraction(_u, Negation(_v)), Sum(_u, _v), name="add"),
+    Rule(Subtraction(_u, _u), Constant(0), name="cancel -"),
+    Rule(Negation(Negation(_u)), _u, name="double negation"),
+    Rule(Product(Constant(-1), _u), Negation(_u), name="negate"),
+    Rule(Product(Constant(1), _u), _u, name="* 1"),
+    Rule(Product(Constant(0), _u), Constant(0), name="* 0"),
+    Rule(Sum(Constant(0), _u), _u, name="+ 0"),
+    Rule(Division(_u, Constant(1)), _u, name="/ 1"),
+    Rule(Division(Product(_u, _v), _v), _u, name="cancel /"),
+    Rule(Product(_u, _u), Polynomial(_u, 2), name="square"),
+    Rule(Product(Exponential(_u), Exponential(_v)), Exponential(Sum(_u, _v)), name="exp +"),
+    Rule(Logarithm(Exponential(_u)), _u, name="ln exp"),
+    Rule(Division(Sin(_u), Cos(_u)), Tan(_u), name="tan"),
+    Rule(Sum(Polynomial(Sin(_u), 2), Polynomial(Cos(_u), 2)), Constant(1), name="pythagoras"),
+    Rule(Sum(_c, _d), lambda c, d: Constant(c.value + d.value), name="fold +"),
+    Rule(Subtraction(_c, _d), lambda c, d: Constant(c.value - d.value), name="fold -"),
+    Rule(Product(_c, _d), lambda c, d: Constant(c.value * d.value), name="fold *"),
+    Rule(Negation(_c), lambda c: Constant(-c.value), name="fold negation"),
+]
@@ -1,33 +1,51 @@
-import math as m
-from .basic import Expression, Division
+from math import factorial
+
+from .basic import DERIVATIVE_RULES, Expression, Division, _cyclic_derivative, _finite, _linear_slope, _scaled
+from .instrumentation import record_firing
+from .polynomial import Polynomial
 
 
 class Logarithm(Expression):
+    __slots__ = ()
+    fn_str = "ln"
+    _fn_name = "log"
+
     def __init__(self, argument: Expression):
-        super().__init__(argument=argument, fn_str="ln")
+        super().__init__(argument)
 
-    def derivative(self) -> Division:
-        return Division(self.argument.derivative(), self.argument)
+    def _derivative(self, argument_derivative: Expression) -> Division:
+        return Division(argument_derivative, self.argument)
 
-    def simplify(self):
-        arg = self.argument.simplify()
+    def _nth_derivative(self, n: int, variable: Expression) -> Expression | None:
+        # (-1) ^ (n - 1) * (n - 1)! * a ^ n / u ^ n for u = a * variable + b
+        slope = _linear_slope(self.argument, variable)
+        if slope is None:
+            return None
+        return _scaled(_finite((-1) ** (n - 1) * factorial(n - 1) * slope**n), Polynomial(self.argument, -n))
+
+    def _simplify(self, arg: Expression) -> Expression:
         if isinstance(arg, Exponential):
+            record_firing(Logarithm, "log of exp")
             return arg.argument
-        return Logarithm(arg)
-
-    def __call__(self, x: float) -> float:
-        return m.log(self.argument(x))
+        return self._with_children(arg)
 
 
 class Exponential(Expression):
+    __slots__ = ()
+    fn_str = "exp"
+    _fn_name = "exp"
+
     def __init__(self, argument: Expression):
-        super().__init__(argument, lambda arg: Exponential(arg), fn_str="exp")
+        super().__init__(argument)
+
+    def _nth_derivative(self, n: int, variable: Expression) -> Expression | None:
+        return _cyclic_derivative(self, n, variable, ((1, Exponential),))
 
-    def simplify(self):
-        arg = self.argument.simplify()
+    def _simplify(self, arg: Expression) -> Expression:
         if isinstance(arg, Logarithm):
+            record_firing(Exponential, "exp of log")
             return arg.argument
-        return Exponential(arg)
+        return self._with_children(arg)
+
 
-    def __call__(self, x):
-        return m.exp(self.argument(x))
+DERIVATIVE_RULES[Exponential] = lambda node: node
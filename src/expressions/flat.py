@@ -0,0 +1,374 @@
+import math
+from array import array
+
+from .basic import Expression, Constant, Variable, Negation, Sum, Subtraction, Product, Division, _bottom_up, _point, _variable_value
+from .cse import Reference
+from .exponential import Exponential, Logarithm
+from .hyperbolic import Cosh, Sinh, Tanh
+from .polynomial import Polynomial, SparsePolynomial, horner, polynomial_from_terms, terms_from_coefficients
+from .power import Power
+from .trigonometric import Cos, Sin, Tan
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only required by FlatExpression.evaluate_array
+    np = None
+
+# Opcodes
+CONSTANT = 0
+VARIABLE = 1
+SPARSE_POLYNOMIAL = 2
+POLYNOMIAL = 3
+NEGATION = 4
+SUM = 5
+SUBTRACTION = 6
+PRODUCT = 7
+DIVISION = 8
+POWER = 9
+SIN, COS, TAN, SINH, COSH, TANH, EXP, LOG = range(10, 18)
+
+_UNARY = {Negation: NEGATION, Sin: SIN, Cos: COS, Tan: TAN, Sinh: SINH, Cosh: COSH, Tanh: TANH, Exponential: EXP, Logarithm: LOG}
+_BINARY = {Sum: SUM, Subtraction: SUBTRACTION, Product: PRODUCT, Division: DIVISION, Power: POWER}
+_CLASSES = {opcode: cls for cls, opcode in [*_UNARY.items(), *_BINARY.items()]}
+_FUNCTIONS = {opcode: cls._fn_name for cls, opcode in _UNARY.items() if cls._fn_name}
+
+
+class FlatExpression:
+    """Expression DAG stored in arrays, one entry per distinct node in postfix order (the root is last).
+    opcodes[i] is the kind of node i. operands[2 * i] and operands[2 * i + 1] are the indices of its
+    children, or of its literal (constant value, variable name, degree or sparse terms) in literals."""
+
+    def __init__(self, opcodes: array, operands: array, literals: list):
+        self.opcodes = opcodes
+        self.operands = operands
+        self.literals = literals
+
+    @classmethod
+    def from_expression(cls, expr: Expression) -> "FlatExpression":
+        builder = _Builder(fold=False)
+        root = builder.add_expression(expr)
+        return builder.build(root)
+
+    def to_expression(self) -> Expression:
+        nodes = []
+        operands, literals = self.operands, self.literals
+        for i, opcode in enumerate(self.opcodes):
+            first, second = operands[2 * i], operands[2 * i + 1]
+            if opcode == CONSTANT:
+                nodes.append(Constant(literals[first]))
+            elif opcode == VARIABLE:
+                nodes.append(Variable(literals[first]))
+            elif opcode == SPARSE_POLYNOMIAL:
+                nodes.append(polynomial_from_terms(literals[first]))
+            elif opcode == POLYNOMIAL:
+                nodes.append(Polynomial(nodes[first], literals[second]))
+            elif opcode in _BINARY.values():
+                nodes.append(_CLASSES[opcode](nodes[first], nodes[second]))
+            else:
+                nodes.append(_CLASSES[opcode](nodes[first]))
+        return nodes[-1]
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the opcode and operand arrays (literals not included)"""
+        return self.opcodes.itemsize * len(self.opcodes) + self.operands.itemsize * len(self.operands)
+
+    def __call__(self, x: float = None, **values: float) -> float:
+        return self._value(math, _point(x, values))
+
+    def evaluate_array(self, xs=None, **values) -> "np.ndarray":
+        """Value at every point of xs (and of the other variables' arrays), like Expression.evaluate_array"""
+        if np is None:
+            raise ImportError("evaluate_array requires NumPy")
+        point = {name: np.asarray(value, dtype=float) for name, value in _point(xs, values).items()}
+        with np.errstate(all="ignore"):
+            result = self._value(np, point)
+        return np.broadcast_to(result, np.broadcast_shapes(*(value.shape for value in point.values()))).copy()
+
+    def _value(self, lib, point: dict):
+        # One pass in array order: children come before their parents
+        values = []
+        operands, literals = self.operands, self.literals
+        for i, opcode in enumerate(self.opcodes):
+            first, second = operands[2 * i], operands[2 * i + 1]
+            if opcode == CONSTANT:
+                value = literals[first] if lib is math else np.float64(literals[first])
+            elif opcode == VARIABLE:
+                # Leaves are evaluated from their literals, without building their nodes
+                value = _variable_value(point, literals[first])
+            elif opcode == SPARSE_POLYNOMIAL:
+                value = horner(literals[first], _variable_value(point, "x"))
+            elif opcode == POLYNOMIAL:
+                value = values[first] ** literals[second]
+            elif opcode == NEGATION:
+                value = -values[first]
+            elif opcode == SUM:
+                value = values[first] + values[second]
+            elif opcode == SUBTRACTION:
+                value = values[first] - values[second]
+            elif opcode == PRODUCT:
+                value = values[first] * values[second]
+            elif opcode == DIVISION:
+                value = values[first] / values[second]
+            elif opcode == POWER:
+                value = values[first] ** values[second]
+            else:
+                value = getattr(lib, _FUNCTIONS[opcode])(values[first])
+            values.append(value)
+        return values[-1]
+
+    def derivative(self, variable: str = "x") -> "FlatExpression":
+        """Derivative with respect to variable, built directly on the arrays with the same rules as
+        Expression.derivative. Constants are folded and identities (0 + u, 1 * u, ...) removed on the way."""
+        builder = _Builder()
+        copies = []  # Index in the builder of every node of self
+        derivatives = []
+        operands, literals = self.operands, self.literals
+        for i, opcode in enumerate(self.opcodes):
+            first, second = operands[2 * i], operands[2 * i + 1]
+            copies.append(builder.copy(self, i, copies))
+            node = copies[i]
+            if opcode == CONSTANT:
+                derivative = builder.constant(0)
+            elif opcode == VARIABLE:
+                derivative = builder.constant(1 if literals[first] == variable else 0)
+            elif opcode == SPARSE_POLYNOMIAL:
+                derivative = builder.sparse_derivative(literals[first]) if variable == "x" else builder.constant(0)
+            else:
+                u = copies[first]
+                du = derivatives[first]
+                if opcode in _BINARY.values():
+                    v, dv = copies[second], derivatives[second]
+                derivative = _DERIVATIVES[opcode](builder, node, u, du, *((v, dv) if opcode in _BINARY.values() else (literals[second],) if opcode == POLYNOMIAL else ()))
+            derivatives.append(derivative)
+        return builder.build(derivatives[-1])
+
+    def simplify(self) -> "FlatExpression":
+        """Constant folding and removal of identities (0 + u, 1 * u, u ^ 1, --u, ...) directly on the arrays.
+        For the canonical form of Expression.simplify(), go through to_expression()."""
+        builder = _Builder()
+        copies = []
+        for i in range(len(self.opcodes)):
+            copies.append(builder.copy(self, i, copies))
+        return builder.build(copies[-1])
+
+
+class _Builder:
+    """Appends hash-consed nodes to growing arrays. With fold, constants are folded and identities
+    removed while appending."""
+
+    def __init__(self, fold: bool = True):
+        self.fold = fold
+        self.opcodes = array("B")
+        self.operands = array("q")
+        self.literals = []
+        self._literal_index = {}
+        self._node_index = {}
+
+    def _literal(self, value) -> int:
+        key = (type(value), repr(value)) if not isinstance(value, str) else value
+        if key not in self._literal_index:
+            self._literal_index[key] = len(self.literals)
+            self.literals.append(value)
+        return self._literal_index[key]
+
+    def add(self, opcode: int, first: int = -1, second: int = -1) -> int:
+        key = (opcode, first, second)
+        index = self._node_index.get(key)
+        if index is None:
+            index = self._node_index[key] = len(self.opcodes)
+            self.opcodes.append(opcode)
+            self.operands.append(first)
+            self.operands.append(second)
+        return index
+
+    def constant(self, value: float) -> int:
+        return self.add(CONSTANT, self._literal(value))
+
+    def _constant_value(self, index: int) -> float | None:
+        if self.opcodes[index] == CONSTANT:
+            return self.literals[self.operands[2 * index]]
+        return None
+
+    def unary(self, opcode: int, u: int) -> int:
+        if self.fold:
+            value = self._constant_value(u)
+            if opcode == NEGATION:
+                if value is not None:
+                    return self.constant(-value)
+                if self.opcodes[u] == NEGATION:
+                    return self.operands[2 * u]
+            elif value is not None and opcode in (SIN, TAN, SINH, TANH) and value == 0:
+                return self.constant(0)
+        return self.add(opcode, u)
+
+    def polynomial(self, u: int, degree: float) -> int:
+        if self.fold:
+            if degree == 0:
+                return self.constant(1)
+            if degree == 1:
+                return u
+            value = self._constant_value(u)
+            if value is not None and not (value == 0 and degree < 0):
+                return self.constant(value**degree)
+        return self.add(POLYNOMIAL, u, self._literal(degree))
+
+    def binary(self, opcode: int, u: int, v: int) -> int:
+        if not self.fold:
+            return self.add(opcode, u, v)
+        a, b = self._constant_value(u), self._constant_value(v)
+        if opcode == DIVISION and b == 0:
+            raise ZeroDivisionError("Zero division error in flat expression")
+        if a is not None and b is not None and opcode != POWER:
+            return self.constant(_FOLD[opcode](a, b))
+        if opcode == SUM:
+            if a == 0:
+                return v
+            if b == 0:
+                return u
+        elif opcode == SUBTRACTION:
+            if b == 0:
+                return u
+            if a == 0:
+                return self.unary(NEGATION, v)
+            if u == v:
+                return self.constant(0)
+        elif opcode == PRODUCT:
+            if a == 0 or b == 0:
+                return self.constant(0)
+            if a == 1:
+                return v
+            if b == 1:
+                return u
+            if a == -1:
+                return self.unary(NEGATION, v)
+            if b == -1:
+                return self.unary(NEGATION, u)
+        elif opcode == DIVISION:
+            if a == 0:
+                return self.constant(0)
+            if b == 1:
+                return u
+        elif opcode == POWER and b is not None:
+            return self.polynomial(u, b)
+        return self.add(opcode, u, v)
+
+    def sparse_derivative(self, terms: tuple) -> int:
+        derivative = terms_from_coefficients({degree - 1: degree * coefficient for degree, coefficient in terms if degree > 0})
+        if len(derivative) == 0:
+            return self.constant(0)
+        if len(derivative) == 1 and derivative[0][0] == 0:
+            return self.constant(derivative[0][1])
+        return self.add(SPARSE_POLYNOMIAL, self._literal(derivative))
+
+    def copy(self, flat: FlatExpression, i: int, copies: list) -> int:
+        """Appends node i of flat, whose children were already copied"""
+        opcode = flat.opcodes[i]
+        first, second = flat.operands[2 * i], flat.operands[2 * i + 1]
+        if opcode == CONSTANT:
+            return self.constant(flat.literals[first])
+        if opcode in (VARIABLE, SPARSE_POLYNOMIAL):
+            return self.add(opcode, self._literal(flat.literals[first]))
+        if opcode == POLYNOMIAL:
+            return self.polynomial(copies[first], flat.literals[second])
+        if opcode in _BINARY.values():
+            return self.binary(opcode, copies[first], copies[second])
+        return self.unary(opcode, copies[first])
+
+    def add_expression(self, expr: Expression) -> int:
+        """Appends every node of expr (References as their target), returning the index of its root"""
+        return _bottom_up(expr, self._add_node)
+
+    def _add_node(self, node: Expression, *children: int) -> int:
+        kind = type(node)
+        if kind is Constant:
+            return self.constant(node.value)
+        if kind is Variable:
+            return self.add(VARIABLE, self._literal(node.name))
+        if kind is SparsePolynomial:
+            return self.add(SPARSE_POLYNOMIAL, self._literal(node.terms))
+        if kind is Polynomial:
+            return self.polynomial(children[0], node.degree)
+        if kind is Reference:
+            return self.add_expression(node.target)
+        if kind in _BINARY:
+            return self.binary(_BINARY[kind], *children)
+        if kind in _UNARY:
+            return self.unary(_UNARY[kind], children[0])
+        raise ValueError(f"No flat representation for {kind.__name__} nodes")
+
+    def build(self, root: int) -> FlatExpression:
+        """The nodes reachable from root, renumbered in the same (postfix) order"""
+        reachable = bytearray(root + 1)
+        reachable[root] = 1
+        for i in range(root, -1, -1):
+            if reachable[i] and self.opcodes[i] not in (CONSTANT, VARIABLE, SPARSE_POLYNOMIAL):
+                reachable[self.operands[2 * i]] = 1
+                if self.opcodes[i] != POLYNOMIAL and self.operands[2 * i + 1] >= 0:
+                    reachable[self.operands[2 * i + 1]] = 1
+        renumbered = {}
+        opcodes, operands = array("B"), array("q")
+        for i in range(root + 1):
+            if not reachable[i]:
+                continue
+            renumbered[i] = len(opcodes)
+            opcode = self.opcodes[i]
+            first, second = self.operands[2 * i], self.operands[2 * i + 1]
+            if opcode not in (CONSTANT, VARIABLE, SPARSE_POLYNOMIAL):
+                first = renumbered[first]
+                if opcode != POLYNOMIAL and second >= 0:
+                    second = renumbered[second]
+            opcodes.append(opcode)
+            operands.append(first)
+            operands.append(second)
+        return FlatExpression(opcodes, operands, self.literals)
+
+
+_FOLD = {
+    SUM: lambda a, b: a + b,
+    SUBTRACTION: lambda a, b: a - b,
+    PRODUCT: lambda a, b: a * b,
+    DIVISION: lambda a, b: a / b,
+}
+
+
+def _power_derivative(b: _Builder, node: int, u: int, du: int, v: int, dv: int) -> int:
+    degree = b._constant_value(v)
+    if degree is not None:
+        # Constant exponent (folded to a polynomial): the power rule, defined where u <= 0
+        return _DERIVATIVES[POLYNOMIAL](b, node, u, du, degree)
+    return b.binary(
+        PRODUCT,
+        node,
+        b.binary(SUM, b.binary(PRODUCT, dv, b.unary(LOG, u)), b.binary(DIVISION, b.binary(PRODUCT, v, du), u)),
+    )
+
+
+# Derivative of node = f(u[, v]) given the builder, node, u, du (and v, dv, or the degree of a polynomial),
+# the same rules as the _derivative methods of the expression classes
+_DERIVATIVES = {
+    NEGATION: lambda b, node, u, du: b.unary(NEGATION, du),
+    SUM: lambda b, node, u, du, v, dv: b.binary(SUM, du, dv),
+    SUBTRACTION: lambda b, node, u, du, v, dv: b.binary(SUBTRACTION, du, dv),
+    PRODUCT: lambda b, node, u, du, v, dv: b.binary(SUM, b.binary(PRODUCT, du, v), b.binary(PRODUCT, u, dv)),
+    DIVISION: lambda b, node, u, du, v, dv: b.binary(
+        SUBTRACTION,
+        b.binary(DIVISION, du, v),
+        b.binary(DIVISION, b.binary(PRODUCT, u, dv), b.binary(PRODUCT, v, v)),
+    ),
+    POWER: lambda b, node, u, du, v, dv: _power_derivative(b, node, u, du, v, dv),
+    POLYNOMIAL: lambda b, node, u, du, degree: b.binary(
+        PRODUCT, du, b.binary(PRODUCT, b.constant(degree), b.polynomial(u, degree - 1))
+    ),
+    SIN: lambda b, node, u, du: b.binary(PRODUCT, du, b.unary(COS, u)),
+    COS: lambda b, node, u, du: b.binary(PRODUCT, du, b.unary(NEGATION, b.unary(SIN, u))),
+    TAN: lambda b, node, u, du: b.binary(PRODUCT, du, b.polynomial(b.unary(COS, u), -2)),
+    SINH: lambda b, node, u, du: b.binary(PRODUCT, du, b.unary(COSH, u)),
+    COSH: lambda b, node, u, du: b.binary(PRODUCT, du, b.unary(SINH, u)),
+    TANH: lambda b, node, u, du: b.binary(PRODUCT, du, b.polynomial(b.unary(COSH, u), -2)),
+    EXP: lambda b, node, u, du: b.binary(PRODUCT, du, node),
+    LOG: lambda b, node, u, du: b.binary(DIVISION, du, u),
+}
@@ -0,0 +1,70 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple
+
+# Guard of the innermost `limits()` block, None when expressions are unbounded
+_active: "_Guard | None" = None
+
+
+class Limits(NamedTuple):
+    """Bounds on the expressions built while a `limits()` block is active (None for no bound)"""
+
+    max_nodes: int | None = None  # Nodes of an expression, counted as in its printed form (shared subtrees once per use)
+    max_depth: int | None = None  # Nodes on the longest path from the root to a leaf
+    max_seconds: float | None = None  # Wall time of the whole block
+
+
+class LimitExceeded(ValueError):
+    """An expression (or the time spent building it) went past a configured limit"""
+
+    def __init__(self, limit: str, value: float, maximum: float):
+        super().__init__(f"Expression limit exceeded: {limit} is {value}, the maximum is {maximum}")
+        self.limit = limit
+        self.value = value
+        self.maximum = maximum
+
+
+class _Guard:
+    def __init__(self, limits: Limits, deadline: float | None):
+        self.limits = limits
+        self.start = time.perf_counter()
+        self.deadline = deadline
+
+    def check(self, node) -> None:
+        """Raises LimitExceeded if node, or the time spent so far, is past a limit"""
+        max_nodes, max_depth, _ = self.limits
+        if max_nodes is not None and node._size > max_nodes:
+            raise LimitExceeded("nodes", node._size, max_nodes)
+        if max_depth is not None and node._depth > max_depth:
+            raise LimitExceeded("depth", node._depth, max_depth)
+        self.check_time()
+
+    def check_time(self) -> None:
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise LimitExceeded("seconds", round(time.perf_counter() - self.start, 3), self.limits.max_seconds)
+
+
+@contextmanager
+def limits(max_nodes: int = None, max_depth: int = None, max_seconds: float = None) -> Iterator[Limits]:
+    """Bounds every expression built inside the block (parsing, derivatives, simplification...).
+    Going past a bound raises LimitExceeded. Nested blocks apply the stricter of both bounds."""
+    global _active
+    previous = _active
+    bounds = Limits(max_nodes, max_depth, max_seconds)
+    deadline = None if max_seconds is None else time.perf_counter() + max_seconds
+    if previous is not None:
+        bounds = Limits(*(_stricter(outer, inner) for outer, inner in zip(previous.limits, bounds)))
+        deadline = _stricter(previous.deadline, deadline)
+    _active = _Guard(bounds, deadline)
+    try:
+        yield bounds
+    finally:
+        _active = previous
+
+
+def _stricter(outer, inner):
+    if outer is None:
+        return inner
+    if inner is None:
+        return outer
+    return min(outer, inner)
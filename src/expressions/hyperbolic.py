@@ -1,27 +1,40 @@
-import math as m
-from .basic import Expression, Product, Negation
+from .basic import DERIVATIVE_RULES, Expression, _cyclic_derivative
 from .polynomial import Polynomial
 
 
 class Sinh(Expression):
+    __slots__ = ()
+    fn_str = "sinh"
+    _fn_name = "sinh"
+
     def __init__(self, argument: Expression):
-        super().__init__(argument, derivative_fn=Cosh, fn_str="sinh")
+        super().__init__(argument)
 
-    def __call__(self, x: float) -> float:
-        return m.sinh(self.argument(x))
+    def _nth_derivative(self, n: int, variable: Expression) -> Expression | None:
+        return _cyclic_derivative(self, n, variable, ((1, Sinh), (1, Cosh)))
 
 
 class Cosh(Expression):
+    __slots__ = ()
+    fn_str = "cosh"
+    _fn_name = "cosh"
+
     def __init__(self, argument: Expression):
-        super().__init__(argument, derivative_fn=Sinh, fn_str="cosh")
+        super().__init__(argument)
 
-    def __call__(self, x: float) -> float:
-        return m.cosh(self.argument(x))
+    def _nth_derivative(self, n: int, variable: Expression) -> Expression | None:
+        return _cyclic_derivative(self, n, variable, ((1, Cosh), (1, Sinh)))
 
 
 class Tanh(Expression):
+    __slots__ = ()
+    fn_str = "tanh"
+    _fn_name = "tanh"
+
     def __init__(self, argument: Expression):
-        super().__init__(argument, lambda arg: Polynomial(Cosh(arg), -2), fn_str="tanh")
+        super().__init__(argument)
+
 
-    def __call__(self, x: float) -> float:
-        return m.tanh(self.argument(x))
+DERIVATIVE_RULES[Sinh] = lambda node: Cosh(node.argument)
+DERIVATIVE_RULES[Cosh] = lambda node: Sinh(node.argument)
+DERIVATIVE_RULES[Tanh] = lambda node: Polynomial(Cosh(node.argument), -2)
@@ -0,0 +1,74 @@
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Iterator
+
+# Collector of the innermost `instrument()` block, None when instrumentation is off
+_active: "Instrumentation | None" = None
+
+
+class Instrumentation:
+    """Counters collected while an `instrument()` block is active"""
+
+    def __init__(self, rules: bool = True):
+        self.rules = rules  # Whether rule firings are collected
+        self.allocations = Counter()  # Class name -> constructor calls (including ones answered by the intern table)
+        self.new_nodes = Counter()  # Class name -> distinct nodes added to the intern table
+        self.rule_firings = Counter()  # "Class._simplify: condition" (or rule of a sum / product) -> times it applied
+        self.max_stack_depth = 0  # Peak explicit-stack size of the tree walkers (what used to be recursion depth)
+        self.phases = defaultdict(float)  # Pipeline phase -> wall time in seconds
+
+    def summary(self) -> dict:
+        return {
+            "allocations": dict(self.allocations.most_common()),
+            "new_nodes": dict(self.new_nodes.most_common()),
+            "rule_firings": dict(self.rule_firings.most_common()),
+            "max_stack_depth": self.max_stack_depth,
+            "phases": dict(self.phases),
+        }
+
+
+@contextmanager
+def instrument(rules: bool = True) -> Iterator[Instrumentation]:
+    """Collects allocation, rule and phase counters for the code run inside the block.
+    Each _simplify reports the rules it applies (rules=False skips them). A node rebuilt
+    unchanged, e.g. every leaf, is not a firing."""
+    global _active
+    previous, _active = _active, Instrumentation(rules)
+    try:
+        yield _active
+    finally:
+        _active = previous
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Adds the wall time of the block to phase `name` (no-op when instrumentation is off)"""
+    collector = _active
+    if collector is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        collector.phases[name] += time.perf_counter() - start
+
+
+def record_firing(node_class: type, rule: str) -> None:
+    """Adds one application of rule by node_class._simplify as "Class._simplify: rule".
+    No-op when instrumentation or rule firings are off."""
+    collector = _active
+    if collector is not None and collector.rules:
+        collector.rule_firings[f"{node_class.__name__}._simplify: {rule}"] += 1
+
+
+def record_firings(node_class: type, firings: dict) -> None:
+    """Adds several rules at once (the collection of sums and products) as "Class._simplify: rule" -> times.
+    No-op when instrumentation or rule firings are off."""
+    collector = _active
+    if collector is None or not collector.rules:
+        return
+    for rule, times in firings.items():
+        if times:
+            collector.rule_firings[f"{node_class.__name__}._simplify: {rule}"] += times
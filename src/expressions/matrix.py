@@ -0,0 +1,91 @@
+import sys
+from functools import partial
+
+from .basic import Expression, Variable, _bottom_up, _derivative_node
+from .cache import LRUCache
+from .cse import _bind_shared, _compile, _render
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only required to evaluate matrices
+    np = None
+
+
+class ExpressionMatrix:
+    """Matrix of expressions, such as a Jacobian or a Hessian, as a list of rows.
+    Entries are interned, so subtrees shared between entries are stored once."""
+
+    def __init__(self, rows: list[list[Expression]], parameters: tuple[str, ...]):
+        self.rows = rows
+        self.parameters = parameters  # Variables the matrix is evaluated at, in the order compile() takes them
+        self._compiled = None
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.rows), len(self.rows[0]) if self.rows else 0
+
+    def __getitem__(self, index: tuple[int, int]) -> Expression:
+        row, column = index
+        return self.rows[row][column]
+
+    def compile(self) -> callable:
+        """Python function f(*parameters) returning the matrix as a NumPy array (cached).
+        Subexpressions used more than once, in any entries, are hoisted into locals and evaluated once."""
+        if np is None:
+            raise ImportError("ExpressionMatrix.compile requires NumPy")
+        if self._compiled is None:
+            width = self.shape[1]
+            bindings, entries = _bind_shared([entry for row in self.rows for entry in row])
+            lines = []
+            for reference, expr in bindings:
+                lines.append(f"    {reference.name} = {_render(expr, lines)}")
+            rows = [entries[start : start + width] for start in range(0, len(entries), width)]
+            matrix = ", ".join(f"[{', '.join(_render(entry, lines) for entry in row)}]" for row in rows)
+            source = "\n".join(
+                [f"def compiled({', '.join(self.parameters)}):", *lines, f"    return _array([{matrix}], dtype=_float)"]
+            )
+            self._compiled = _compile(source, _array=np.array)
+        return self._compiled
+
+    def __call__(self, **values: float) -> "np.ndarray":
+        return self.compile()(**values)
+
+    def __str__(self):
+        return "\n".join(f"[{', '.join(str(entry) for entry in row)}]" for row in self.rows)
+
+
+def jacobian(expressions: list[Expression], variables: list[str] = None) -> ExpressionMatrix:
+    """Matrix of the simplified partial derivatives d expressions[i] / d variables[j]
+    (by default, every variable of the expressions sorted by name)"""
+    parameters = _parameters(expressions, variables)
+    variables = parameters if variables is None else tuple(variables)
+    columns = [_derivatives(expressions, variable) for variable in variables]
+    return ExpressionMatrix([list(row) for row in zip(*columns)], parameters)
+
+
+def hessian(expr: Expression, variables: list[str] = None) -> ExpressionMatrix:
+    """Symmetric matrix of the simplified second partial derivatives d^2 expr / d variables[i] d variables[j].
+    The entries below the diagonal are the ones above it."""
+    parameters = _parameters([expr], variables)
+    variables = parameters if variables is None else tuple(variables)
+    gradient = [derivative for (derivative,) in (_derivatives([expr], variable) for variable in variables)]
+    rows = [[None] * len(variables) for _ in variables]
+    for j, variable in enumerate(variables):
+        # Column j above the diagonal, differentiating the gradient entries together
+        for i, entry in enumerate(_derivatives(gradient[: j + 1], variable)):
+            rows[i][j] = rows[j][i] = entry
+    return ExpressionMatrix(rows, parameters)
+
+
+def _derivatives(expressions: list[Expression], variable: str) -> list[Expression]:
+    # Unbounded and shared by the expressions: a subtree they have in common is differentiated once
+    shared = LRUCache(maxsize=sys.maxsize)
+    rule = partial(_derivative_node, Variable(variable))
+    return [_bottom_up(expr, rule, cache=shared).simplify_fully() for expr in expressions]
+
+
+def _parameters(expressions: list[Expression], variables: list[str] | None) -> tuple[str, ...]:
+    names = set(variables or ())
+    for expr in expressions:
+        names.update(expr.variables())
+    return tuple(sorted(names))
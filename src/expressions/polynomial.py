@@ -1,31 +1,222 @@
-from .basic import Expression, Constant, Product
+from .basic import DERIVATIVE_RULES, Expression, Constant, Variable, Negation, Product, _finite, _linear_slope, _scaled, _variable_value
+from .instrumentation import record_firing
+
+# Products and integer powers of polynomials are expanded only up to this degree:
+# expanding (x + 1) ^ 1000 would trade a three-node tree for 1001 coefficients
+MAX_EXPANDED_DEGREE = 64
 
 
 class Polynomial(Expression):
+    __slots__ = ("degree",)
+    precedence_order = 2
+
     def __init__(self, argument: Expression, degree: float):
-        def polynomial_derivative(arg: Expression) -> Expression:
-            return Product(Constant(degree), Polynomial(arg, degree - 1))
-
-        super().__init__(
-            argument=argument,
-            derivative_fn=polynomial_derivative,
-            precedence_order=2,
-        )
+        super().__init__(argument)
         self.degree = degree
 
-    def simplify(self):
+    def _args(self) -> tuple:
+        return (self.argument, self.degree)
+
+    def _with_children(self, argument: Expression) -> Expression:
+        if argument is self.argument:
+            return self
+        return Polynomial(argument, self.degree)
+
+    def _key(self) -> tuple:
+        return (Polynomial, self.argument, type(self.degree), self.degree)
+
+    def _power(self) -> tuple[Expression, float]:
+        return self.argument, self.degree
+
+    def _polynomial_terms(self) -> tuple | None:
+        if isinstance(self.argument, Variable) and self.argument.name == "x" and type(self.degree) is int and self.degree >= 0:
+            return ((self.degree, 1),)
+        return None
+
+    def _nth_derivative(self, n: int, variable: Variable) -> Expression | None:
+        # k * (k - 1) * ... * (k - n + 1) * a ^ n * u ^ (k - n) for u = a * variable + b
+        slope = _linear_slope(self.argument, variable)
+        if slope is None:
+            return None
+        coefficient = slope**n
+        for k in range(n):
+            coefficient *= self.degree - k
+        if coefficient == 0:
+            return Constant(0)
+        return _scaled(_finite(coefficient), Polynomial(self.argument, self.degree - n))
+
+    def _simplify(self, arg: Expression) -> Expression:
         if self.degree == 0:
+            record_firing(Polynomial, "zero degree")
             return Constant(1)
         if self.degree == 1:
-            return self.argument
-        arg = self.argument.simplify()
+            record_firing(Polynomial, "unit degree")
+            return arg
         if isinstance(arg, Constant):
+            record_firing(Polynomial, "constant folding")
             return Constant(arg.value**self.degree)
-        return Polynomial(arg, self.degree)
+        if isinstance(arg, Polynomial) and type(self.degree) is int:
+            # (u ^ a) ^ n is u ^ (a * n) for an integer n
+            record_firing(Polynomial, "power of a power")
+            return Polynomial(arg.argument, arg.degree * self.degree)._simplify(arg.argument)
+        if isinstance(arg, Negation) and type(self.degree) is int:
+            # (-u) ^ n is u ^ n or -(u ^ n)
+            record_firing(Polynomial, "power of a negation")
+            power = Polynomial(arg.argument, self.degree)._simplify(arg.argument)
+            return power if self.degree % 2 == 0 else Negation(power)
+        if isinstance(arg, SparsePolynomial) and type(self.degree) is int and 0 < self.degree * arg.degree <= MAX_EXPANDED_DEGREE:
+            record_firing(Polynomial, "expansion")
+            return polynomial_from_terms(power_terms(arg.terms, self.degree))
+        return self._with_children(arg)
+
+    def _source(self, argument: str) -> str:
+        return f"{argument} ** ({self.degree!r})"
+
+    def _evaluate(self, lib, point, value):
+        return value**self.degree
+
+    def _format(self) -> list:
+        # ^ is right associative, so a power base needs parentheses too
+        if self.argument.precedence_order >= self.precedence_order:
+            return ["(", self.argument, f") ^ {self.degree}"]
+        return [*self._add_parentheses(self.argument), f" ^ {self.degree}"]
+
+
+class SparsePolynomial(Expression):
+    """Polynomial in x stored as its nonzero (degree, coefficient) terms, by increasing degree.
+    It is a leaf: derivatives are computed on the coefficients and values by Horner's method."""
+
+    __slots__ = ("terms",)
+    precedence_order = 4
+
+    def __init__(self, terms: tuple[tuple[int, float], ...]):
+        super().__init__()
+        self.terms = terms
+
+    @property
+    def degree(self) -> int:
+        return self.terms[-1][0]
+
+    def _args(self) -> tuple:
+        return (self.terms,)
+
+    def _key(self) -> tuple:
+        # repr keeps 2 and 2.0 coefficients apart, like Constant
+        return (SparsePolynomial, repr(self.terms))
+
+    def _polynomial_terms(self) -> tuple:
+        return self.terms
+
+    def _variables(self) -> frozenset:
+        return frozenset(("x",))
+
+    def _derivative(self, variable: Variable) -> Expression:
+        if variable.name != "x":
+            return Constant(0)
+        return polynomial_from_terms(terms_from_coefficients({degree - 1: degree * coefficient for degree, coefficient in self.terms if degree > 0}))
+
+    def _nth_derivative(self, n: int, variable: Variable) -> Expression:
+        if variable.name != "x":
+            return Constant(0)
+        coefficients = {}
+        for degree, coefficient in self.terms:
+            for k in range(n):
+                coefficient *= degree - k
+            coefficients[degree - n] = coefficient
+        return polynomial_from_terms(terms_from_coefficients(coefficients))
+
+    def _evaluate(self, lib, point):
+        return horner(self.terms, _variable_value(point, "x"))
+
+    def _source(self) -> str:
+        (degree, result), *lower = reversed(self.terms)
+        source = Constant(result)._source()
+        for lower_degree, coefficient in lower:
+            step = degree - lower_degree
+            source = f"({source}) * {'x' if step == 1 else f'x ** {step}'} + {Constant(coefficient)._source()}"
+            degree = lower_degree
+        if degree != 0:
+            source = f"({source}) * {'x' if degree == 1 else f'x ** {degree}'}"
+        # A leaf is rendered without parentheses around it
+        return f"({source})"
+
+    def _format(self) -> list:
+        pieces = []
+        for degree, coefficient in reversed(self.terms):
+            if pieces:
+                pieces.append(" - " if coefficient < 0 else " + ")
+                coefficient = abs(coefficient)
+            if degree == 0:
+                pieces.append(str(coefficient))
+                continue
+            if coefficient == -1:
+                pieces.append("-")
+            elif coefficient != 1:
+                pieces.append(f"{coefficient} * ")
+            pieces.append("x" if degree == 1 else f"x ^ {degree}")
+        return ["".join(pieces)]
+
+
+DERIVATIVE_RULES[Polynomial] = lambda node: Product(Constant(node.degree), Polynomial(node.argument, node.degree - 1))
+
+
+def polynomial_from_terms(terms: tuple[tuple[int, float], ...]) -> Expression:
+    """Simplest expression for the given (sorted, nonzero) terms: a constant, a single
+    coefficient * x ^ degree, or a SparsePolynomial"""
+    if not terms:
+        return Constant(0)
+    if len(terms) > 1:
+        return SparsePolynomial(terms)
+    degree, coefficient = terms[0]
+    if degree == 0:
+        return Constant(coefficient)
+    monomial = Variable() if degree == 1 else Polynomial(Variable(), degree)
+    if coefficient == 1:
+        return monomial
+    if coefficient == -1:
+        return Negation(monomial)
+    return Product(Constant(coefficient), monomial)
+
+
+def terms_from_coefficients(coefficients: dict) -> tuple:
+    """Sorted nonzero terms of a degree -> coefficient mapping.
+    1.0 and -1.0 become 1 and -1, which print the same, as coefficients of sums and products do."""
+    return tuple(
+        (degree, int(coefficient) if coefficient in (1, -1) else coefficient)
+        for degree, coefficient in sorted(coefficients.items())
+        if coefficient != 0
+    )
+
+
+def multiply_terms(left: tuple, right: tuple) -> tuple:
+    coefficients = {}
+    for left_degree, left_coefficient in left:
+        for right_degree, right_coefficient in right:
+            degree = left_degree + right_degree
+            coefficients[degree] = coefficients.get(degree, 0) + left_coefficient * right_coefficient
+    return terms_from_coefficients(coefficients)
+
+
+def horner(terms: tuple, x: float) -> float:
+    """Value of the polynomial with the given (sorted, nonzero) terms at x, by Horner's method
+    (the missing degrees are skipped with a single power)"""
+    (degree, result), *lower = reversed(terms)
+    for lower_degree, coefficient in lower:
+        step = degree - lower_degree
+        result = result * (x if step == 1 else x**step) + coefficient
+        degree = lower_degree
+    if degree == 0:
+        return result
+    return result * (x if degree == 1 else x**degree)
 
-    def __call__(self, x: float) -> float:
-        return self.argument(x) ** self.degree
 
-    def __str__(self):
-        base_str = self._add_parentheses(self.argument)
-        return f"{base_str} ^ {self.degree}"
+def power_terms(terms: tuple, exponent: int) -> tuple:
+    """Terms of the polynomial raised to a non-negative integer exponent, by repeated squaring"""
+    result = ((0, 1),)
+    while exponent:
+        if exponent & 1:
+            result = multiply_terms(result, terms)
+        exponent >>= 1
+        if exponent:
+            terms = multiply_terms(terms, terms)
+    return result
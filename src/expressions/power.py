@@ -1,44 +1,47 @@
-import math as m
-
 from .basic import Expression, Constant, Conjunction, Sum, Product, Division
 from .exponential import Logarithm
+from .instrumentation import record_firing
 from .polynomial import Polynomial
 
 
 class Power(Conjunction):
-    def __init__(self, left, right):
-        super().__init__(left, right, precedence_order=2, op_symbol='^')
+    __slots__ = ()
+    precedence_order = 2
+    op_symbol = "^"
 
-    def derivative(self) -> Expression:
+    def _derivative(self, left_derivative: Expression, right_derivative: Expression) -> Expression:
         return Product(
             Power(self.left, self.right),
             Sum(
-                Product(self.right.derivative(), Logarithm(self.left)),
-                Product(self.right, Division(self.left.derivative(), self.left)),
+                Product(right_derivative, Logarithm(self.left)),
+                Product(self.right, Division(left_derivative, self.left)),
             ),
         )
 
-    def simplify(self) -> Expression:
-        left = self.left.simplify()
-        right = self.right.simplify()
-
+    def _simplify(self, left: Expression, right: Expression) -> Expression:
         if isinstance(right, Constant):
             if right.value == 0:
+                record_firing(Power, "zero exponent")
                 return Constant(1)
             if right.value == 1:
+                record_firing(Power, "unit exponent")
                 return left
             if isinstance(left, Constant):
+                record_firing(Power, "constant folding")
                 return Constant(left.value**right.value)
+            record_firing(Power, "constant exponent")
             return Polynomial(left, right.value)
-        return Power(left, right)
+        return self._with_children(left, right)
+
+    def _source(self, left: str, right: str) -> str:
+        return f"{left} ** {right}"
 
-    def __call__(self, x: float) -> float:
-        return self.left(x) ** self.right(x)
+    def _evaluate(self, lib, point, left, right):
+        return left**right
 
-    def __str__(self):
-        base_str = self._add_parentheses(self.left)
+    def _format(self) -> list:
         if isinstance(self.right, Power):
-            exponent_str = f"({self.right})"
+            exponent = ["(", self.right, ")"]
         else:
-            exponent_str = self._add_parentheses(self.right)
-        return f"{base_str} ^ {exponent_str}"
+            exponent = self._add_parentheses(self.right)
+        return [*self._add_parentheses(self.left), " ^ ", *exponent]
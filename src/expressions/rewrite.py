@@ -0,0 +1,184 @@
+from . import instrumentation
+from .basic import Expression, Constant, Negation, Product, Sum, _bottom_up
+from .exponential import Exponential, Logarithm
+from .hyperbolic import Cosh, Sinh, Tanh
+from .trigonometric import Cos, Sin, Tan
+
+
+class Wildcard(Expression):
+    """Pattern variable: matches any node, or only nodes of class kind. A name used twice in a
+    pattern must match the same node both times."""
+
+    __slots__ = ("name", "kind")
+    precedence_order = 0
+
+    def __init__(self, name: str, kind: type = None):
+        super().__init__()
+        self.name = name
+        self.kind = kind
+
+    def _args(self) -> tuple:
+        return (self.name, self.kind)
+
+    def _evaluate(self, lib, point):
+        raise ValueError(f"Wildcard {self.name} cannot be evaluated")
+
+    def _format(self) -> list:
+        return [self.name]
+
+
+class Rule:
+    """pattern -> replacement. The replacement is a template over the pattern's wildcards, or a function
+    of the bound nodes (by wildcard name) returning the new node, or None when the rule does not apply."""
+
+    def __init__(self, pattern: Expression, replacement, condition: callable = None, name: str = None):
+        if isinstance(pattern, Wildcard) or not pattern.children:
+            raise ValueError(f"The root of a pattern must be an operation, got: {pattern}")
+        self.pattern = pattern
+        self.replacement = replacement
+        self.condition = condition
+        self.name = name or f"{pattern} -> {replacement}"
+
+    @property
+    def signature(self) -> tuple:
+        """Classes of the root and of its children that a node needs for this rule to apply"""
+        return (type(self.pattern), *(_required_class(child) for child in self.pattern.children))
+
+    def apply(self, node: Expression) -> Expression | None:
+        bindings = {}
+        if not _match(self.pattern, node, bindings):
+            return None
+        if self.condition is not None and not self.condition(**bindings):
+            return None
+        if callable(self.replacement) and not isinstance(self.replacement, Expression):
+            return self.replacement(**bindings)
+        return _substitute(self.replacement, bindings)
+
+
+class RuleSet:
+    """Rewrite rules indexed by the classes of a node and of its children: the rules tried on a node
+    are looked up once per signature, so matching cost does not grow with the number of rules."""
+
+    def __init__(self, rules: list[Rule] = ()):
+        self._rules: list[Rule] = []
+        self._candidates: dict[tuple, list[Rule]] = {}
+        for rule in rules:
+            self.add(rule)
+
+    def add(self, pattern: "Expression | Rule", replacement=None, condition: callable = None, name: str = None) -> Rule:
+        """Registers pattern -> replacement. A pattern whose root is a sum or a product also matches
+        with the root's operands swapped."""
+        rule = pattern if isinstance(pattern, Rule) else Rule(pattern, replacement, condition, name)
+        self._rules.append(rule)
+        root = rule.pattern
+        if type(root) in (Sum, Product) and root.left is not root.right:
+            self._rules.append(Rule(type(root)(root.right, root.left), rule.replacement, rule.condition, rule.name))
+        self._candidates.clear()
+        return rule
+
+    def candidates(self, node: Expression) -> list[Rule]:
+        """Rules whose root and child classes fit node, in the order they were added"""
+        signature = (type(node), *(type(child) for child in node.children))
+        rules = self._candidates.get(signature)
+        if rules is None:
+            rules = self._candidates[signature] = [rule for rule in self._rules if _fits(rule.signature, signature)]
+        return rules
+
+    def apply(self, node: Expression) -> Expression:
+        """Node rewritten by the first rule that applies to it (node itself if none does)"""
+        for rule in self.candidates(node):
+            result = rule.apply(node)
+            if result is not None and result is not node:
+                collector = instrumentation._active
+                if collector is not None:
+                    collector.rule_firings[f"RuleSet: {rule.name}"] += 1
+                return result
+        return node
+
+    def rewrite(self, expr: Expression, simplify: bool = True, max_passes: int = 100) -> Expression:
+        """Applies the rules bottom-up until a fixed point is reached (at most max_passes passes).
+        With simplify, the expression is also fully simplified before every pass. A rule undone by the
+        simplification would loop: the rewrite then stops at the first result seen twice."""
+        done = set()  # Nodes that no rule changes anymore
+        seen = set()
+
+        def rewrite_node(node: Expression, *children: Expression) -> Expression:
+            node = node._with_children(*children)
+            result = self.apply(node)
+            if result is node:
+                done.add(node)
+            return result
+
+        for _ in range(max_passes):
+            if simplify:
+                expr = expr.simplify_fully()
+            result = _bottom_up(expr, rewrite_node, stop=done.__contains__)
+            if result is expr or result in seen:
+                return result
+            seen.add(result)
+            expr = result
+        return expr
+
+
+def rewrite(expr: Expression, rules: RuleSet = None, simplify: bool = True, max_passes: int = 100) -> Expression:
+    """expr rewritten with rules (RULES by default) until a fixed point is reached"""
+    return (RULES if rules is None else rules).rewrite(expr, simplify=simplify, max_passes=max_passes)
+
+
+def _required_class(pattern: Expression) -> type:
+    if isinstance(pattern, Wildcard):
+        return pattern.kind or Expression
+    return type(pattern)
+
+
+def _fits(required: tuple, signature: tuple) -> bool:
+    return len(required) == len(signature) and all(issubclass(kind, cls) for cls, kind in zip(required, signature))
+
+
+def _match(pattern: Expression, node: Expression, bindings: dict) -> bool:
+    stack = [(pattern, node)]
+    while stack:
+        pattern, node = stack.pop()
+        if type(pattern) is Wildcard:
+            bound = bindings.setdefault(pattern.name, node)
+            # Nodes are interned, so the same subtree is the same object
+            if bound is not node or (pattern.kind is not None and not isinstance(node, pattern.kind)):
+                return False
+            continue
+        if type(pattern) is not type(node):
+            return False
+        if not pattern.children:
+            if pattern is not node:
+                return False
+            continue
+        if _attributes(pattern) != _attributes(node):
+            return False
+        stack.extend(zip(pattern.children, node.children))
+    return True
+
+
+def _attributes(node: Expression) -> list:
+    """Constructor arguments that are not children, e.g. the degree of a Polynomial"""
+    return [arg for arg in node._args() if not isinstance(arg, Expression)]
+
+
+def _substitute(template: Expression, bindings: dict) -> Expression:
+    return _bottom_up(
+        template,
+        lambda node, *children: bindings[node.name] if type(node) is Wildcard else node._with_children(*children),
+    )
+
+
+_U = Wildcard("u")
+
+# Identities the built-in simplification does not apply: parity of the odd and even functions,
+# and values at 0 (1 for ln)
+RULES = RuleSet(
+    [
+        *(Rule(odd(Negation(_U)), Negation(odd(_U))) for odd in (Sin, Tan, Sinh, Tanh)),
+        *(Rule(even(Negation(_U)), even(_U)) for even in (Cos, Cosh)),
+        *(Rule(function(Constant(0)), Constant(0)) for function in (Sin, Tan, Sinh, Tanh)),
+        *(Rule(function(Constant(0)), Constant(1)) for function in (Cos, Cosh, Exponential)),
+        Rule(Logarithm(Constant(1)), Constant(0)),
+    ]
+)
@@ -0,0 +1,303 @@
+import json
+import struct
+import sys
+from array import array
+
+from .basic import Expression, Constant, Variable, Negation, Sum, Subtraction, Product, Division
+from .cse import Reference
+from .exponential import Exponential, Logarithm
+from .flat import FlatExpression
+from .hyperbolic import Cosh, Sinh, Tanh
+from .polynomial import Polynomial, SparsePolynomial
+from .power import Power
+from .rewrite import Wildcard
+from .trigonometric import Cos, Sin, Tan
+
+# Node classes and the kind of each constructor argument: "n" a node, "v" a value (number, string,
+# tuple of values or None), "c" a node class or None. The position of a class is its tag in the binary
+# format (the first eighteen match the FlatExpression opcodes), so new classes are only ever appended.
+SCHEMA: dict[type, str] = {
+    Constant: "v",
+    Variable: "v",
+    SparsePolynomial: "v",
+    Polynomial: "nv",
+    Negation: "n",
+    Sum: "nn",
+    Subtraction: "nn",
+    Product: "nn",
+    Division: "nn",
+    Power: "nn",
+    Sin: "n",
+    Cos: "n",
+    Tan: "n",
+    Sinh: "n",
+    Cosh: "n",
+    Tanh: "n",
+    Exponential: "n",
+    Logarithm: "n",
+    Reference: "vn",
+    Wildcard: "vc",
+}
+_CLASSES = list(SCHEMA)
+_TAGS = {cls: tag for tag, cls in enumerate(_CLASSES)}
+_BY_NAME = {cls.__name__: cls for cls in _CLASSES}
+# Tags below this one are also FlatExpression opcodes, with the same arguments
+_FLAT_TAGS = _TAGS[Reference]
+
+MAGIC = b"DXPR"
+VERSION = 1
+# Magic, version, bytes per operand, number of nodes, of operands and of literals
+_HEADER = struct.Struct("<4sBBIII")
+_WIDTHS = {2: "H", 4: "I"}
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+
+def _nodes(expr: Expression) -> dict[Expression, int]:
+    """Position of every distinct node under expr, children first (the root is last)"""
+    index = {}
+    stack = [(expr, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if node in index:
+            continue
+        if expanded:
+            index[node] = len(index)
+            continue
+        stack.append((node, True))
+        # A Reference is a leaf of the tree, but its target has to be written too
+        children = (node.target,) if type(node) is Reference else node.children
+        stack.extend((child, False) for child in reversed(children) if child not in index)
+    return index
+
+
+def _schema(cls: type) -> str:
+    try:
+        return SCHEMA[cls]
+    except KeyError:
+        raise ValueError(f"No serialized form for {cls.__name__} nodes") from None
+
+
+def to_bytes(expr: Expression) -> bytes:
+    """Compact binary form of expr: a header, then one opcode per distinct node in postfix order,
+    the indices of their arguments (nodes, or literals of the pool) and the literal pool.
+    Subtrees shared in memory are written once. Floats are stored exactly."""
+    index = _nodes(expr)
+    opcodes, operands = bytearray(), []
+    literals = _LiteralPool()
+    for node in index:
+        cls = type(node)
+        schema = _schema(cls)
+        opcodes.append(_TAGS[cls])
+        if schema == "n":
+            operands.append(index[node.argument])
+        elif schema == "nn":
+            operands.append(index[node.left])
+            operands.append(index[node.right])
+        else:
+            for kind, arg in zip(schema, node._args()):
+                operands.append(index[arg] if kind == "n" else literals.add(arg if kind == "v" else _class_name(arg)))
+    # Indices take two bytes each, unless there are too many nodes or literals
+    typecode = "H" if max(len(index), len(literals.values)) <= 0xFFFF else "I"
+    operands = array(typecode, operands)
+    if not _LITTLE_ENDIAN:
+        operands.byteswap()
+    header = _HEADER.pack(MAGIC, VERSION, operands.itemsize, len(opcodes), len(operands), len(literals.values))
+    return b"".join([header, opcodes, operands.tobytes(), *literals.chunks])
+
+
+def _sections(data: bytes) -> tuple[bytes, list[int], list]:
+    """Opcodes, operands and literals of a serialized expression (data can be any bytes-like object)"""
+    if len(data) < _HEADER.size:
+        raise ValueError("Serialized expression is truncated")
+    magic, version, width, n_nodes, n_operands, n_literals = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a serialized expression")
+    if version != VERSION:
+        raise ValueError(f"Unsupported serialized expression version: {version}")
+    if width not in _WIDTHS:
+        raise ValueError(f"Invalid operand width: {width}")
+    offset = _HEADER.size
+    opcodes = data[offset : offset + n_nodes]
+    offset += n_nodes
+    operands = array(_WIDTHS[width])
+    operands.frombytes(data[offset : offset + width * n_operands])
+    if not _LITTLE_ENDIAN:
+        operands.byteswap()
+    offset += width * n_operands
+    if len(opcodes) != n_nodes or len(operands) != n_operands:
+        raise ValueError("Serialized expression is truncated")
+    if not n_nodes:
+        raise ValueError("Serialized expression is empty")
+    literals = []
+    for _ in range(n_literals):
+        value, offset = _read_literal(data, offset)
+        literals.append(value)
+    return opcodes, operands.tolist(), literals
+
+
+def from_bytes(data: bytes) -> Expression:
+    """Inverse of to_bytes: the same (interned) expression"""
+    opcodes, operands, literals = _sections(data)
+    nodes = []
+    position = 0
+    try:
+        for tag in opcodes:
+            cls = _CLASSES[tag]
+            schema = SCHEMA[cls]
+            if schema == "n":
+                nodes.append(cls(nodes[operands[position]]))
+                position += 1
+            elif schema == "nn":
+                nodes.append(cls(nodes[operands[position]], nodes[operands[position + 1]]))
+                position += 2
+            else:
+                args = []
+                for kind in schema:
+                    i = operands[position]
+                    position += 1
+                    args.append(nodes[i] if kind == "n" else literals[i] if kind == "v" else _class(literals[i]))
+                nodes.append(cls(*args))
+        return nodes[-1]
+    except IndexError:
+        raise ValueError("Invalid serialized expression") from None
+
+
+def flat_from_bytes(data: bytes) -> FlatExpression:
+    """The serialized expression as a FlatExpression, without building (and interning) its nodes.
+    Much cheaper than from_bytes when the expression is only evaluated. References and wildcards
+    have no flat form."""
+    opcodes, operands, literals = _sections(data)
+    flat_operands = array("q")
+    position = 0
+    try:
+        for tag in opcodes:
+            arity = len(SCHEMA[_CLASSES[tag]])
+            if tag >= _FLAT_TAGS:
+                raise ValueError(f"No flat representation for {_CLASSES[tag].__name__} nodes")
+            flat_operands.append(operands[position])
+            flat_operands.append(operands[position + 1] if arity == 2 else -1)
+            position += arity
+    except IndexError:
+        raise ValueError("Invalid serialized expression") from None
+    return FlatExpression(array("B", opcodes), flat_operands, literals)
+
+
+def to_json(expr: Expression) -> str:
+    """JSON form of expr: {"version": 1, "nodes": [[class name, *arguments], ...]} with one entry per
+    distinct node in postfix order (the root is last). Node arguments are indices into "nodes"."""
+    index = _nodes(expr)
+    entries = []
+    for node in index:
+        cls = type(node)
+        entry = [cls.__name__]
+        for kind, arg in zip(_schema(cls), node._args()):
+            entry.append(index[arg] if kind == "n" else arg if kind == "v" else _class_name(arg))
+        entries.append(entry)
+    return json.dumps({"version": VERSION, "nodes": entries}, separators=(",", ":"))
+
+
+def from_json(text: str) -> Expression:
+    """Inverse of to_json"""
+    document = json.loads(text)
+    version = document.get("version") if isinstance(document, dict) else None
+    if version != VERSION:
+        raise ValueError(f"Unsupported serialized expression version: {version}")
+    nodes = []
+    try:
+        for name, *arguments in document["nodes"]:
+            cls = _class(name)
+            args = []
+            for kind, arg in zip(SCHEMA[cls], arguments):
+                args.append(nodes[arg] if kind == "n" else _tuples(arg) if kind == "v" else _class(arg))
+            nodes.append(cls(*args))
+        return nodes[-1]
+    except (IndexError, KeyError, TypeError):
+        raise ValueError("Invalid serialized expression") from None
+
+
+def _class_name(cls: type | None) -> str | None:
+    if cls is None:
+        return None
+    _schema(cls)
+    return cls.__name__
+
+
+def _class(name: str | None) -> type | None:
+    if name is None:
+        return None
+    try:
+        return _BY_NAME[name]
+    except KeyError:
+        raise ValueError(f"Unknown node class: {name}") from None
+
+
+def _tuples(value):
+    # JSON arrays come back as lists, values (the terms of a SparsePolynomial) are tuples
+    return tuple(_tuples(item) for item in value) if isinstance(value, list) else value
+
+
+# Literal encoding: one type byte, then the payload
+_INT, _FLOAT, _STR, _TUPLE, _NONE = b"i", b"f", b"s", b"t", b"n"
+_LENGTH = struct.Struct("<I")
+_DOUBLE = struct.Struct("<d")
+
+
+class _LiteralPool:
+    """Distinct literal values, encoded as they are added (2 and 2.0 are different literals)"""
+
+    def __init__(self):
+        self.values = {}
+        self.chunks = []
+
+    def add(self, value) -> int:
+        key = (type(value), repr(value))
+        index = self.values.get(key)
+        if index is None:
+            index = self.values[key] = len(self.values)
+            self.chunks.append(_encode_literal(value))
+        return index
+
+
+def _encode_literal(value) -> bytes:
+    if value is None:
+        return _NONE
+    if isinstance(value, bool) or not isinstance(value, (int, float, str, tuple)):
+        raise ValueError(f"Cannot serialize literal {value!r}")
+    if isinstance(value, int):
+        payload = value.to_bytes((value.bit_length() + 8) // 8, "little", signed=True)
+        return _INT + _LENGTH.pack(len(payload)) + payload
+    if isinstance(value, float):
+        return _FLOAT + _DOUBLE.pack(value)
+    if isinstance(value, str):
+        payload = value.encode()
+        return _STR + _LENGTH.pack(len(payload)) + payload
+    return _TUPLE + _LENGTH.pack(len(value)) + b"".join(_encode_literal(item) for item in value)
+
+
+def _read_literal(data: bytes, offset: int) -> tuple[object, int]:
+    """The literal at offset and the offset just after it"""
+    kind = data[offset : offset + 1]
+    offset += 1
+    try:
+        if kind == _NONE:
+            return None, offset
+        if kind == _FLOAT:
+            return _DOUBLE.unpack_from(data, offset)[0], offset + _DOUBLE.size
+        (length,) = _LENGTH.unpack_from(data, offset)
+        offset += _LENGTH.size
+        if kind == _TUPLE:
+            items = []
+            for _ in range(length):
+                item, offset = _read_literal(data, offset)
+                items.append(item)
+            return tuple(items), offset
+        payload = data[offset : offset + length]
+        if len(payload) != length:
+            raise ValueError("Serialized expression is truncated")
+        if kind == _INT:
+            return int.from_bytes(payload, "little", signed=True), offset + length
+        if kind == _STR:
+            return str(payload, "utf-8"), offset + length
+    except struct.error:
+        raise ValueError("Serialized expression is truncated") from None
+    raise ValueError(f"Unknown literal type: {kind!r}")
@@ -1,36 +1,40 @@
-import math as m
-from .basic import Expression, Constant, Division, Product, Negation, Sum
+from .basic import DERIVATIVE_RULES, Expression, Negation, _cyclic_derivative
 from .polynomial import Polynomial
 
 
 class Sin(Expression):
-    def __init__(self, argument: Expression):
-        super().__init__(argument, derivative_fn=Cos, fn_str="sin")
+    __slots__ = ()
+    fn_str = "sin"
+    _fn_name = "sin"
 
-    def __call__(self, x: float) -> float:
-        return m.sin(self.argument(x))
+    def __init__(self, argument: Expression):
+        super().__init__(argument)
 
-    def __str__(self):
-        return f"sin({self.argument})"
+    def _nth_derivative(self, n: int, variable: Expression) -> Expression | None:
+        return _cyclic_derivative(self, n, variable, ((1, Sin), (1, Cos), (-1, Sin), (-1, Cos)))
 
 
 class Cos(Expression):
-    def __init__(self, argument: Expression):
-        super().__init__(argument, derivative_fn=lambda x: Negation(Sin(x)), fn_str="cos")
+    __slots__ = ()
+    fn_str = "cos"
+    _fn_name = "cos"
 
-    def __call__(self, x: float) -> float:
-        return m.cos(self.argument(x))
+    def __init__(self, argument: Expression):
+        super().__init__(argument)
 
-    def __str__(self):
-        return f"cos({self.argument})"
+    def _nth_derivative(self, n: int, variable: Expression) -> Expression | None:
+        return _cyclic_derivative(self, n, variable, ((1, Cos), (-1, Sin), (-1, Cos), (1, Sin)))
 
 
 class Tan(Expression):
+    __slots__ = ()
+    fn_str = "tan"
+    _fn_name = "tan"
+
     def __init__(self, argument: Expression):
-        super().__init__(argument, lambda arg: Polynomial(Cos(arg), -2), fn_str="tan")
+        super().__init__(argument)
 
-    def __call__(self, x: float) -> float:
-        return m.tan(self.argument(x))
 
-    def __str__(self):
-        return f"tan({self.argument})"
+DERIVATIVE_RULES[Sin] = lambda node: Cos(node.argument)
+DERIVATIVE_RULES[Cos] = lambda node: Negation(Sin(node.argument))
+DERIVATIVE_RULES[Tan] = lambda node: Polynomial(Cos(node.argument), -2)
@@ -1,2 +1,3 @@
-from .parser import parse, Parser
-from .tokenizer import tokenize
\ No newline at end of file
+from .parser import parse, parse_tokens, Parser
+from .cache import PARSE_CACHE, ParseStore, persist, active_store, parse_cache_stats, clear_parse_cache
+from .tokenizer import tokenize, scan, Token, TokenizeError
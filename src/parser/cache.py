@@ -0,0 +1,97 @@
+import os
+import sqlite3
+
+from src.expressions import Expression, LRUCache, from_bytes, to_bytes
+from .tokenizer import Token, NUMBER
+
+# Parsed trees by normalized token stream. Trees are interned and immutable, so every hit returns the same shared tree.
+PARSE_CACHE = LRUCache(maxsize=4096)
+
+
+def normalized_key(tokens: list[Token]) -> str:
+    """Canonical text of a token stream: one space between tokens, lowercase names and numbers by value
+    ("sin ( x)", "SIN(x)" and "sin(x)" all give "sin ( x )"; "2" and "02" both give "2")"""
+    return " ".join(repr(token.value) if token.kind == NUMBER else token.value for token in tokens)
+
+
+class ParseStore:
+    """On-disk tier of the parse cache, an SQLite table from normalized key to the binary form of the tree.
+    It survives restarts and can be shared by several processes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = sqlite3.connect(path, timeout=30)  # Waits for writers in other processes
+        self._connection.execute("CREATE TABLE IF NOT EXISTS parsed (key TEXT PRIMARY KEY, tree BLOB NOT NULL)")
+        self._connection.commit()
+        self._pid = os.getpid()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Expression | None:
+        row = self._connection.execute("SELECT tree FROM parsed WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return from_bytes(row[0])
+
+    def put(self, key: str, expr: Expression) -> None:
+        self._connection.execute("INSERT OR REPLACE INTO parsed VALUES (?, ?)", (key, to_bytes(expr)))
+        self._connection.commit()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self), "path": self.path}
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __len__(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM parsed").fetchone()[0]
+
+
+# Disk tier consulted on memory misses, None when parsing is only cached in memory
+_store: ParseStore | None = None
+
+
+def persist(path: str | None) -> ParseStore | None:
+    """Adds an on-disk tier at path to the parse cache (None removes it). Returns the store.
+    Worker processes call it again with the same path, each one opening its own connection."""
+    global _store
+    if _store is not None and _store._pid == os.getpid():
+        # A connection inherited through fork is left alone, it belongs to the parent
+        _store.close()
+    _store = None if path is None else ParseStore(path)
+    return _store
+
+
+def active_store() -> ParseStore | None:
+    return _store
+
+
+def lookup(key: str) -> Expression | None:
+    """Tree cached under key, from memory or else from disk (then kept in memory too)"""
+    expr = PARSE_CACHE.get(key)
+    if expr is None and _store is not None:
+        expr = _store.get(key)
+        if expr is not None:
+            PARSE_CACHE.put(key, expr)
+    return expr
+
+
+def store(key: str, expr: Expression) -> None:
+    PARSE_CACHE.put(key, expr)
+    if _store is not None:
+        _store.put(key, expr)
+
+
+def parse_cache_stats() -> dict:
+    """Counters of each tier, with the hit rate of the memory tier (hits over lookups)"""
+    stats = {"memory": {**PARSE_CACHE.stats(), "hit_rate": PARSE_CACHE.hit_rate}}
+    if _store is not None:
+        stats["disk"] = _store.stats()
+    return stats
+
+
+def clear_parse_cache() -> None:
+    """Empties the memory tier and resets its counters (the disk tier is kept)"""
+    PARSE_CACHE.clear()
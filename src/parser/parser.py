@@ -1,4 +1,3 @@
-import re
 from src.expressions import (
     Expression,
     Constant,
@@ -18,7 +17,9 @@ from src.expressions import (
     Exponential,
     Logarithm,
 )
-from .tokenizer import tokenize
+from src.expressions import guards
+from .cache import lookup, normalized_key, store
+from .tokenizer import Token, NUMBER, NAME, SYMBOL, scan
 
 FUN_MAP = {
     "sin": Sin,
@@ -32,11 +33,31 @@ FUN_MAP = {
     "log": Logarithm,
 }
 
+BINARY_OPERATORS = {
+    "+": Sum,
+    "-": Subtraction,
+    "*": Product,
+    "/": Division,
+    "^": Power,
+}
+
+NEGATION = "neg"
+
+# Operator: (precedence, right associative)
+PRECEDENCE = {
+    "+": (1, False),
+    "-": (1, False),
+    "*": (2, False),
+    "/": (2, False),
+    NEGATION: (3, False),
+    "^": (4, True),
+}
+
 
 class Parser:
     """Abstract Syntax Tree Implementation"""
 
-    def __init__(self, tokens: list[str]):
+    def __init__(self, tokens: list[Token]):
         if len(tokens) == 0:
             raise ValueError("Expected ...")
         self.tokens = tokens
@@ -46,119 +67,120 @@ class Parser:
 
     """
     Priority order:
-     1. (parse_base): Variables('x'), Constants, Single Functions (self.fun_map), Parenthesys, and Negation
-     2. (parse_factor): Power
-     3. (parse_mult_div): Multiplication (and division)
-     4. (parse_expr): Adition (and subtractions)
+     1. Operands: Variables('x', 'y', ...), Constants, Single Functions (self.fun_map), Parenthesys
+     2. Power (right associative)
+     3. Negation
+     4. Multiplication (and division)
+     5. Adition (and subtractions)
     """
 
-    def _is_int(self, token: str) -> bool:
-        return re.match(r"^\-?\d+$", token) is not None
-
-    def _is_float(self, token: str) -> bool:
-        return re.match(r"^\-?\d+\.\d*|\-?\d*\.\d+$", token) is not None
-
-    def _is_text(self, token: str) -> bool:
-        return re.match(r"[a-zA-Z]+", token) is not None
-
     def get_function(self, token: str) -> type[Expression] | None:
         """Takes a token and returns a Expression (or None)"""
         return self.fun_map.get(token, None)
 
-    def peek(self) -> str | None:
+    def peek(self) -> Token | None:
         """Checks the current token (but doesnt update status)"""
         return self.tokens[self.pos] if self.pos < self.len else None
 
-    def consume(self, expected: str=None) -> str | None:
+    def consume(self, expected: str=None) -> Token:
         """Returns the current token (and updates status)"""
         token = self.peek()
         if token is None:
             raise ValueError("Unexpected end of input")
-        if expected and token != expected:
-            raise ValueError(f"Expected: {expected}, got: {token}")
+        if expected and (token.kind != SYMBOL or token.value != expected):
+            raise ValueError(f"Expected: {expected}, got: {token.text} at position {token.offset}")
         self.pos += 1
         return token
 
-    def parse_base(self) -> Expression:
-        """Parse the deepest-level elements: constants, variables, functions, negation, parentheses."""
-        token = self.consume()
-
-        if token is None:
-            raise ValueError("Unexpected end of input while parsing base.")
-
-        # Negation
-        if token == "-":
-            return Negation(self.parse_factor())
-
-        # Parentheses
-        if token == "(":
-            expr = self.parse_expr()
-            self.consume(")")
-            return expr
-
-        # Number: integer or float
-        if self._is_int(token):
-            return Constant(int(token))
-
-        if self._is_float(token):
-            return Constant(float(token))
-
-        # Variable
-        if token == "x":
-            return Variable()
-
-        # Function call
-        func_class = self.get_function(token)
-        if func_class:
-            self.consume("(")  # expect '('
-            arg = self.parse_expr()
-            self.consume(")")  # expect ')'
-            return func_class(arg)
-
-        raise ValueError(f"Unknown token: {token}")
-
-    def parse_factor(self) -> Expression:
-        """When we are parsing exponential function we should take in count that the order is right to left.
-        So iteratively we are going to parse_factor.
-        (Factor is optional)
-        E.g: a^b^c^d = a^(b^(c^d))
-        """
-        base = self.parse_base()
-        if self.peek() == "^":
-            self.consume()
-            factor = self.parse_factor()
-            return Power(base, factor)
-        return base
-
-    def parse_mult_div(self) -> Expression:
-        expr = self.parse_factor()
-        while self.peek() in {"*", "/"}:
-            operator = self.consume()
-            right = self.parse_factor()
-            expr_class = Product if operator == "*" else Division
-            expr = expr_class(expr, right)
-        return expr
-
-    def parse_expr(self) -> Expression:
-        expr = self.parse_mult_div()
-        while self.peek() in {"+", "-"}:
-            operator = self.consume()
-            right = self.parse_mult_div()
-            expr_class = Sum if operator == "+" else Subtraction
-            expr = expr_class(expr, right)
-        return expr
+    def _reduce(self, operands: list[Expression], operator: str) -> None:
+        """Applies a pending operator to the operands on top of the output stack"""
+        if operator == NEGATION:
+            operands.append(Negation(operands.pop()))
+            return
+        right = operands.pop()
+        left = operands.pop()
+        operands.append(BINARY_OPERATORS[operator](left, right))
 
     def parse(self) -> Expression:
+        """Shunting-yard parser with an explicit operator stack, so nesting depth is not limited by recursion.
+        Functions and '(' are kept on the operator stack until their ')' is consumed."""
         self.pos = 0
-        expr = self.parse_expr()
+        operands = []
+        operators = []
+        open_groups = 0
+        expect_operand = True
+        while True:
+            if expect_operand:
+                token = self.consume()
+                # Number: integer or float (already converted by the tokenizer)
+                if token.kind == NUMBER:
+                    operands.append(Constant(token.value))
+                    expect_operand = False
+                # Negation (applies to the following factor, so it binds tighter than * and / but not ^)
+                elif token.kind == SYMBOL and token.value == "-":
+                    operators.append(NEGATION)
+                # Parentheses
+                elif token.kind == SYMBOL and token.value == "(":
+                    operators.append("(")
+                    open_groups += 1
+                # Function call
+                elif token.kind == NAME and (func_class := self.get_function(token.value)):
+                    self.consume("(")  # expect '('
+                    operators.append(func_class)
+                    open_groups += 1
+                # Variable: any other name (x, y, z, ...)
+                elif token.kind == NAME:
+                    operands.append(Variable(token.value))
+                    expect_operand = False
+                else:
+                    raise ValueError(f"Unknown token: {token.text} at position {token.offset}")
+                continue
+
+            token = self.peek()
+            if token is not None and token.kind == SYMBOL and token.value in BINARY_OPERATORS:
+                precedence, right_associative = PRECEDENCE[token.value]
+                while operators and operators[-1] in PRECEDENCE:
+                    top_precedence, _ = PRECEDENCE[operators[-1]]
+                    if top_precedence < precedence or (top_precedence == precedence and right_associative):
+                        break
+                    self._reduce(operands, operators.pop())
+                operators.append(self.consume().value)
+                expect_operand = True
+            elif token is not None and token.kind == SYMBOL and token.value == ")" and open_groups:
+                self.consume()
+                while operators[-1] in PRECEDENCE:
+                    self._reduce(operands, operators.pop())
+                opener = operators.pop()
+                open_groups -= 1
+                if opener != "(":
+                    operands.append(opener(operands.pop()))
+            else:
+                break
+
+        if open_groups:
+            # Unclosed '(' or function call: fails on the current token
+            self.consume(")")
+        while operators:
+            self._reduce(operands, operators.pop())
+
         if self.peek() is None:
-            return expr
+            return operands.pop()
         raise ValueError(
-            f"Parsing error. Parsed function: {''.join(self.tokens[:self.pos])}..."
+            f"Parsing error. Parsed function: {''.join(token.text for token in self.tokens[:self.pos])}..."
         )
 
-
 def parse(expr: str) -> Expression:
-    tokens = tokenize(expr=expr)
-    parser = Parser(tokens=tokens)
-    return parser.parse()
+    return parse_tokens(scan(expr))
+
+
+def parse_tokens(tokens: list[Token]) -> Expression:
+    """Parses tokens, or returns the shared tree of an earlier parse of the same normalized tokens"""
+    key = normalized_key(tokens)
+    expr = lookup(key)
+    if expr is None:
+        expr = Parser(tokens=tokens).parse()
+        store(key, expr)
+    elif guards._active is not None:
+        # The tree is not rebuilt, so the active limits are checked on its root
+        guards._active.check(expr)
+    return expr
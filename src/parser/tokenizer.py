@@ -1,7 +1,55 @@
 import re
+from typing import NamedTuple
 
-TOKEN_REGEX = r"\d+\.\d*|\.\d+|\d+|[a-zA-Z]+|[()+\-*/^]"
+# Token kinds
+NUMBER = "number"
+NAME = "name"
+SYMBOL = "symbol"
+
+# A single pass over the input: the named group that matched gives the kind of each token
+SCANNER_REGEX = re.compile(
+    r"(?P<float>\d+\.\d*|\.\d+)"
+    r"|(?P<int>\d+)"
+    r"|(?P<name>[a-zA-Z]+)"
+    r"|(?P<symbol>[()+\-*/^])"
+    r"|(?P<space>\s+)"
+    r"|(?P<invalid>.)"
+)
+
+
+class Token(NamedTuple):
+    kind: str
+    value: int | float | str  # Converted number, lowercase name or symbol character
+    offset: int  # Position of the token in the source string
+    text: str
+
+
+class TokenizeError(ValueError):
+    def __init__(self, char: str, offset: int):
+        super().__init__(f"Invalid character {char!r} at position {offset}")
+        self.char = char
+        self.offset = offset
+
+
+def scan(expr: str) -> list[Token]:
+    """Splits expr into typed tokens, with numbers already converted and names lowercased"""
+    tokens = []
+    for match in SCANNER_REGEX.finditer(expr):
+        group = match.lastgroup
+        text = match.group()
+        if group == "float":
+            tokens.append(Token(NUMBER, float(text), match.start(), text))
+        elif group == "int":
+            tokens.append(Token(NUMBER, int(text), match.start(), text))
+        elif group == "name":
+            text = text.lower()
+            tokens.append(Token(NAME, text, match.start(), text))
+        elif group == "symbol":
+            tokens.append(Token(SYMBOL, text, match.start(), text))
+        elif group == "invalid":
+            raise TokenizeError(text, match.start())
+    return tokens
 
 
 def tokenize(expr: str) -> list:
-    return re.findall(TOKEN_REGEX, expr.replace(" ", "").lower())
+    return [token.text for token in scan(expr)]
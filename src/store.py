@@ -0,0 +1,306 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import deque
+from contextlib import nullcontext
+from typing import Iterable, Iterator
+
+from src.batch import derivative_tree, differentiate_batch
+from src.expressions import Expression, FlatExpression, LRUCache, flat_from_bytes, from_bytes
+from src.expressions import guards
+from src.expressions.guards import Limits, limits as bounded
+from src.parser import TokenizeError, scan
+from src.parser.cache import normalized_key
+
+MAGIC = b"DXDS"
+VERSION = 1
+# Magic, version, number of entries, number of index slots, offset of the index
+_HEADER = struct.Struct("<4sB3xQQQ")
+# Length of the key, length of the serialized derivative (the key bytes and then the derivative follow)
+_RECORD = struct.Struct("<II")
+# Hash of the key and offset of its record (0 for an empty slot)
+_SLOT = struct.Struct("<QQ")
+# Set in the offset of a record whose expression failed, while a store is built (no such record is in the index)
+_FAILED = 1 << 63
+
+
+def _hash(key: bytes) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def canonical(expr_str: str) -> str | None:
+    """Key of expr_str in a store: its normalized token stream (None when it cannot be tokenized)"""
+    try:
+        return normalized_key(scan(expr_str))
+    except TokenizeError:
+        return None
+
+
+def build_store(
+    path: str,
+    expressions: Iterable[str],
+    workers: int | None = None,
+    chunksize: int = 256,
+    max_passes: int = 10,
+    limits: Limits = None,
+) -> dict:
+    """Differentiates every expression (with differentiate_batch) and writes the simplified derivatives
+    to a store file at path, replacing it atomically. Expressions are read lazily and entries go straight
+    to disk, only the index is kept in memory. Inputs with the same canonical form are differentiated
+    once, failures are left out. Returns the number of entries, failures and duplicates."""
+    counts = {"entries": 0, "errors": 0, "duplicates": 0}
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as file, open(temporary, "rb") as reader:
+            file.write(bytes(_HEADER.size))
+            records = _write_records(file, reader, expressions, counts, (workers, chunksize, max_passes, limits))
+            # Failed inputs have a record (so their duplicates are found) but no entry
+            index = _Index(records.size - records.failed)
+            for key_hash, offset in records.items():
+                if not offset & _FAILED:
+                    index.add(key_hash, offset)
+            offset = file.tell()
+            index_offset = offset + (-offset) % 8
+            file.write(bytes(index_offset - offset))
+            file.write(index.to_bytes())
+            file.seek(0)
+            file.write(_HEADER.pack(MAGIC, VERSION, index.size, index.n_slots, index_offset))
+        # Readers of the previous file keep their mapping
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    counts["entries"] = index.size
+    return counts
+
+
+def _write_records(file, reader, expressions: Iterable[str], counts: dict, batch: tuple) -> "_Index":
+    """Differentiates and writes one record per canonical form, and returns the index of the records
+    (offsets of failures have _FAILED set). Duplicates are found through the index and the keys on disk."""
+    records = _Index()
+    keys = deque()
+    in_flight = set()  # Keys sent to differentiate_batch and not written yet
+
+    def recorded(key: bytes) -> bool:
+        for offset in records.offsets(_hash(key)):
+            file.flush()
+            reader.seek(offset & ~_FAILED)
+            key_length, _ = _RECORD.unpack(reader.read(_RECORD.size))
+            if key_length == len(key) and reader.read(key_length) == key:
+                return True
+        return False
+
+    def unique() -> Iterator[str]:
+        for expr_str in expressions:
+            key = canonical(expr_str)
+            if key is None:
+                counts["errors"] += 1
+            elif key in in_flight or recorded(key.encode()):
+                counts["duplicates"] += 1
+            else:
+                in_flight.add(key)
+                keys.append(key)
+                yield expr_str
+
+    for result in differentiate_batch(unique(), *batch, trees=True):
+        key = keys.popleft()
+        in_flight.remove(key)
+        key = key.encode()
+        tree = result.tree if result.ok else b""
+        offset = file.tell()
+        file.write(_RECORD.pack(len(key), len(tree)))
+        file.write(key)
+        file.write(tree)
+        if not result.ok:
+            counts["errors"] += 1
+            records.failed += 1
+            offset |= _FAILED
+        records.add(_hash(key), offset)
+    return records
+
+
+class _Index:
+    """(hash, offset) pairs in open addressing slots with linear probing, at most half full.
+    Grows as entries are added unless its number of entries is given up front."""
+
+    def __init__(self, size: int = None):
+        self.n_slots = 1
+        while self.n_slots < 2 * (size or 0):
+            self.n_slots *= 2
+        self.slots = array("Q", bytes(_SLOT.size * self.n_slots))
+        self.size = 0
+        self.failed = 0
+        self.grows = size is None
+
+    def offsets(self, key_hash: int) -> Iterator[int]:
+        """Offsets stored under key_hash"""
+        slots, mask = self.slots, self.n_slots - 1
+        slot = key_hash & mask
+        while slots[2 * slot + 1]:
+            if slots[2 * slot] == key_hash:
+                yield slots[2 * slot + 1]
+            slot = (slot + 1) & mask
+
+    def add(self, key_hash: int, offset: int) -> None:
+        if self.grows and 2 * (self.size + 1) > self.n_slots:
+            entries = list(self.items())
+            self.n_slots *= 2
+            self.slots = array("Q", bytes(_SLOT.size * self.n_slots))
+            for entry in entries:
+                self._put(*entry)
+        self._put(key_hash, offset)
+        self.size += 1
+
+    def _put(self, key_hash: int, offset: int) -> None:
+        slots, mask = self.slots, self.n_slots - 1
+        slot = key_hash & mask
+        while slots[2 * slot + 1]:
+            slot = (slot + 1) & mask
+        slots[2 * slot] = key_hash
+        slots[2 * slot + 1] = offset
+
+    def items(self) -> Iterator[tuple[int, int]]:
+        slots = self.slots
+        for slot in range(self.n_slots):
+            if slots[2 * slot + 1]:
+                yield slots[2 * slot], slots[2 * slot + 1]
+
+    def to_bytes(self) -> bytes:
+        """The slots as stored in a file (little endian)"""
+        slots = array("Q", self.slots)
+        if sys.byteorder != "little":
+            slots.byteswap()
+        return slots.tobytes()
+
+
+class DerivativeStore:
+    """Read-only view of a store file, memory-mapped: every process opening the same file shares its
+    pages, and derivatives are decoded straight from the mapping. Expressions missing from the store
+    go through the usual parse/derivative/simplify pipeline. Decoded trees are kept in an LRU cache.
+    A new build of the file is only seen by stores opened after it."""
+
+    def __init__(self, path: str, cache_size: int = 4096, max_passes: int = 10, limits: Limits = None):
+        self.path = path
+        self.max_passes = max_passes
+        self.limits = limits
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._data = memoryview(self._map)
+        if len(self._data) < _HEADER.size:
+            self.close()
+            raise ValueError(f"Not a derivative store: {path}")
+        magic, version, self._entries, self._slots, self._index = _HEADER.unpack_from(self._data)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Not a derivative store (or an unsupported version): {path}")
+        self.cache = LRUCache(maxsize=cache_size)
+        self.hits = 0
+        self.misses = 0
+        self.computed = 0
+
+    def _record(self, key: bytes) -> memoryview | None:
+        """Serialized derivative stored under key, a view of the mapping"""
+        if not self._slots:
+            return None
+        data = self._data
+        key_hash = _hash(key)
+        slot = key_hash & (self._slots - 1)
+        while True:
+            stored_hash, offset = _SLOT.unpack_from(data, self._index + _SLOT.size * slot)
+            if not offset:
+                return None
+            if stored_hash == key_hash:
+                key_length, tree_length = _RECORD.unpack_from(data, offset)
+                start = offset + _RECORD.size
+                if data[start : start + key_length] == key:
+                    return data[start + key_length : start + key_length + tree_length]
+            slot = (slot + 1) & (self._slots - 1)
+
+    def lookup(self, expr_str: str) -> Expression | None:
+        """Stored derivative of expr_str, None if it is not in the store. Like a computed derivative,
+        it raises LimitExceeded past the limits of the store or of an active limits() block."""
+        key = canonical(expr_str)
+        if key is None:
+            self.misses += 1
+            return None
+        derivative = self.cache.get(key)
+        if derivative is None:
+            record = self._record(key.encode())
+            if record is None:
+                self.misses += 1
+                return None
+            derivative = from_bytes(record)
+            self.cache.put(key, derivative)
+        with bounded(*self.limits) if self.limits is not None else nullcontext():
+            if guards._active is not None:
+                # Decoding a tree only checks the nodes it builds, not a cached one
+                guards._active.check(derivative)
+        self.hits += 1
+        return derivative
+
+    def derivative(self, expr_str: str) -> Expression:
+        """Derivative of expr_str: from the store, or else computed (and cached in this process only)"""
+        derivative = self.lookup(expr_str)
+        if derivative is None:
+            derivative = self._compute(expr_str, canonical(expr_str))
+        return derivative
+
+    def _compute(self, expr_str: str, key: str | None) -> Expression:
+        derivative = derivative_tree(expr_str, self.max_passes, self.limits)
+        self.computed += 1
+        if key is not None:
+            self.cache.put(key, derivative)
+        return derivative
+
+    def flat(self, expr_str: str) -> FlatExpression:
+        """Derivative of expr_str as a FlatExpression, to evaluate it. A stored derivative is read from
+        the mapping without building any node, so this is much cheaper than derivative() on a cold cache.
+        Under limits (of the store or of a limits() block) it goes through derivative() to be checked."""
+        if self.limits is not None or guards._active is not None:
+            return FlatExpression.from_expression(self.derivative(expr_str))
+        key = canonical(expr_str)
+        record = None if key is None else self._record(key.encode())
+        if record is None:
+            # Computed before in this process, or now
+            derivative = None if key is None else self.cache.get(key)
+            if derivative is None:
+                self.misses += 1
+                derivative = self._compute(expr_str, key)
+            else:
+                self.hits += 1
+            return FlatExpression.from_expression(derivative)
+        self.hits += 1
+        return flat_from_bytes(record)
+
+    def __contains__(self, expr_str: str) -> bool:
+        key = canonical(expr_str)
+        return key is not None and self._record(key.encode()) is not None
+
+    def __len__(self) -> int:
+        return self._entries
+
+    def stats(self) -> dict:
+        """Lookups served without computing (hits) or not (misses), derivatives computed, and the decoded tree cache"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "computed": self.computed,
+            "cache": self.cache.stats(),
+        }
+
+    def close(self) -> None:
+        self._data.release()
+        self._map.close()
+
+    def __enter__(self) -> "DerivativeStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
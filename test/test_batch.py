@@ -0,0 +1,71 @@
+import io
+import json
+
+import pytest
+
+from src.batch import DerivativeResult, derivative_of, differentiate_batch
+
+EXPRESSIONS = ["x^2", "sin(x) * x", "x + $", "1/0", "exp(x)", "ln(x)"]
+EXPECTED = [
+    DerivativeResult("x^2", "2 * x", None),
+    DerivativeResult("sin(x) * x", "x * cos(x) + sin(x)", None),
+    DerivativeResult("x + $", None, "TokenizeError: Invalid character '$' at position 4"),
+    DerivativeResult("1/0", None, "ZeroDivisionError: Zero division error: 1 / 0"),
+    DerivativeResult("exp(x)", "exp(x)", None),
+    DerivativeResult("ln(x)", "1 / x", None),
+]
+
+
+def test_derivative_of():
+    assert derivative_of("x^2 + 3*x + 5 + exp(x)") == "2 * x + 3 + exp(x)"
+
+
+def test_in_process_batch():
+    results = list(differentiate_batch(iter(EXPRESSIONS), workers=1))
+    assert [result[:3] for result in results] == [expected[:3] for expected in EXPECTED]
+    assert all(result.seconds > 0 for result in results)
+    assert [result.ok for result in results] == [True, True, False, False, True, True]
+
+
+def test_process_pool_keeps_order():
+    expressions = EXPRESSIONS * 20
+    results = list(differentiate_batch(expressions, workers=2, chunksize=3))
+    assert [result[:3] for result in results] == [expected[:3] for expected in EXPECTED] * 20
+
+
+def test_invalid_workers():
+    with pytest.raises(ValueError):
+        list(differentiate_batch(EXPRESSIONS, workers=0))
+
+
+def test_stream_text_and_json():
+    from derivative_engine import stream
+
+    output = io.StringIO()
+    stream(io.StringIO("x^2\nx + $\n"), output, workers=1)
+    assert output.getvalue() == "2 * x\nerror: TokenizeError: Invalid character '$' at position 4\n"
+
+    output = io.StringIO()
+    stream(["ln(x)\n"], output, workers=1, as_json=True)
+    record = json.loads(output.getvalue())
+    assert record["expression"] == "ln(x)" and record["derivative"] == "1 / x" and record["error"] is None
+    assert record["seconds"] >= 0
+
+
+def test_limits_per_expression():
+    from src.expressions import Limits
+
+    limits = Limits(max_nodes=30)
+    results = list(differentiate_batch(["x^2", "sin(x)^2 * exp(x^2) * cos(x)^3 * tan(x)"], workers=1, limits=limits))
+    assert results[0].derivative == "2 * x"
+    assert results[1].error.startswith("LimitExceeded: Expression limit exceeded: nodes is")
+
+
+def test_limits_with_warm_caches():
+    from src.batch import derivative_tree
+    from src.expressions import Limits
+
+    expr_str = "sin(x)^2 * exp(x^2) * cos(x)^3 * tan(x) * ln(x + 2)"
+    derivative_tree(expr_str)
+    (result,) = differentiate_batch([expr_str], workers=1, limits=Limits(max_nodes=30))
+    assert result.error.startswith("LimitExceeded:")
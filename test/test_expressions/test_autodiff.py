@@ -0,0 +1,61 @@
+import math
+
+import pytest
+
+from src.expressions.basic import Constant
+from src.parser.parser import parse
+
+XS = [0.1, 0.5, 1.0, 2.0]
+
+
+@pytest.mark.parametrize(
+    "expr_str",
+    [
+        "x^2 + 3*x + 5 + exp(x)",
+        "sin(x) * cos(x^2) / (x + 1)",
+        "tan(x) - tanh(x) + sinh(x) * cosh(x)",
+        "ln(x^x) - -x",
+        "(x + 1)^x / 2",
+        "x^0.5 + 2^x",
+    ],
+)
+def test_matches_symbolic_derivatives(expr_str):
+    expr = parse(expr_str)
+    for x in XS:
+        derivative, expected = expr, []
+        for _ in range(4):
+            expected.append(derivative(x))
+            derivative = derivative.derivative()
+        assert expr.derivatives_at(x, order=3) == pytest.approx(expected)
+
+
+def test_value_and_first_derivative_by_default():
+    value, slope = parse("sin(x)").derivatives_at(1.0)
+    assert value == pytest.approx(math.sin(1.0))
+    assert slope == pytest.approx(math.cos(1.0))
+
+
+def test_integer_powers_at_zero():
+    # Repeated multiplication, where the power rule's recurrence would divide by x = 0
+    assert parse("x^3").derivatives_at(0.0, order=4) == [0.0, 0.0, 0.0, 6.0, 0.0]
+
+
+def test_constant():
+    assert Constant(4).derivatives_at(1.0, order=2) == [4, 0.0, 0.0]
+
+
+def test_domain_errors_raise_like_call():
+    with pytest.raises(ValueError):
+        parse("ln(x)").derivatives_at(-1.0)
+    with pytest.raises(ValueError):
+        parse("x").derivatives_at(1.0, order=-1)
+
+
+def test_arrays():
+    np = pytest.importorskip("numpy")
+    expr = parse("sin(x) * exp(x^2)")
+    derivatives = expr.derivatives_at(np.array(XS), order=2)
+    assert [d.shape for d in derivatives] == [(len(XS),)] * 3
+    for i, x in enumerate(XS):
+        assert [d[i] for d in derivatives] == pytest.approx(expr.derivatives_at(x, order=2))
+    assert np.all(Constant(4).derivatives_at(np.zeros(3))[1] == 0)
@@ -1,4 +1,4 @@
-from src.expressions.basic import Constant, Variable, Negation
+from src.expressions.basic import Constant, Variable, Negation, Sum
 from src.test_utils import evaluate_derivative
 
 
@@ -31,3 +31,12 @@ def test_negation_variable():
     expected_derivative = lambda x: -1
 
     evaluate_derivative(expresion, expected_derivative, VALUES)
+
+
+def test_evaluation_order_is_reused():
+    inner = Sum(Variable(), Constant(2))
+    expr = Sum(Negation(inner), Sum(inner, Variable("y")))
+    assert expr(1.0, y=3.0) == 3.0
+    assert expr(2.0, y=-1.0) == -1.0
+    # Subexpressions keep their own order
+    assert inner(5.0) == 7.0
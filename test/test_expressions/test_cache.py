@@ -0,0 +1,53 @@
+import pytest
+
+from src.expressions import (
+    LRUCache,
+    DERIVATIVE_CACHE,
+    SIMPLIFY_CACHE,
+    cache_stats,
+    clear_caches,
+)
+from src.parser.parser import parse
+
+
+def test_lru_eviction_and_counters():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get("b") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 1, "size": 2, "maxsize": 2}
+
+    cache.resize(1)
+    assert len(cache) == 1 and "c" in cache
+    assert cache.evictions == 2
+
+
+def test_lru_zero_size_and_validation():
+    cache = LRUCache(maxsize=0)
+    cache.put("a", 1)
+    assert len(cache) == 0
+    with pytest.raises(ValueError):
+        LRUCache(maxsize=-1)
+
+
+def test_derivative_is_memoized():
+    clear_caches()
+    expr = parse("sin(x) * exp(x^2) / (x + 1)")
+    first = expr.derivative()
+    misses = DERIVATIVE_CACHE.misses
+    assert expr.derivative() is first
+    assert DERIVATIVE_CACHE.misses == misses
+    assert DERIVATIVE_CACHE.hits >= 1
+
+
+def test_simplify_is_memoized():
+    clear_caches()
+    derivative = parse("x^3 * cos(x)").derivative()
+    first = derivative.simplify()
+    hits = SIMPLIFY_CACHE.hits
+    assert derivative.simplify() is first
+    assert SIMPLIFY_CACHE.hits == hits + 1
+    assert set(cache_stats()) == {"derivative", "simplify"}
@@ -0,0 +1,98 @@
+import math
+
+import pytest
+
+from src.expressions.basic import Constant, Variable, Sum, Product, Division, Subtraction
+from src.expressions.polynomial import Polynomial
+from src.expressions.power import Power
+from src.parser.parser import parse
+
+VALUES = [0.1, 0.5, 1.0, 2.0, 3.0]
+
+
+@pytest.mark.parametrize(
+    "expr_str",
+    [
+        "x^2 + 3*x + 5 + exp(x)",
+        "sin(x) * cos(x^2) / (x + 1)",
+        "tan(x) - tanh(x) + sinh(x) * cosh(x)",
+        "ln(x^x) - -x",
+        "(x + 1)^x / 2",
+        "-2^x - -x^-2",
+    ],
+)
+def test_matches_tree_evaluation(expr_str):
+    for expr in (parse(expr_str), parse(expr_str).derivative()):
+        compiled = expr.compile()
+        for x in VALUES:
+            assert compiled(x) == pytest.approx(expr(x))
+
+
+def test_negative_constants_keep_precedence():
+    x = Variable()
+    assert Power(Constant(-2), Constant(2)).compile()(0) == 4
+    assert Polynomial(x, -2).compile()(2) == 0.25
+    assert Product(Constant(math.inf), x).compile()(1) == math.inf
+
+
+def test_shared_subexpressions_are_hoisted():
+    shared = Sum(Variable(), Constant(1))
+    expr = Division(Product(shared, shared), shared)
+    compiled = expr.compile()
+    assert compiled.source.count("x + 1") == 1
+    assert compiled(2) == pytest.approx(3)
+
+
+def test_compiled_function_is_cached():
+    expr = parse("sin(x) + x")
+    assert expr.compile() is expr.compile()
+    assert parse("sin(x) + x").compile() is expr.compile()
+
+
+def test_errors_match_tree_evaluation():
+    x = Variable()
+    expr = Division(Constant(1), Subtraction(x, Constant(1)))
+    with pytest.raises(ZeroDivisionError):
+        expr(1)
+    with pytest.raises(ZeroDivisionError):
+        expr.compile()(1)
+
+
+@pytest.mark.parametrize(
+    "expr_str",
+    [
+        " + ".join(f"{i} * x" for i in range(1, 1001)),
+        " + ".join(f"sin({i} * x)" for i in range(1, 1001)),
+        "sin(" * 1000 + "x" + ")" * 1000,
+        "x - (" * 500 + "x" + ")" * 500,
+    ],
+)
+def test_long_and_deep_expressions_compile(expr_str):
+    for expr in (parse(expr_str), parse(expr_str).derivative()):
+        compiled = expr.compile()
+        assert compiled(0.3) == pytest.approx(expr(0.3))
+        assert max(map(len, compiled.source.splitlines())) < 2000
+
+
+def test_parentheses_only_where_needed():
+    source = parse("(x - (x - 1)) / (2 * (x / 3)) + (x + 1) * 2 + -x^2").compile().source
+    assert source.splitlines()[-1] == "    return (x - (x - 1)) / (2 * (x / 3)) + (x + 1) * 2 + -x ** 2"
+
+
+def test_variable_names_do_not_clash_with_generated_names():
+    with pytest.raises(ValueError):
+        parse("lambda * x")
+    with pytest.raises(ValueError):
+        Variable("_float")
+    t0, float_ = Variable("t0"), Variable("float")
+    shared = Product(t0, float_)
+    expr = Sum(Product(shared, Constant(math.inf)), Product(shared, shared))
+    compiled = expr.compile()
+    assert "    t1 = t0 * float" in compiled.source.splitlines()
+    assert compiled(x=0.0, t0=2.0, float=1.0) == math.inf
+    assert compiled(x=0.0, t0=-2.0, float=1.0) == -math.inf
+
+
+def test_readme_example_source():
+    source = parse("sin(x) * exp(x^2)").derivative().simplify_fully().compile().source
+    assert source == "def compiled(x):\n    t0 = exp(x ** (2))\n    return cos(x) * t0 + 2 * (x * t0 * sin(x))"
@@ -0,0 +1,55 @@
+import pytest
+
+from src.expressions.basic import Constant, Variable, Sum, Product, Division
+from src.expressions.cse import Reference, common_subexpressions
+from src.expressions.trigonometric import Sin
+from src.parser.parser import parse
+
+VALUES = [0.1, 0.5, 1.0, 2.0, 3.0]
+
+
+def test_shared_subtrees_are_bound_once():
+    shared = Sum(Variable(), Constant(1))
+    expr = Division(Product(shared, Sin(shared)), shared)
+    sequence = common_subexpressions(expr)
+
+    assert len(sequence) == 1
+    reference, bound = sequence.bindings[0]
+    assert bound is shared and reference.target is shared
+    assert sequence.result == Division(Product(reference, Sin(reference)), reference)
+    assert str(sequence) == "t0 = x + 1\nt0 * sin(t0) / t0"
+
+
+def test_nested_bindings_refer_to_earlier_ones():
+    inner = Sum(Variable(), Constant(1))
+    outer = Sin(inner)
+    expr = Sum(Product(outer, outer), Product(inner, Constant(2)))
+    (t0, bound0), (t1, bound1) = common_subexpressions(expr).bindings
+    assert bound0 is inner
+    assert bound1 == Sin(t0)
+
+
+def test_no_sharing_gives_no_bindings():
+    expr = parse("sin(x) + cos(x)")
+    sequence = common_subexpressions(expr)
+    assert sequence.bindings == []
+    assert sequence.result is expr
+
+
+@pytest.mark.parametrize("order", [1, 2, 3])
+def test_evaluation_matches_tree(order):
+    expr = parse("sin(x) * exp(x^2) / (x + 1)")
+    for _ in range(order):
+        expr = expr.derivative()
+    sequence = common_subexpressions(expr)
+    assert len(sequence) > 0
+    for x in VALUES:
+        assert sequence(x) == pytest.approx(expr(x))
+
+
+def test_reference_behaves_as_target():
+    target = parse("x^2 + 1")
+    reference = Reference("t0", target)
+    assert str(reference) == "t0"
+    assert reference(3) == target(3)
+    assert reference.derivative() is target.derivative()
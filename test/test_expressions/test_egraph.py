@@ -0,0 +1,97 @@
+import sys
+
+import pytest
+
+from src.expressions import Constant, Cos, Product, Sin, Sum, Variable
+from src.expressions.egraph import COSTS, EGraph, egraph_simplify
+from src.expressions.rewrite import Rule, Wildcard
+from src.parser.parser import parse
+
+VALUES = [0.3, 0.8, 1.7]
+
+
+def cost(expr):
+    graph = EGraph()
+    class_id = graph.add(expr)
+    graph.rebuild()
+    return graph.costs_of_classes()[graph.find(class_id)][0]
+
+
+@pytest.mark.parametrize(
+    "expr_str, expected",
+    [
+        ("exp(x) * exp(y)", "exp(x + y)"),
+        ("sin(x) / cos(x)", "tan(x)"),
+        ("sin(x)^2 + cos(x)^2 + x", "x + 1"),
+        ("x + 0 * y", "x"),
+    ],
+)
+def test_identities(expr_str, expected):
+    assert str(egraph_simplify(parse(expr_str))) == expected
+
+
+@pytest.mark.parametrize(
+    "expr_str",
+    [
+        "x * y + x * z",
+        "2*x*sin(x) + 2*x*cos(x)",
+        "sin(x) * exp(x^2) / (x + 1)",
+        "(x^3 - 2*x + 1)^2 * sin(x)",
+    ],
+)
+def test_never_costlier_than_greedy(expr_str):
+    expr = parse(expr_str).derivative()
+    greedy = expr.simplify_fully()
+    result = egraph_simplify(expr)
+    assert cost(result) <= cost(greedy)
+    for x in VALUES:
+        assert result(x, y=1.3, z=0.4) == pytest.approx(greedy(x, y=1.3, z=0.4))
+
+
+def test_factoring_is_cheaper():
+    assert cost(egraph_simplify(parse("x * y + x * z"))) < cost(parse("x * y + x * z"))
+
+
+def test_budgets():
+    expr = parse("sin(x) * exp(x^2) / (x + 1)").derivative().derivative()
+    greedy = expr.simplify_fully()
+    assert egraph_simplify(expr, time_limit=0) is greedy
+    assert egraph_simplify(expr, max_iterations=0) is greedy
+    limited = egraph_simplify(expr, max_nodes=50)
+    assert limited(0.5) == pytest.approx(greedy(0.5))
+
+
+def test_congruence():
+    graph = EGraph()
+    x, y = Variable("x"), Variable("y")
+    sin_x, sin_y = graph.add(Sin(x)), graph.add(Sin(y))
+    assert graph.find(sin_x) != graph.find(sin_y)
+    graph.union(graph.add(x), graph.add(y))
+    graph.rebuild()
+    # x = y implies sin(x) = sin(y)
+    assert graph.find(sin_x) == graph.find(sin_y)
+
+
+def test_custom_rules_and_costs():
+    u = Wildcard("u")
+    rules = [Rule(Sum(Cos(u), Sin(u)), Product(Constant(2), Sin(u)), name="wrong on purpose")]
+    assert str(egraph_simplify(parse("sin(x) + cos(x)"), rules=rules)) == "2 * sin(x)"
+    # With products made expensive, the sum is kept
+    costs = {**COSTS, Product: 100}
+    assert str(egraph_simplify(parse("sin(x) + cos(x)"), rules=rules, costs=costs)) == "cos(x) + sin(x)"
+
+
+def test_deep_input():
+    depth = 3 * sys.getrecursionlimit()
+    chain = "sin(" * depth + "{}" + ")" * depth
+    assert egraph_simplify(parse(chain.format("exp(x) * exp(y)"))) is parse(chain.format("exp(x + y)"))
+    # Patterns as deep as the input
+    u = Wildcard("u")
+    pattern = Sin(Sin(u))
+    for _ in range(depth // 2 - 1):
+        pattern = Sin(Sin(pattern))
+    graph = EGraph()
+    class_id = graph.add(parse(chain.format("x")))
+    graph.rebuild()
+    assert list(graph.match(pattern, class_id)) == [{"u": graph.add(Variable())}]
+    assert graph.instantiate(pattern, {"u": graph.add(Variable())}) == graph.find(class_id)
@@ -0,0 +1,45 @@
+import math
+
+import pytest
+
+from src.expressions.basic import Constant, Variable, Division, Subtraction
+from src.parser.parser import parse
+
+np = pytest.importorskip("numpy")
+
+XS = [0.1, 0.5, 1.0, 2.0, 3.0]
+
+
+@pytest.mark.parametrize(
+    "expr_str",
+    [
+        "x^2 + 3*x + 5 + exp(x)",
+        "sin(x) * cos(x^2) / (x + 1)",
+        "tan(x) - tanh(x) + sinh(x) * cosh(x)",
+        "ln(x^x) - -x",
+        "(x + 1)^x / 2",
+    ],
+)
+def test_matches_scalar_evaluation(expr_str):
+    for expr in (parse(expr_str), parse(expr_str).derivative().simplify_fully()):
+        actual = expr.evaluate_array(XS)
+        expected = [expr(x) for x in XS]
+        assert actual.shape == (len(XS),)
+        assert np.allclose(actual, expected)
+
+
+def test_constant_is_broadcast():
+    result = Constant(4).evaluate_array(np.zeros((2, 3)))
+    assert result.shape == (2, 3)
+    assert np.all(result == 4)
+
+
+def test_out_of_domain_points_do_not_raise():
+    result = parse("ln(x)").evaluate_array([-1.0, 0.0, math.e])
+    assert math.isnan(result[0])
+    assert result[1] == -math.inf
+    assert result[2] == pytest.approx(1.0)
+
+    x = Variable()
+    result = Division(Constant(1), Subtraction(x, x)).evaluate_array([1.0])
+    assert result[0] == math.inf
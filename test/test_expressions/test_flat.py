@@ -0,0 +1,86 @@
+import pytest
+
+from src.expressions.basic import Constant, Sum, Variable, _bottom_up
+from src.expressions.cse import common_subexpressions
+from src.expressions.flat import FlatExpression
+from src.parser.parser import parse
+
+EXPRESSIONS = [
+    "x^2 + 3*x + 5 + exp(x)",
+    "sin(x) * cos(x^2) / (x + 1)",
+    "tan(x) - tanh(x) + sinh(x) * cosh(x)",
+    "ln(x^x) - -x",
+    "(x + 1)^x / 2",
+    "x^0.5 + 2^x",
+    "x * y + sin(y)^3 - x / y",
+]
+VALUES = [0.3, 0.8, 1.7]
+
+
+@pytest.mark.parametrize("expr_str", EXPRESSIONS)
+def test_round_trip(expr_str):
+    expr = parse(expr_str)
+    assert FlatExpression.from_expression(expr).to_expression() is expr
+
+
+@pytest.mark.parametrize("expr_str", EXPRESSIONS)
+def test_evaluation(expr_str):
+    expr = parse(expr_str)
+    flat = FlatExpression.from_expression(expr)
+    for x in VALUES:
+        assert flat(x, y=1.3) == pytest.approx(expr(x, y=1.3))
+        assert flat.simplify()(x, y=1.3) == pytest.approx(expr(x, y=1.3))
+
+
+@pytest.mark.parametrize("expr_str", EXPRESSIONS)
+@pytest.mark.parametrize("variable", ["x", "y"])
+def test_derivative(expr_str, variable):
+    expr = parse(expr_str)
+    derivative = FlatExpression.from_expression(expr).derivative(variable)
+    for x in VALUES:
+        expected = expr.gradient(x, y=1.3)[1][variable]
+        assert derivative(x, y=1.3) == pytest.approx(expected)
+        assert derivative.to_expression()(x, y=1.3) == pytest.approx(expected)
+
+
+def test_shared_nodes_stored_once():
+    expr = parse("sin(x^2) + cos(x^2) * x^2")
+    flat = FlatExpression.from_expression(expr)
+    assert len(flat) == len(_bottom_up(expr, lambda node, *children: {node}.union(*children)))
+    # References are stored as their target
+    assert FlatExpression.from_expression(common_subexpressions(expr).result).to_expression() is expr
+
+
+def test_folding():
+    x = Variable()
+    flat = FlatExpression.from_expression(Sum(Sum(Constant(0), x), Sum(Constant(2), Constant(3))))
+    assert str(flat.simplify().to_expression()) == "x + 5"
+    assert str(FlatExpression.from_expression(parse("x^3 * sin(x)")).derivative().to_expression()) == "3 * x ^ 2 * sin(x) + x ^ 3 * cos(x)"
+    assert str(FlatExpression.from_expression(parse("sin(y)")).derivative().to_expression()) == "0"
+
+
+def test_missing_variable():
+    with pytest.raises(ValueError):
+        FlatExpression.from_expression(parse("x * y"))(1.0)
+
+
+def test_arrays():
+    np = pytest.importorskip("numpy")
+    expr = parse("sin(x) * exp(x^2) / y")
+    xs = np.array(VALUES)
+    flat = FlatExpression.from_expression(expr)
+    assert np.allclose(flat.evaluate_array(xs, y=2.0), expr.evaluate_array(xs, y=2.0))
+    assert flat.evaluate_array(np.zeros(3), y=0.0).shape == (3,)
+
+
+@pytest.mark.parametrize("expr_str", ["sin(x) / cos(y)", "1 / (x + 1)", "x / sin(x)", "exp(x) / (x^2 + 1)^3", "tan(x) / x / ln(x)"])
+def test_derivative_matches_the_expression_rules(expr_str):
+    # Quotients follow the same rule, u' / v - u * v' / (v * v), so both simplify to the same tree
+    expr = parse(expr_str)
+    derivative = FlatExpression.from_expression(expr).derivative().to_expression()
+    assert derivative.simplify_fully() is expr.derivative().simplify_fully()
+
+
+def test_quotient_with_constant_denominator():
+    derivative = FlatExpression.from_expression(parse("sin(x) / cos(y)")).derivative()
+    assert str(derivative.to_expression()) == "cos(x) / cos(y)"
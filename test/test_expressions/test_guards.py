@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from src.expressions import LimitExceeded, Sum, Variable, limits
+from src.parser.parser import parse
+
+
+def test_size_and_depth_on_construction():
+    x = Variable()
+    square = Sum(x, x)
+    assert (x.size, x.depth) == (1, 1)
+    assert (square.size, square.depth) == (3, 2)
+    # Shared subtrees count once per use
+    assert Sum(square, square).size == 7
+    assert parse("sin(x) * exp(x^2)").depth == 4
+
+
+def test_max_nodes_during_derivative():
+    expr = parse("sin(x)^2 * exp(x^2) * cos(x)^3 * tan(x)")
+    with limits(max_nodes=50):
+        with pytest.raises(LimitExceeded) as error:
+            expr.derivative().derivative()
+    assert error.value.limit == "nodes"
+    assert error.value.maximum == 50
+    assert error.value.value > 50
+    # Outside the block nothing is bounded
+    assert expr.derivative().derivative().size > 50
+
+
+def test_max_depth_during_parse():
+    with limits(max_depth=10):
+        assert parse("(" * 8 + "x" + ")" * 8).depth == 1
+        with pytest.raises(LimitExceeded):
+            parse("sin(" * 20 + "x" + ")" * 20)
+
+
+def test_already_built_nodes_are_checked():
+    expr = parse("sin(x) * exp(x^2) + x^3")
+    with limits(max_nodes=3), pytest.raises(LimitExceeded):
+        expr.simplify_fully()
+
+
+def test_max_seconds():
+    expr = parse("sin(x^3) * exp(x^2) / (x + 1)")
+    with limits(max_seconds=0.0):
+        time.sleep(0.001)
+        with pytest.raises(LimitExceeded) as error:
+            expr.derivative()
+    assert error.value.limit == "seconds"
+
+
+def test_nested_blocks_keep_the_stricter_bound():
+    with limits(max_nodes=10, max_depth=100) as outer:
+        with limits(max_nodes=1000, max_depth=5) as inner:
+            assert (inner.max_nodes, inner.max_depth) == (10, 5)
+        assert outer.max_nodes == 10
+    assert isinstance(LimitExceeded("nodes", 2, 1), ValueError)
+
+
+def test_cached_results_are_checked():
+    expr = parse("sin(x)^2 * exp(x^2) * cos(x)^3 * tan(x) / (x + 4)")
+    derivative = expr.derivative()
+    simplified = derivative.simplify()
+    with limits(max_nodes=10):
+        with pytest.raises(LimitExceeded):
+            expr.derivative()
+        with pytest.raises(LimitExceeded):
+            derivative.simplify()
+    assert expr.derivative() is derivative and derivative.simplify() is simplified
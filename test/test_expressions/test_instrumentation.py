@@ -0,0 +1,90 @@
+import sys
+
+from src.batch import derivative_of
+from src.expressions import Constant, Negation, Polynomial, Sin, Sum, Variable, instrument, clear_caches
+from src.expressions import instrumentation
+from src.parser.parser import parse
+
+
+def test_allocations_count_constructor_calls_and_new_nodes():
+    with instrument() as collector:
+        first = Sum(Variable(), Constant(123456.5))
+        second = Sum(Variable(), Constant(123456.5))
+    assert first is second
+    assert collector.allocations["Sum"] == 2
+    assert collector.allocations["Constant"] == 2
+    # The second tree is answered by the intern table
+    assert collector.new_nodes["Sum"] == 1
+    assert collector.new_nodes["Constant"] == 1
+
+
+def test_rule_firings_name_the_rule():
+    clear_caches()
+    expr = parse("ln(exp(x)) + x ^ 2 + x ^ 1 + exp(ln(x)) * 2 ^ 3 * x ^ 0")
+    with instrument() as collector:
+        expr.simplify_fully()
+    # Nodes rebuilt unchanged (leaves, sin(x)) are not firings
+    assert collector.rule_firings == {
+        "Logarithm._simplify: log of exp": 1,
+        "Exponential._simplify: exp of log": 1,
+        "Power._simplify: constant exponent": 1,
+        "Power._simplify: unit exponent": 1,
+        "Power._simplify: zero exponent": 1,
+        "Power._simplify: constant folding": 1,
+        "Product._simplify: constant folding": 1,
+        "Sum._simplify: like terms": 2,
+        "Sum._simplify: polynomial merge": 1,
+    }
+
+
+def test_polynomial_rules():
+    clear_caches()
+    x = Variable()
+    with instrument() as collector:
+        Polynomial(Polynomial(x, 2), 3).simplify()
+        Polynomial(Negation(Sin(x)), 3).simplify()
+        Polynomial(Sum(x, Constant(1)), 2).simplify()
+    assert collector.rule_firings["Polynomial._simplify: power of a power"] == 1
+    assert collector.rule_firings["Polynomial._simplify: power of a negation"] == 1
+    assert collector.rule_firings["Polynomial._simplify: expansion"] == 1
+
+
+def test_sum_and_product_rules():
+    clear_caches()
+    expr = parse("2 * 3 * x * y * x - x ^ 2 * y + sin(x) - sin(x) + 4 * (cos(x) + 1) + 0 * y + x + 1")
+    with instrument() as collector:
+        expr.simplify_fully()
+    # Named after the root of the chain: the whole sum is collected at once
+    assert collector.rule_firings == {
+        "Product._simplify: constant folding": 1,
+        "Product._simplify: like factors": 1,
+        "Product._simplify: zero factor": 1,
+        "Power._simplify: constant exponent": 1,
+        "Sum._simplify: like terms": 2,
+        "Sum._simplify: cancellation": 1,
+        "Sum._simplify: distribution": 1,
+        "Sum._simplify: constant folding": 1,
+        "Sum._simplify: polynomial merge": 1,
+    }
+
+
+def test_phases_and_stack_depth():
+    clear_caches()
+    with instrument(rules=False) as collector:
+        derivative_of("sin(x) * x ^ 2")
+    summary = collector.summary()
+    assert list(summary["phases"]) == ["tokenize", "parse", "simplify", "derivative", "simplify_derivative", "format"]
+    assert all(seconds >= 0 for seconds in summary["phases"].values())
+    assert summary["max_stack_depth"] > 1
+    assert summary["rule_firings"] == {}
+
+
+def test_off_outside_the_block():
+    trace = sys.gettrace()
+    with instrument() as collector:
+        # Rules are reported by _simplify itself, not by a trace function
+        assert sys.gettrace() is trace
+    assert instrumentation._active is None
+    assert sys.gettrace() is trace
+    Sum(Variable(), Constant(2))
+    assert collector.allocations["Sum"] == 0
@@ -0,0 +1,51 @@
+import copy
+import pickle
+
+import pytest
+
+from src.expressions.basic import Constant, Variable, Sum, Product, Negation
+from src.expressions.polynomial import Polynomial
+from src.expressions.trigonometric import Sin
+from src.parser.parser import parse
+
+
+def test_identical_nodes_are_shared():
+    assert Constant(2) is Constant(2)
+    assert Variable() is Variable()
+    assert Sin(Variable()) is Sin(Variable())
+    assert Sum(Variable(), Constant(1)) is Sum(left=Variable(), right=Constant(1))
+
+
+def test_parsed_trees_are_shared():
+    assert parse("sin(x) * (x + 1)") is Product(Sin(Variable()), Sum(Variable(), Constant(1)))
+
+
+def test_different_nodes_are_distinct():
+    assert Sum(Variable(), Constant(1)) is not Sum(Constant(1), Variable())
+    assert Constant(2) is not Constant(2.0)
+    assert Constant(0.0) is not Constant(-0.0)
+    assert Polynomial(Variable(), 2) is not Polynomial(Variable(), 2.0)
+
+
+def test_hash_and_equality():
+    x = Variable()
+    expr = Negation(Sum(x, Constant(3)))
+    assert hash(expr) == hash(Negation(Sum(x, Constant(3))))
+    assert expr == Negation(Sum(x, Constant(3)))
+    assert expr != Negation(Sum(x, Constant(4)))
+    assert len({expr, Negation(Sum(x, Constant(3)))}) == 1
+
+
+def test_nodes_are_immutable():
+    expr = Sum(Variable(), Constant(1))
+    with pytest.raises(AttributeError):
+        expr.left = Constant(2)
+    with pytest.raises(AttributeError):
+        del expr.right
+
+
+def test_copy_and_pickle_preserve_identity():
+    expr = parse("x^2 + exp(sin(x))")
+    assert copy.copy(expr) is expr
+    assert copy.deepcopy(expr) is expr
+    assert pickle.loads(pickle.dumps(expr)) is expr
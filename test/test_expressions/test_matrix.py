@@ -0,0 +1,72 @@
+import pytest
+
+from src.expressions.matrix import hessian, jacobian
+from src.parser.parser import parse
+
+POINT = {"x": 0.7, "y": 1.3, "z": 2.1}
+
+
+def test_jacobian_entries():
+    matrix = jacobian([parse("x * y + sin(z)"), parse("x^2 * exp(y * z)")])
+    assert matrix.shape == (2, 3)
+    assert matrix.parameters == ("x", "y", "z")
+    assert str(matrix) == "[y, x, cos(z)]\n[2 * x * exp(y * z), x ^ 2 * z * exp(y * z), x ^ 2 * y * exp(y * z)]"
+
+
+def test_jacobian_columns_follow_variables():
+    matrix = jacobian([parse("x * y")], variables=["y", "z"])
+    assert str(matrix) == "[x, 0]"
+    assert matrix.parameters == ("x", "y", "z")
+
+
+def test_hessian_is_symmetric():
+    matrix = hessian(parse("x^2 * y + sin(x * y) + y^3"))
+    assert matrix[0, 1] is matrix[1, 0]
+    assert str(matrix[0, 1]) == "2 * x + cos(x * y) - x * y * sin(x * y)"
+
+
+@pytest.mark.parametrize(
+    "expr_str",
+    [
+        "x * y * z",
+        "sin(x * y) * exp(z) / (1 + y^2)",
+        "(x^2 + 3*x + 1) * cosh(y) + ln(z) * x",
+    ],
+)
+def test_compiled_matches_entries(expr_str):
+    np = pytest.importorskip("numpy")
+    expr = parse(expr_str)
+    for matrix in (hessian(expr), jacobian([expr, expr.derivative("z")])):
+        values = matrix(**POINT)
+        assert values.shape == matrix.shape
+        expected = [[entry(**POINT) for entry in row] for row in matrix.rows]
+        assert np.allclose(values, expected)
+
+
+def test_compiled_hoists_subexpressions_shared_between_entries():
+    pytest.importorskip("numpy")
+    source = hessian(parse("sin(x * y)")).compile().source
+    assert source.count("x * y") == 1
+
+
+def test_compile_long_entries():
+    np = pytest.importorskip("numpy")
+    expr = parse(" + ".join(f"sin({i} * x) * y" for i in range(1, 1001)))
+    matrix = jacobian([expr], ["x", "y"])
+    assert np.allclose(matrix.compile()(x=0.3, y=2.0), [[entry(0.3, y=2.0) for entry in matrix.rows[0]]])
+
+
+def test_compile_variables_named_like_helpers():
+    np = pytest.importorskip("numpy")
+    assert np.allclose(jacobian([parse("array * x")]).compile()(array=2.0, x=3.0), [[3.0, 2.0]])
+
+
+def test_readme_example_source():
+    source = hessian(parse("x^2 * y + sin(x * y)")).compile().source
+    assert source.splitlines() == [
+        "def compiled(x, y):",
+        "    t0 = x * y",
+        "    t1 = sin(t0)",
+        "    t2 = 2 * x + cos(t0) - t0 * t1",
+        "    return _array([[2 * y - y ** (2) * t1, t2], [t2, -(x ** (2) * t1)]], dtype=_float)",
+    ]
@@ -0,0 +1,82 @@
+import math
+
+import pytest
+
+from src.expressions.basic import Constant, Variable
+from src.parser.parser import parse
+
+POINT = {"x": 0.7, "y": 1.3, "z": 2.1}
+
+
+def test_variables_are_interned_by_name():
+    assert Variable("y") is Variable("y")
+    assert Variable("y") is not Variable()
+    assert parse("x * y + z").variables() == ("x", "y", "z")
+    assert parse("3 * x^2 + 1").simplify().variables() == ("x",)
+    with pytest.raises(ValueError):
+        Variable("2y")
+
+
+def test_evaluation():
+    expr = parse("x * y + z")
+    assert expr(1.0, y=2.0, z=3.0) == 5.0
+    assert expr(**POINT) == pytest.approx(0.7 * 1.3 + 2.1)
+    with pytest.raises(ValueError):
+        expr(1.0)
+
+
+@pytest.mark.parametrize(
+    "expr_str, variable, expected",
+    [
+        ("x * y + z", "y", "x"),
+        ("x^2 * y + 3*x + y^3", "y", "x ^ 2 + 3 * y ^ 2"),
+        ("x^3 + 2*x", "y", "0"),
+        ("sin(x * y)", "x", "y * cos(x * y)"),
+    ],
+)
+def test_partial_derivatives(expr_str, variable, expected):
+    assert str(parse(expr_str).derivative(variable).simplify_fully()) == expected
+
+
+def test_simplify_collects_terms_of_every_variable():
+    assert str(parse("x*y + y*x - y + y").simplify_fully()) == "2 * x * y"
+    assert str(parse("y*x*y").simplify_fully()) == "x * y ^ 2"
+
+
+@pytest.mark.parametrize(
+    "expr_str",
+    [
+        "x * y + z",
+        "sin(x * y) * exp(z) / (1 + y^2)",
+        "x^y + ln(z) - tanh(x - z)",
+        "(x^2 + 3*x + 1) * cosh(y) + z^3",
+    ],
+)
+def test_gradient_matches_symbolic_partials(expr_str):
+    expr = parse(expr_str)
+    value, gradient = expr.gradient(**POINT)
+    assert value == pytest.approx(expr(**POINT))
+    assert list(gradient) == ["x", "y", "z"]
+    for name in POINT:
+        assert gradient[name] == pytest.approx(expr.derivative(name)(**POINT))
+
+
+def test_gradient_of_constant():
+    assert Constant(2).gradient(x=1.0) == (2, {"x": 0.0})
+
+
+def test_gradient_over_arrays():
+    np = pytest.importorskip("numpy")
+    expr = parse("sin(x * y) + y")
+    xs = np.linspace(0, 1, 5)
+    value, gradient = expr.gradient(xs, y=2.0)
+    assert value.shape == gradient["y"].shape == (5,)
+    assert np.allclose(gradient["x"], 2.0 * np.cos(2.0 * xs))
+    assert np.allclose(gradient["y"], xs * np.cos(2.0 * xs) + 1)
+    assert np.allclose(expr.evaluate_array(xs, y=2.0), value)
+
+
+def test_compile_takes_every_variable():
+    compiled = parse("x * y + sin(z)").compile()
+    assert compiled(1.0, 2.0, 0.0) == 2.0
+    assert compiled(x=1.0, y=2.0, z=math.pi / 2) == pytest.approx(3.0)
@@ -0,0 +1,92 @@
+from itertools import islice
+from math import factorial
+
+import pytest
+
+from src.expressions.basic import Variable
+from src.parser.parser import parse
+
+VALUES = [0.3, 0.8, 1.7]
+
+
+@pytest.mark.parametrize(
+    "expr_str, n, expected",
+    [
+        ("sin(2*x + 1)", 3, "-8 * cos(2 * x + 1)"),
+        ("cos(x)", 6, "-cos(x)"),
+        ("exp(3*x)", 4, "81 * exp(3 * x)"),
+        ("sinh(x) + cosh(2*x)", 3, "cosh(x) + 8 * sinh(2 * x)"),
+        ("(x + 1)^0.5", 3, "0.375 / (x + 1) ^ 2.5"),
+        ("ln(x)", 3, "2 / x ^ 3"),
+        ("x^3 + 2*x^2 + 7", 3, "6"),
+        ("x^3 + 2*x^2 + 7", 4, "0"),
+        ("x * y^4", 2, "0"),
+    ],
+)
+def test_closed_forms(expr_str, n, expected):
+    assert str(parse(expr_str).nth_derivative(n)) == expected
+
+
+@pytest.mark.parametrize(
+    "expr_str",
+    [
+        "sin(x) * exp(x)",
+        "x * sin(x) + exp(x) + 4 * cos(x)",
+        "tan(x) + (2*x + 1)^5",
+        "ln(3*x + 1) - sinh(x^2)",
+    ],
+)
+@pytest.mark.parametrize("n", [0, 1, 4])
+def test_matches_repeated_derivatives(expr_str, n):
+    expected = parse(expr_str)
+    for _ in range(n):
+        expected = expected.derivative()
+    actual = parse(expr_str).nth_derivative(n)
+    for x in VALUES:
+        assert actual(x) == pytest.approx(expected(x))
+
+
+def test_partial_derivatives():
+    assert str(parse("sin(x * y) + exp(2 * y)").nth_derivative(2, "y")) == "4 * exp(2 * y) - x ^ 2 * sin(x * y)"
+    assert parse("cos(y)").nth_derivative(3, Variable("y")) is parse("sin(y)")
+
+
+def test_derivatives_generator():
+    orders = list(islice(parse("x^3").derivatives(), 5))
+    assert [str(order) for order in orders] == ["x ^ 3", "3 * x ^ 2", "6 * x", "6", "0"]
+
+
+def test_negative_order():
+    with pytest.raises(ValueError):
+        parse("x").nth_derivative(-1)
+
+
+@pytest.mark.parametrize(
+    "expr_str, at_zero",
+    [
+        ("1/(1+x)", factorial(20)),
+        ("3/(2*x+1)^2", 3 * factorial(21) * 2**20),
+        ("exp(x^2)", factorial(20) // factorial(10)),
+        ("tan(x)", 0),
+    ],
+)
+def test_order_twenty(expr_str, at_zero):
+    expr = parse(expr_str)
+    derivative = expr.nth_derivative(20)
+    assert derivative.size < 200
+    assert derivative(0) == pytest.approx(at_zero)
+    assert derivative(0.3) == pytest.approx(expr.nth_derivative(19).derivative()(0.3))
+    assert next(islice(expr.derivatives(), 20, None)) is derivative
+
+
+def test_coefficients_out_of_range():
+    with pytest.raises(ValueError, match="order 200"):
+        parse("1/(0.5*x + 1)").nth_derivative(200)
+
+
+@pytest.mark.parametrize("expr_str", ["x - 4/x", "x - 27/(x^2*cosh(0.5))", "2 * x - 3 * (5 / sin(x))"])
+def test_scaled_quotient_terms(expr_str):
+    expected = parse(expr_str).derivative().derivative()
+    actual = parse(expr_str).nth_derivative(2)
+    for x in VALUES:
+        assert actual(x) == pytest.approx(expected(x))
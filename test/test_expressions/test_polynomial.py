@@ -1,5 +1,8 @@
-from src.expressions.basic import Variable
-from src.expressions.polynomial import Polynomial
+import pytest
+
+from src.expressions.basic import Constant, Variable
+from src.expressions.polynomial import MAX_EXPANDED_DEGREE, Polynomial, SparsePolynomial
+from src.parser.parser import parse
 from src.test_utils import evaluate_derivative
 
 VALUES = [1, 2, 3, 4]
@@ -19,3 +22,41 @@ def test_polynomial_degree_1():
 def test_polynomial_degree_0():
     expr = Polynomial(Variable(), 0)
     evaluate_derivative(expr, lambda x: 0, VALUES)
+
+
+def test_sums_of_powers_become_sparse_polynomials():
+    expr = parse("3*x^5 + 2*x^2 - x + 7").simplify_fully()
+    assert expr is SparsePolynomial(((0, 7), (1, -1), (2, 2), (5, 3)))
+    assert str(expr) == "3 * x ^ 5 + 2 * x ^ 2 - x + 7"
+    assert expr.derivative() is SparsePolynomial(((0, -1), (1, 4), (4, 15)))
+
+
+def test_products_and_powers_are_expanded():
+    assert str(parse("(x+1)*(x-1)").simplify_fully()) == "x ^ 2 - 1"
+    assert str(parse("(x+1)^3").simplify_fully()) == "x ^ 3 + 3 * x ^ 2 + 3 * x + 1"
+    assert str(parse("(x+1)^2 * sin(x)").simplify_fully()) == "(x ^ 2 + 2 * x + 1) * sin(x)"
+    # Past MAX_EXPANDED_DEGREE the power is kept
+    assert str(parse(f"(x+1)^{MAX_EXPANDED_DEGREE + 1}").simplify_fully()) == f"(x + 1) ^ {MAX_EXPANDED_DEGREE + 1}"
+
+
+def test_cancellation_leaves_plain_terms():
+    assert parse("(x+1)*(x+1) - x^2 - 2*x").simplify_fully() is Constant(1)
+    assert str(parse("2*(x+1) - x + sin(x)").simplify_fully()) == "x + 2 + sin(x)"
+
+
+def test_sparse_high_degree():
+    expr = parse("x^1000 - 1").simplify_fully()
+    assert expr.terms == ((0, -1), (1000, 1))
+    assert str(expr.derivative()) == "1000 * x ^ 999"
+    assert expr(1.001) == pytest.approx(1.001**1000 - 1)
+
+
+def test_horner_evaluation():
+    expr = parse("2*x^7 - 3*x^4 + x - 5").simplify_fully()
+    expected = lambda x: 2 * x**7 - 3 * x**4 + x - 5
+    for x in [-2, -0.5, 0, 1.5, 3]:
+        assert expr(x) == pytest.approx(expected(x))
+        assert expr.compile()(x) == pytest.approx(expected(x))
+    np = pytest.importorskip("numpy")
+    xs = np.linspace(-2, 3, 11)
+    assert np.allclose(expr.evaluate_array(xs), expected(xs))
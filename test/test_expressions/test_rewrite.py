@@ -0,0 +1,66 @@
+import pytest
+
+from src.expressions import Constant, Cos, Exponential, Polynomial, Product, Sin, Sum, instrument
+from src.expressions.rewrite import Rule, RuleSet, Wildcard, rewrite
+from src.parser.parser import parse
+
+u = Wildcard("u")
+c = Wildcard("c", Constant)
+
+
+@pytest.mark.parametrize(
+    "expr_str, expected",
+    [
+        ("sin(-x) + cos(-x)", "cos(x) - sin(x)"),
+        ("tanh(-(x^2))", "-tanh(x ^ 2)"),
+        ("x * exp(0) + ln(1)", "x"),
+        ("sin(x)", "sin(x)"),
+    ],
+)
+def test_default_rules(expr_str, expected):
+    assert str(rewrite(parse(expr_str))) == expected
+
+
+def test_without_simplification():
+    assert str(rewrite(parse("sin(-x) + 0"), simplify=False)) == "-sin(x) + 0"
+
+
+def test_commutative_root():
+    rules = RuleSet()
+    rules.add(Sum(Polynomial(Sin(u), 2), Polynomial(Cos(u), 2)), Constant(1), name="pythagoras")
+    assert str(rules.rewrite(parse("cos(x + 1)^2 + sin(x + 1)^2"))) == "1"
+    assert str(rules.rewrite(parse("sin(x + 1)^2 + cos(x + 1)^2 + 3"))) == "4"
+    # Both occurrences of u must be the same subtree
+    assert str(rules.rewrite(parse("sin(x)^2 + cos(y)^2"))) == "cos(y) ^ 2 + sin(x) ^ 2"
+
+
+def test_candidates_are_indexed_by_child_classes():
+    rules = RuleSet()
+    double_angle = rules.add(Product(c, Product(Sin(u), Cos(u))), lambda c, u: Product(Constant(c.value / 2), Sin(Product(Constant(2), u))))
+    other = rules.add(Sin(Product(c, u)), lambda c, u: None)
+    assert rules.candidates(parse("2 * (sin(x) * cos(x))")) == [double_angle]
+    assert rules.candidates(parse("x * (sin(x) * cos(x))")) == []
+    assert rules.candidates(parse("sin(2 * x)")) == [other]
+    assert str(rules.rewrite(parse("2 * (sin(x) * cos(x))"), simplify=False)) == "1.0 * sin(2 * x)"
+
+
+def test_condition_and_firings():
+    rules = RuleSet([Rule(Polynomial(Exponential(u), 2), Exponential(Product(Constant(2), u)), condition=lambda u: u.variables() == ("y",), name="square")])
+    with instrument() as collector:
+        assert str(rules.rewrite(parse("exp(x)^2"))) == "exp(x) ^ 2"
+        assert str(rules.rewrite(parse("exp(y)^2"))) == "exp(2 * y)"
+    assert collector.rule_firings["RuleSet: square"] == 1
+
+
+def test_pattern_root_must_be_an_operation():
+    with pytest.raises(ValueError):
+        Rule(u, Constant(0))
+    with pytest.raises(ValueError):
+        Rule(Constant(1), Constant(0))
+
+
+def test_rule_undone_by_simplification_stops():
+    rules = RuleSet([Rule(Polynomial(u, 2), Product(u, u), name="expand")])
+    with instrument() as collector:
+        assert str(rules.rewrite(parse("sin(x)^2"))) == "sin(x) * sin(x)"
+    assert collector.rule_firings["RuleSet: expand"] == 2
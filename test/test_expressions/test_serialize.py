@@ -0,0 +1,101 @@
+import json
+import math
+
+import pytest
+
+from src.expressions import Constant, Product, Sin, SparsePolynomial, Sum, Variable, from_bytes, from_json, to_bytes, to_json
+from src.expressions.cse import Reference, common_subexpressions
+from src.expressions.rewrite import Wildcard
+from src.parser.parser import parse
+
+FORMATS = [(to_bytes, from_bytes), (to_json, from_json)]
+
+
+@pytest.mark.parametrize("encode, decode", FORMATS)
+@pytest.mark.parametrize(
+    "expr_str",
+    [
+        "x",
+        "sin(x)^2 * exp(x^2 + 3*y) / (x + 1) - cos(2.0*x + 2)",
+        "-(tanh(x) + sinh(x) * cosh(x)) ^ ln(x) + tan(x)",
+        "x^3 - 2*x + 1",
+    ],
+)
+def test_round_trip(encode, decode, expr_str):
+    expr = parse(expr_str)
+    derivative = expr.derivative().simplify_fully()
+    assert decode(encode(expr)) is expr
+    assert decode(encode(derivative)) is derivative
+
+
+@pytest.mark.parametrize("encode, decode", FORMATS)
+def test_every_leaf(encode, decode):
+    x, y = Variable(), Variable("y")
+    leaves = [
+        Constant(0.1 + 0.2),
+        Constant(2),
+        Constant(2.0),
+        Constant(10**40),
+        Constant(-math.inf),
+        SparsePolynomial(((0, 1), (2, 2.5), (5, -3))),
+        Wildcard("u", Constant),
+        Wildcard("v"),
+    ]
+    for leaf in leaves:
+        assert decode(encode(leaf)) is leaf
+    # Floats are exact and 2 stays apart from 2.0
+    assert decode(encode(Constant(0.1 + 0.2))).value == 0.30000000000000004
+    assert type(decode(encode(Sum(Constant(2), Constant(2.0)))).left.value) is int
+
+    reference = Reference("a", Sin(y))
+    expr = Product(reference, x)
+    decoded = decode(encode(expr))
+    assert decoded is expr and decoded.left.target is Sin(y)
+    assert math.isnan(decode(encode(Constant(math.nan))).value)
+
+
+def test_let_sequence_results():
+    sequence = common_subexpressions(parse("sin(x^2) * exp(sin(x^2)) + sin(x^2)^2"))
+    assert from_bytes(to_bytes(sequence.result)) is sequence.result
+
+
+def test_shared_subtrees_are_written_once():
+    shared = parse("sin(x) * exp(x^2) + cos(x)")
+    expr = Product(Sum(shared, Constant(1)), Sum(shared, Constant(2)))
+    nodes = json.loads(to_json(expr))["nodes"]
+    assert len(nodes) == len({tuple(map(str, node)) for node in nodes})
+    assert len(to_bytes(Product(shared, shared))) < len(to_bytes(Product(shared, Sum(shared, Constant(1)))))
+
+
+def test_deep_trees():
+    expr = Variable()
+    for _ in range(5000):
+        expr = Sin(expr)
+    assert from_bytes(to_bytes(expr)) is expr
+    assert from_json(to_json(expr)) is expr
+
+
+def test_json_layout():
+    document = json.loads(to_json(parse("2 * x")))
+    assert document == {"version": 1, "nodes": [["Constant", 2], ["Variable", "x"], ["Product", 0, 1]]}
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"nope" + bytes(20),
+        to_bytes(parse("sin(x) + 1"))[:-3],
+        to_bytes(parse("sin(x) + 1")).replace(b"DXPR\x01", b"DXPR\x07"),
+    ],
+)
+def test_invalid_bytes(data):
+    with pytest.raises(ValueError):
+        from_bytes(data)
+
+
+def test_invalid_json():
+    with pytest.raises(ValueError):
+        from_json('{"version": 1, "nodes": [["Sine", 0]]}')
+    with pytest.raises(ValueError):
+        from_json('{"version": 2, "nodes": []}')
@@ -0,0 +1,68 @@
+import pytest
+
+from src.expressions.basic import Constant, Variable, Sum, Product, Negation
+from src.parser.parser import parse
+
+
+def simplify_n_times(expr, n=10):
+    for _ in range(n):
+        expr = expr.simplify()
+    return expr
+
+
+def test_fixed_point_matches_repeated_passes():
+    for expr_str in ["x^2 + 3*x + 5 + exp(x)", "-(-(x*1) + 0)", "(x+0)*(1*x)/(x^1)", "sin(x)*cos(x)^2"]:
+        expr = parse(expr_str)
+        assert expr.simplify_fully() is simplify_n_times(expr)
+        derivative = expr.derivative()
+        assert derivative.simplify_fully() is simplify_n_times(derivative)
+
+
+def test_fixed_point_is_normal():
+    expr = parse("(x*1 + 0) * (2 + 3)").simplify_fully()
+    assert expr._normal
+    assert expr.simplify() is expr
+
+
+def test_normal_subtrees_are_skipped():
+    x = Variable()
+    normal = Product(Constant(2), x).simplify_fully()
+    # Nesting a normal subtree keeps the mark, so only the new parent is visited
+    assert normal._normal
+    assert Sum(normal, Negation(normal)).simplify_fully() == Constant(0)
+
+
+def test_max_passes():
+    expr = parse("-(-(-(-(x))))")
+    assert expr.simplify_fully(max_passes=0) is expr
+    assert expr.simplify_fully() is Variable()
+
+
+@pytest.mark.parametrize(
+    "expr_str, expected",
+    [
+        ("x + 1 + x + 2", "2 * x + 3"),
+        ("x*x*x", "x ^ 3"),
+        ("x * 2 * x * 3", "6 * x ^ 2"),
+        ("x^2 * x / x^3", "1"),
+        ("2/x + 3/x", "5 / x"),
+        ("(x+1)*(x+1)/(x+1)", "x + 1"),
+        ("-(x - sin(x))", "-x + sin(x)"),
+        ("x - 2*x + 3 - 4", "-x - 1"),
+        ("sin(x)*x + x*sin(x)", "2 * x * sin(x)"),
+        ("x + x^2 + 1 + x^3", "x ^ 3 + x ^ 2 + x + 1"),
+    ],
+)
+def test_like_terms_and_constants(expr_str, expected):
+    assert str(parse(expr_str).simplify_fully()) == expected
+
+
+def test_canonical_order():
+    # Operands are sorted, so reordered sums and products simplify to the same node
+    assert parse("sin(x) + x*cos(x) + 1").simplify_fully() is parse("1 + cos(x)*x + sin(x)").simplify_fully()
+    assert parse("exp(x) * x * sin(x)").simplify_fully() is parse("sin(x) * (x * exp(x))").simplify_fully()
+
+
+def test_zero_divisor_after_folding():
+    with pytest.raises(ZeroDivisionError):
+        parse("x / (x - x)").simplify_fully()
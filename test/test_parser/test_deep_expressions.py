@@ -0,0 +1,53 @@
+import sys
+
+import pytest
+
+from src.expressions import Constant, Variable, Negation, Sum, Power, Sin
+from src.parser.parser import parse
+
+# Well past the default recursion limit
+DEPTH = 5 * sys.getrecursionlimit()
+
+
+def test_long_sum():
+    expr = parse("+".join(["x"] * DEPTH))
+    assert expr(1.5) == pytest.approx(1.5 * DEPTH)
+    assert expr.derivative().simplify_fully()(1.5) == pytest.approx(DEPTH)
+    assert str(expr) == " + ".join(["x"] * DEPTH)
+
+
+def test_nested_parentheses():
+    assert parse("(" * DEPTH + "x + 1" + ")" * DEPTH) == Sum(Variable(), Constant(1))
+
+
+def test_power_chain_is_right_associative():
+    expr = parse("^".join(["x"] * DEPTH))
+    expected = Variable()
+    for _ in range(DEPTH - 1):
+        expected = Power(Variable(), expected)
+    assert expr == expected
+    assert expr(1.0) == 1.0
+    assert expr.derivative()(1.0) == pytest.approx(1.0)
+
+
+def test_nested_functions_and_negations():
+    expr = parse("sin(" * DEPTH + "-" * DEPTH + "x" + ")" * DEPTH)
+    inner = Variable()
+    for _ in range(DEPTH):
+        inner = Negation(inner)
+    for _ in range(DEPTH):
+        inner = Sin(inner)
+    assert expr == inner
+    assert expr.simplify_fully() == parse("sin(" * DEPTH + "x" + ")" * DEPTH)
+    assert len(str(expr)) == 6 * DEPTH + 1
+
+
+@pytest.mark.parametrize("operator", ["+", "*"])
+def test_deep_similar_operands(operator):
+    # Sorting the operands compares their structure down to the variables
+    chain = "sin(" * DEPTH + "{}" + ")" * DEPTH
+    expr = parse(f"{chain.format('x')} {operator} {chain.format('y')}")
+    simplified = expr.simplify_fully()
+    assert simplified.depth == DEPTH + 2
+    assert simplified(0.3, y=0.4) == pytest.approx(expr(0.3, y=0.4))
+    assert expr.derivative().simplify_fully()(0.3, y=0.4) == pytest.approx(expr.derivative()(0.3, y=0.4))
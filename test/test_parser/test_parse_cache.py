@@ -0,0 +1,69 @@
+import pytest
+
+from src.expressions import LimitExceeded, limits
+from src.parser import PARSE_CACHE, ParseStore, clear_parse_cache, parse, parse_cache_stats, persist, scan
+from src.parser.cache import normalized_key
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_parse_cache()
+    yield
+    persist(None)
+    clear_parse_cache()
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        ("sin ( x)", "SIN(x)"),
+        ("x^2+3*x", " x ^ 2 + 3 * x "),
+        ("02 * x", "2*x"),
+    ],
+)
+def test_same_tokens_share_a_tree(first, second):
+    assert normalized_key(scan(first)) == normalized_key(scan(second))
+    tree = parse(first)
+    assert parse(second) is tree
+    assert PARSE_CACHE.stats()["hits"] == 1
+
+
+def test_different_numbers_are_different_keys():
+    assert normalized_key(scan("2 * x")) != normalized_key(scan("2.0 * x"))
+    assert str(parse("2.0 * x")) == "2.0 * x"
+
+
+def test_errors_are_not_cached():
+    with pytest.raises(ValueError):
+        parse("sin(x")
+    assert len(PARSE_CACHE) == 0
+
+
+def test_hit_rate():
+    for _ in range(3):
+        parse("exp(x) * x")
+    stats = parse_cache_stats()
+    assert stats["memory"]["hits"] == 2 and stats["memory"]["misses"] == 1
+    assert stats["memory"]["hit_rate"] == pytest.approx(2 / 3)
+    assert "disk" not in stats
+
+
+def test_limits_apply_to_cached_trees():
+    parse("sin(cos(tan(x)))")
+    with limits(max_depth=3), pytest.raises(LimitExceeded):
+        parse("sin(cos(tan(x)))")
+
+
+def test_disk_tier_survives_restarts(tmp_path):
+    path = str(tmp_path / "parse.db")
+    persist(path)
+    tree = parse("sin(x)^2 + 2.5 * exp(y) - 3")
+    assert len(ParseStore(path)) == 1
+
+    # A new process: empty memory tier, same file
+    clear_parse_cache()
+    persist(path)
+    assert parse("SIN(x) ^ 2 + 2.5*exp(y) - 3") is tree
+    assert parse_cache_stats()["disk"]["hits"] == 1
+    parse("sin(x)^2 + 2.5 * exp(y) - 3")
+    assert parse_cache_stats()["disk"]["hits"] == 1  # Now served from memory
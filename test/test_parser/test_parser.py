@@ -35,7 +35,13 @@ def check_equal(expected: Expression, expr_str: str):
         (Tan(Power(Variable(), Constant(2))), "(tan(x^2))"),
         (Sum(Sinh(Variable()), Variable()), "sinh(x)+x"),
         (Division(Exponential(Variable()), Constant(2)), "exp(x)/2"),
+        (Product(Variable("y"), Sin(Variable("theta"))), "y*sin(theta)"),
     ],
 )
 def test_parser(expr, expr_str):
     check_equal(expr, expr_str)
+
+
+def test_function_name_without_call():
+    with pytest.raises(ValueError):
+        parse("sin + 1")
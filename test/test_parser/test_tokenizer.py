@@ -1,5 +1,5 @@
 import pytest
-from src.parser.tokenizer import tokenize
+from src.parser.tokenizer import tokenize, scan, Token, TokenizeError, NUMBER, NAME, SYMBOL
 
 
 @pytest.mark.parametrize(
@@ -20,3 +20,24 @@ from src.parser.tokenizer import tokenize
 )
 def test_tokenize(expr: str, expected: list):
     assert tokenize(expr) == expected
+
+
+def test_scan_types_and_offsets():
+    assert scan(" 2.5*Sin(x) ") == [
+        Token(NUMBER, 2.5, 1, "2.5"),
+        Token(SYMBOL, "*", 4, "*"),
+        Token(NAME, "sin", 5, "sin"),
+        Token(SYMBOL, "(", 8, "("),
+        Token(NAME, "x", 9, "x"),
+        Token(SYMBOL, ")", 10, ")"),
+    ]
+    assert [token.value for token in scan("12 .5 3.")] == [12, 0.5, 3.0]
+    assert isinstance(scan("12")[0].value, int)
+
+
+@pytest.mark.parametrize("expr, char, offset", [("x + $", "$", 4), ("2 ** x_1", "_", 6), ("sin(x) . 2", ".", 7)])
+def test_scan_invalid_characters(expr, char, offset):
+    with pytest.raises(TokenizeError) as error:
+        scan(expr)
+    assert (error.value.char, error.value.offset) == (char, offset)
+    assert f"position {offset}" in str(error.value)
@@ -0,0 +1,126 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from src.batch import derivative_tree, differentiate_batch
+from src.expressions import LimitExceeded, Limits, from_bytes, limits
+from src.store import DerivativeStore, build_store, canonical
+
+EXPRESSIONS = ["x^2", "sin(x) * x", "SIN ( x ) * x", "x + $", "1/0", "exp(x) * ln(x)", "tanh(x^3 - 2.5*x)"]
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "derivatives.store")
+    counts = build_store(path, iter(EXPRESSIONS), workers=1)
+    assert counts == {"entries": 4, "errors": 2, "duplicates": 1}
+    return path
+
+
+def test_stored_derivatives(path):
+    with DerivativeStore(path) as store:
+        assert len(store) == 4
+        assert "sin(x)*x" in store and "cos(x)" not in store and "x + $" not in store
+        assert str(store.lookup("sin(x)*x")) == "x * cos(x) + sin(x)"
+        assert store.lookup("sin ( x ) * x") is store.lookup("sin(x)*x")
+        assert store.lookup("tanh(x^3 - 2.5*x)") is derivative_tree("tanh(x^3 - 2.5*x)")
+        assert store.lookup("cos(x)") is None
+        assert store.stats()["hits"] == 4 and store.stats()["misses"] == 1
+
+
+def test_misses_go_through_the_pipeline(path):
+    with DerivativeStore(path) as store:
+        assert str(store.derivative("cos(x)")) == "-sin(x)"
+        assert str(store.derivative("x^2")) == "2 * x"
+        assert store.stats()["computed"] == 1
+        with pytest.raises(ZeroDivisionError):
+            store.derivative("1/0")
+    with DerivativeStore(path, limits=Limits(max_nodes=5)) as store:
+        assert str(store.derivative("x^2")) == "2 * x"
+        with pytest.raises(LimitExceeded):
+            store.derivative("sin(x)^2 * exp(x^2) * cos(x)^3")
+
+
+def test_flat_evaluation(path):
+    with DerivativeStore(path) as store:
+        for expr_str in ["exp(x) * ln(x)", "tanh(x^3 - 2.5*x)", "cos(x)"]:
+            assert store.flat(expr_str)(1.3) == pytest.approx(store.derivative(expr_str)(1.3))
+
+
+def _lookup(path, expr_str):
+    with DerivativeStore(path) as store:
+        return str(store.lookup(expr_str))
+
+
+def test_readers_in_other_processes(path):
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(_lookup, [path] * 3, ["x^2", "exp(x)*ln(x)", "cos(x)"]))
+    assert results == ["2 * x", "exp(x) / x + exp(x) * ln(x)", "None"]
+
+
+def test_rebuild_is_atomic(path):
+    with DerivativeStore(path) as old:
+        build_store(path, ["cos(x)"], workers=1)
+        # The open store keeps reading the previous file
+        assert str(old.lookup("x^2")) == "2 * x"
+        with DerivativeStore(path) as new:
+            assert len(new) == 1 and new.lookup("x^2") is None
+
+
+def test_empty_and_invalid_files(tmp_path):
+    path = str(tmp_path / "empty.store")
+    build_store(path, [], workers=1)
+    with DerivativeStore(path) as store:
+        assert len(store) == 0 and store.lookup("x") is None
+    (tmp_path / "other").write_bytes(b"not a store" * 10)
+    with pytest.raises(ValueError):
+        DerivativeStore(str(tmp_path / "other"))
+
+
+def test_batch_trees():
+    result, failed = differentiate_batch(["sin(x)", "x + $"], workers=1, trees=True)
+    assert str(from_bytes(result.tree)) == result.derivative == "cos(x)"
+    assert failed.tree is None
+    assert canonical("SIN ( x)") == canonical("sin(x)") and canonical("x + $") is None
+
+
+def test_duplicates_are_found_on_disk(tmp_path, monkeypatch):
+    # Every key hashes alike: duplicates are told apart by the keys stored in the file
+    monkeypatch.setattr("src.store._hash", lambda key: 7)
+    path = str(tmp_path / "collisions.store")
+    expressions = ["x^2", "1/0", "cos(x)", "X ^ 2", "1 / 0", "sin(x)", "cos (x)"] * 3
+    assert build_store(path, iter(expressions), workers=2, chunksize=2) == {"entries": 3, "errors": 1, "duplicates": 17}
+    with DerivativeStore(path) as store:
+        assert [str(store.lookup(expr_str)) for expr_str in ["x^2", "cos(x)", "sin(x)", "1/0"]] == ["2 * x", "-sin(x)", "cos(x)", "None"]
+
+
+def test_failed_build_leaves_no_file(tmp_path):
+    def expressions():
+        yield "x^2"
+        raise OSError("input went away")
+
+    with pytest.raises(OSError):
+        build_store(str(tmp_path / "failed.store"), expressions(), workers=1)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_stored_derivatives_are_checked_against_limits(path):
+    with DerivativeStore(path) as store:
+        assert store.lookup("tanh(x^3 - 2.5*x)").size == 5
+        with limits(max_nodes=4):
+            with pytest.raises(LimitExceeded):
+                store.lookup("tanh(x^3 - 2.5*x)")
+            with pytest.raises(LimitExceeded):
+                store.flat("tanh(x^3 - 2.5*x)")
+            assert str(store.lookup("x^2")) == "2 * x"
+    with DerivativeStore(path, limits=Limits(max_depth=3)) as store:
+        with pytest.raises(LimitExceeded):
+            store.derivative("tanh(x^3 - 2.5*x)")
+
+
+def test_flat_counts_misses(path):
+    with DerivativeStore(path) as store:
+        store.flat("x^2")
+        store.flat("cos(x)")
+        store.flat("cos(x)")
+        assert (store.hits, store.misses, store.computed) == (2, 1, 1)